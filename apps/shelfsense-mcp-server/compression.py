@@ -0,0 +1,231 @@
+"""gzip/brotli response compression with a cache of compressed bodies.
+
+Tool results are large and repetitive text (pick lists, forecasts and the
+"Full data" JSON appended to them), and travel to the client over the /sse
+stream, so that stream is what benefits most. The middleware picks
+an encoding from Accept-Encoding (brotli when the `brotli` package is installed
+and the client accepts it, else gzip) and:
+
+- leaves bodies under the size threshold, non-text types and responses that
+  are already encoded untouched
+- looks whole bodies up by digest in an LRU of compressed bytes before
+  compressing, so identical bodies are compressed once however often they
+  are served
+- compresses streamed responses (SSE) chunk by chunk, flushing after each
+  chunk so events are not held back by the compressor. Streams always use
+  gzip: httpx does not drain brotli 1.2's decompressor between chunks, so a
+  flushed brotli stream stalls Python clients once an event exceeds 32 KB.
+
+Responses whose encoding depends on Accept-Encoding carry `Vary: Accept-Encoding`
+whether or not they end up compressed, so shared caches keep the variants apart.
+
+This module is vendored: shelfsense-mock-api and shelfsense-mcp-server each hold
+a copy, identical apart from the second paragraph of this docstring, as each
+app is built and deployed from its own directory and cannot import the other's
+code. Change both copies together.
+"""
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import hashlib
+import zlib
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript")
+
+
+def compress(body: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 4) -> bytes:
+    """A whole body compressed with `encoding` ("br" or "gzip")"""
+    return _Compressor(encoding, gzip_level, brotli_quality).finish(body)
+
+
+def negotiate(accept_encoding: str, streaming: bool = False) -> Optional[str]:
+    """Best supported encoding for an Accept-Encoding header, or None for identity"""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip()] = q
+
+    supported = ("br", "gzip") if brotli is not None and not streaming else ("gzip",)
+    best, best_q = None, 0.0
+    for encoding in supported:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class CompressedBodyCache:
+    """LRU of compressed bodies keyed by (encoding, digest of the uncompressed body)"""
+
+    def __init__(self, max_bytes: int, stats=None):
+        self.max_bytes = max_bytes
+        # Optional hit/miss counters, any object with hit() and miss() (e.g. the Mock API's metrics.CacheStats)
+        self.stats = stats
+        self.bytes = 0
+        self._entries: "OrderedDict[Tuple[str, bytes], bytes]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Tuple[str, bytes]) -> Optional[bytes]:
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        if self.stats is not None:
+            if value is None:
+                self.stats.miss()
+            else:
+                self.stats.hit()
+        return value
+
+    def put(self, key: Tuple[str, bytes], value: bytes):
+        if len(value) > self.max_bytes or key in self._entries:
+            return
+        self._entries[key] = value
+        self.bytes += len(value)
+        while self.bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= len(evicted)
+
+    def status(self) -> dict:
+        return {"entries": len(self._entries), "bytes": self.bytes, "max_bytes": self.max_bytes}
+
+
+class _Compressor:
+    """Incremental gzip or brotli stream"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._gzip = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        if self.encoding == "br":
+            out = self._brotli.process(data)
+            return out + self._brotli.flush() if flush else out
+        out = self._gzip.compress(data)
+        return out + self._gzip.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._gzip.compress(data) + self._gzip.flush()
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware; see the module docstring"""
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4,
+                 cache: Optional[CompressedBodyCache] = None, compress_streams: bool = True):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache = cache
+        self.compress_streams = compress_streams
+
+    def compress_body(self, encoding: str, body: bytes) -> bytes:
+        key = None
+        if self.cache is not None:
+            key = (encoding, hashlib.blake2b(body, digest_size=16).digest())
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        compressed = compress(body, encoding, self.gzip_level, self.brotli_quality)
+        if key is not None:
+            self.cache.put(key, compressed)
+        return compressed
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        accept = next((v.decode("latin-1") for k, v in scope["headers"] if k == b"accept-encoding"), "")
+        encoding = negotiate(accept) if accept else None
+        stream_encoding = negotiate(accept, streaming=True) if self.compress_streams and accept else None
+
+        start = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                headers = {k.lower(): v for k, v in message.get("headers", [])}
+                content_type = headers.get(b"content-type", b"").decode("latin-1")
+                passthrough = (
+                    b"content-encoding" in headers
+                    or message["status"] in (204, 304)
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                )
+                if passthrough:
+                    await send(message)
+                else:
+                    start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start is not None:
+                # First body chunk decides how the response is sent
+                held, start = start, None
+                if not more_body:
+                    if encoding is None or len(body) < self.minimum_size:
+                        passthrough = True
+                        await send(self._vary(held))
+                        await send(message)
+                        return
+                    body = self.compress_body(encoding, body)
+                    await send(self._encoded_start(held, encoding, len(body)))
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                if stream_encoding is None:
+                    passthrough = True
+                    await send(self._vary(held))
+                    await send(message)
+                    return
+                compressor = _Compressor(stream_encoding, self.gzip_level, self.brotli_quality)
+                await send(self._encoded_start(held, stream_encoding, None))
+
+            if more_body:
+                chunk = compressor.compress(body, flush=True)
+            else:
+                chunk = compressor.finish(body)
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    def _vary(message: dict) -> dict:
+        """Response start with Accept-Encoding added to its Vary header"""
+        vary = [v for k, v in message.get("headers", []) if k.lower() == b"vary"]
+        if any(b"accept-encoding" in v.lower() or v.strip() == b"*" for v in vary):
+            return message
+        headers = [(k, v) for k, v in message.get("headers", []) if k.lower() != b"vary"]
+        headers.append((b"vary", b", ".join(vary + [b"Accept-Encoding"])))
+        return {**message, "headers": headers}
+
+    @classmethod
+    def _encoded_start(cls, message: dict, encoding: str, length: Optional[int]) -> dict:
+        headers = [(k, v) for k, v in message.get("headers", []) if k.lower() != b"content-length"]
+        headers.append((b"content-encoding", encoding.encode()))
+        if length is not None:
+            headers.append((b"content-length", str(length).encode()))
+        return cls._vary({**message, "headers": headers})
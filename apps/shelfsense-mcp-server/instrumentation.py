@@ -0,0 +1,176 @@
+"""Per-tool timing, upstream call accounting and output size for MCP tools"""
+import functools
+import logging
+import os
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Optional
+
+import httpx
+
+
+SLOW_TOOL_MS = float(os.getenv("SLOW_TOOL_MS", 1000))
+LATENCY_WINDOW = 1000  # recent calls kept per tool for percentiles
+
+logger = logging.getLogger("shelfsense.tools")
+
+
+class CallRecord:
+    """Upstream activity attributed to one tool call"""
+
+    __slots__ = ("upstream_calls", "upstream_seconds")
+
+    def __init__(self):
+        self.upstream_calls = 0
+        self.upstream_seconds = 0.0
+
+
+_current_call: ContextVar[Optional[CallRecord]] = ContextVar("shelfsense_tool_call", default=None)
+
+
+class ToolStats:
+    __slots__ = ("calls", "errors", "seconds", "max_seconds", "upstream_calls",
+                 "upstream_seconds", "output_bytes", "slow_calls", "recent")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.upstream_calls = 0
+        self.upstream_seconds = 0.0
+        self.output_bytes = 0
+        self.slow_calls = 0
+        self.recent = deque(maxlen=LATENCY_WINDOW)
+
+    def percentile(self, pct: float) -> float:
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+class ToolInstrumentation:
+    """Wraps MCP tool functions and the upstream HTTP client.
+
+    Upstream requests are attributed to the tool call that made them through a
+    context variable, so concurrent calls on the same client don't mix. The
+    split between upstream time and total time shows how much of a slow call
+    was spent formatting the response rather than waiting on the API.
+    """
+
+    def __init__(self, slow_ms: float = SLOW_TOOL_MS, profiler=None):
+        self.slow_ms = slow_ms
+        self.profiler = profiler
+        self.tools = {}
+
+    def wrap(self, fn):
+        name = fn.__name__
+        stats = self.tools.setdefault(name, ToolStats())
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            record = CallRecord()
+            token = _current_call.set(record)
+            profile = self.profiler.begin(name) if self.profiler else None
+            started = time.perf_counter()
+            output = None
+            failed = False
+            try:
+                output = await fn(*args, **kwargs)
+                # Tools report failures as text rather than raising
+                failed = isinstance(output, str) and output.startswith("Error:")
+                return output
+            except Exception:
+                failed = True
+                raise
+            finally:
+                _current_call.reset(token)
+                elapsed = time.perf_counter() - started
+                if profile is not None:
+                    self.profiler.end(name, profile)
+                size = len(output.encode()) if isinstance(output, str) else 0
+                stats.calls += 1
+                stats.errors += failed
+                stats.seconds += elapsed
+                stats.max_seconds = max(stats.max_seconds, elapsed)
+                stats.upstream_calls += record.upstream_calls
+                stats.upstream_seconds += record.upstream_seconds
+                stats.output_bytes += size
+                stats.recent.append(elapsed)
+                if elapsed * 1000 >= self.slow_ms:
+                    stats.slow_calls += 1
+                    logger.warning(
+                        "slow tool call %s(%s): %.0f ms total, %d upstream calls %.0f ms, %d bytes out%s",
+                        name,
+                        ", ".join([repr(a) for a in args] + [f"{k}={v!r}" for k, v in kwargs.items()]),
+                        elapsed * 1000, record.upstream_calls, record.upstream_seconds * 1000,
+                        size, " (error)" if failed else "",
+                    )
+
+        return wrapper
+
+    def tool(self, mcp):
+        """Drop-in for `@mcp.tool()` that also instruments the function"""
+        def decorator(fn):
+            return mcp.tool()(self.wrap(fn))
+        return decorator
+
+    # ---------- upstream HTTP ----------
+
+    @staticmethod
+    async def _on_request(request: httpx.Request):
+        if _current_call.get() is not None:
+            request.extensions["tool_started"] = time.perf_counter()
+
+    @staticmethod
+    async def _on_response(response: httpx.Response):
+        record = _current_call.get()
+        started = response.request.extensions.get("tool_started")
+        if record is None or started is None:
+            return
+        # Hooks run once headers arrive; include the body download in upstream time
+        await response.aread()
+        record.upstream_calls += 1
+        record.upstream_seconds += time.perf_counter() - started
+
+    def event_hooks(self) -> dict:
+        return {"request": [self._on_request], "response": [self._on_response]}
+
+    # ---------- reporting ----------
+
+    def summary(self) -> dict:
+        return {
+            name: {
+                "calls": s.calls,
+                "errors": s.errors,
+                "slow_calls": s.slow_calls,
+                "avg_ms": round(s.seconds / s.calls * 1000, 2) if s.calls else 0.0,
+                "p50_ms": round(s.percentile(50) * 1000, 2),
+                "p95_ms": round(s.percentile(95) * 1000, 2),
+                "max_ms": round(s.max_seconds * 1000, 2),
+                "avg_upstream_calls": round(s.upstream_calls / s.calls, 2) if s.calls else 0.0,
+                "avg_upstream_ms": round(s.upstream_seconds / s.calls * 1000, 2) if s.calls else 0.0,
+                "avg_output_bytes": round(s.output_bytes / s.calls) if s.calls else 0,
+            }
+            for name, s in sorted(self.tools.items())
+            if s.calls
+        }
+
+    def render_prometheus(self, prefix: str = "shelfsense_mcp") -> str:
+        series = [
+            ("tool_calls_total", "counter", "Tool invocations.", lambda s: s.calls),
+            ("tool_errors_total", "counter", "Tool invocations that returned or raised an error.", lambda s: s.errors),
+            ("tool_slow_calls_total", "counter", f"Tool invocations slower than {self.slow_ms:g} ms.", lambda s: s.slow_calls),
+            ("tool_duration_seconds_total", "counter", "Total time spent in the tool.", lambda s: s.seconds),
+            ("tool_upstream_calls_total", "counter", "HTTP requests made to the ShelfSense API.", lambda s: s.upstream_calls),
+            ("tool_upstream_seconds_total", "counter", "Time spent waiting on the ShelfSense API.", lambda s: s.upstream_seconds),
+            ("tool_output_bytes_total", "counter", "UTF-8 bytes returned to the MCP client.", lambda s: s.output_bytes),
+            ("tool_duration_seconds_max", "gauge", "Slowest call since start.", lambda s: s.max_seconds),
+        ]
+        out = []
+        for name, kind, help_text, read in series:
+            out += [f"# HELP {prefix}_{name} {help_text}", f"# TYPE {prefix}_{name} {kind}"]
+            out += [f'{prefix}_{name}{{tool="{tool}"}} {read(s)}' for tool, s in sorted(self.tools.items())]
+        return "\n".join(out) + "\n"
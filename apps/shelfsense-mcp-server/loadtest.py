@@ -0,0 +1,278 @@
+"""Load-test harness that replays weighted MCP tool mixes against the ShelfSense API.
+
+Each request is a real MCP tool function from server.py (so response formatting
+is included), issued against a running API. Arrivals are either open-loop at a
+fixed Poisson rate (--rate) or closed-loop with N concurrent sessions. The
+request schedule is derived from --seed and can be saved and replayed exactly.
+
+    python loadtest.py --duration 30 --concurrency 16
+    python loadtest.py --rate 50 --duration 60 --save-schedule peak.jsonl
+    python loadtest.py --schedule peak.jsonl --json results.json
+    python loadtest.py --mix get_pick_list=10,get_real_time_insights=3
+    python loadtest.py --record tools.jsonl                 # archive API responses...
+    python loadtest.py --replay tools.jsonl --latency-ms 5  # ...and rerun without the API
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import httpx
+
+import server
+from replay import archive_transport
+
+
+# Relative frequency of each tool in a ChatGPT session, roughly what we see:
+# pick lists and the real-time overview dominate, network-wide views are rarer
+DEFAULT_MIX = {
+    "get_pick_list": 20,
+    "get_real_time_insights": 12,
+    "get_inventory_status": 10,
+    "get_alerts": 10,
+    "get_top_performers": 8,
+    "get_demand_forecast": 8,
+    "get_critical_alerts": 6,
+    "get_stockout_risks": 6,
+    "get_all_pick_lists": 5,
+    "get_trends": 5,
+    "get_anomalies": 4,
+    "get_product_performance": 4,
+    "get_analytics_summary": 4,
+    "explain_pick_quantity": 3,
+    "get_locations": 3,
+    "get_model_accuracy": 2,
+}
+
+_ID_SEGMENT = re.compile(r"/(loc|prod|alert)_[^/]+")
+
+
+def endpoint_template(path: str) -> str:
+    """/api/locations/loc_westin_sf -> /api/locations/{loc_id}"""
+    return _ID_SEGMENT.sub(lambda m: "/{" + m.group(1) + "_id}", path)
+
+
+def tool_arguments(tool: str, rng: random.Random, locations: list, products: list) -> dict:
+    """Plausible arguments for a tool call, biased toward location-scoped requests"""
+    location = rng.choice(locations)
+    product = rng.choice(products)
+    date = (datetime.now() + timedelta(days=rng.choice([0, 0, 0, 1]))).strftime("%Y-%m-%d")
+    maybe_location = location["id"] if rng.random() < 0.7 else None
+
+    if tool == "get_pick_list":
+        return {"location_id": location["id"], "date": date}
+    if tool == "get_all_pick_lists":
+        return {"date": date}
+    if tool == "get_demand_forecast":
+        return {"location_id": location["id"], "product_id": product["id"] if rng.random() < 0.5 else None,
+                "horizon_days": rng.choice([None, None, 7])}
+    if tool == "explain_pick_quantity":
+        return {"location_id": location["id"], "product_name": product["name"]}
+    if tool == "get_top_performers":
+        return {"location_id": maybe_location, "limit": rng.choice([5, 10, 20])}
+    if tool == "get_locations":
+        return {}
+    if tool == "get_analytics_summary":
+        return {}
+    return {"location_id": maybe_location}
+
+
+def build_schedule(mix: dict, count: int, rate, seed: int, locations: list, products: list) -> list:
+    """[(arrival offset in seconds or None for closed-loop, tool, kwargs)]"""
+    rng = random.Random(seed)
+    tools = list(mix)
+    weights = [mix[t] for t in tools]
+    schedule = []
+    offset = 0.0
+    for _ in range(count):
+        tool = rng.choices(tools, weights)[0]
+        if rate:
+            offset += rng.expovariate(rate)
+        schedule.append((round(offset, 6) if rate else None, tool, tool_arguments(tool, rng, locations, products)))
+    return schedule
+
+
+class Stats:
+    """Latency samples and error counts keyed by name"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, name: str, seconds: float, error: bool = False):
+        self.samples[name].append(seconds * 1000)
+        if error:
+            self.errors[name] += 1
+
+    def clear(self):
+        self.samples.clear()
+        self.errors.clear()
+
+    def report(self, elapsed: float) -> dict:
+        result = {}
+        for name, samples in sorted(self.samples.items()):
+            ordered = sorted(samples)
+            n = len(ordered)
+            pick = lambda pct: ordered[min(n - 1, int(pct / 100 * n))]
+            result[name] = {
+                "count": n,
+                "errors": self.errors[name],
+                "error_rate": round(self.errors[name] / n, 4),
+                "throughput_rps": round(n / elapsed, 2) if elapsed else 0.0,
+                "p50_ms": round(pick(50), 2),
+                "p90_ms": round(pick(90), 2),
+                "p99_ms": round(pick(99), 2),
+                "max_ms": round(ordered[-1], 2),
+            }
+        return result
+
+
+def instrumented_client(base_url: str, concurrency: int, endpoint_stats: Stats,
+                        transport: httpx.AsyncBaseTransport = None) -> server.ShelfSenseClient:
+    """A ShelfSenseClient whose HTTP calls are timed per endpoint template"""
+
+    async def on_request(request):
+        request.extensions["loadtest_started"] = time.perf_counter()
+
+    async def on_response(response):
+        started = response.request.extensions.get("loadtest_started")
+        if started is not None:
+            name = f"{response.request.method} {endpoint_template(response.request.url.path)}"
+            endpoint_stats.record(name, time.perf_counter() - started, error=response.status_code >= 400)
+
+    client = server.ShelfSenseClient(base_url)
+    client.client = httpx.AsyncClient(
+        timeout=30.0,
+        limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        event_hooks={"request": [on_request], "response": [on_response]},
+        transport=transport,
+    )
+    return client
+
+
+async def run_schedule(schedule: list, concurrency: int, tool_stats: Stats) -> float:
+    """Issue every scheduled tool call; returns wall-clock seconds"""
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.perf_counter()
+
+    async def call(tool: str, kwargs: dict):
+        async with semaphore:
+            t0 = time.perf_counter()
+            try:
+                output = await getattr(server, tool)(**kwargs)
+                failed = isinstance(output, str) and output.startswith("Error:")
+            except Exception:
+                failed = True
+            tool_stats.record(tool, time.perf_counter() - t0, error=failed)
+
+    if schedule and schedule[0][0] is not None:
+        # Open loop: fire at the scheduled offsets regardless of completions
+        tasks = []
+        for offset, tool, kwargs in schedule:
+            delay = offset - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(call(tool, kwargs)))
+        await asyncio.gather(*tasks)
+    else:
+        # Closed loop: `concurrency` sessions each take the next call when done
+        queue = iter(schedule)
+
+        async def session():
+            for _, tool, kwargs in queue:
+                await call(tool, kwargs)
+
+        await asyncio.gather(*(session() for _ in range(concurrency)))
+
+    return time.perf_counter() - started
+
+
+def print_table(title: str, report: dict):
+    print(f"\n{title}")
+    print(f"{'name':<48} {'count':>7} {'err%':>6} {'rps':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}")
+    for name, row in report.items():
+        print(
+            f"{name:<48} {row['count']:>7} {row['error_rate'] * 100:>6.1f} {row['throughput_rps']:>8.1f} "
+            f"{row['p50_ms']:>8.1f} {row['p90_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['max_ms']:>8.1f}"
+        )
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        tool, _, weight = part.partition("=")
+        tool = tool.strip()
+        if tool not in DEFAULT_MIX:
+            raise SystemExit(f"Unknown tool in --mix: {tool}")
+        mix[tool] = float(weight or 1)
+    return mix
+
+
+async def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--api-url", default=os.getenv("SHELFSENSE_API_URL", "http://localhost:8000"))
+    parser.add_argument("--concurrency", type=int, default=8, help="Closed-loop sessions, or max in-flight for --rate")
+    parser.add_argument("--rate", type=float, help="Open-loop arrival rate (tool calls per second)")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load (with --rate)")
+    parser.add_argument("--requests", type=int, help="Total tool calls (default: rate*duration, or 500)")
+    parser.add_argument("--mix", help="Tool weights, e.g. get_pick_list=10,get_alerts=2 (default: built-in mix)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save-schedule", help="Write the generated schedule as JSON lines")
+    parser.add_argument("--schedule", help="Replay a saved schedule instead of generating one")
+    parser.add_argument("--json", help="Write the report as JSON")
+    parser.add_argument("--record", default=os.getenv("SHELFSENSE_RECORD"), help="Append API responses to this archive")
+    parser.add_argument("--replay", default=os.getenv("SHELFSENSE_REPLAY"), help="Answer from this archive instead of the API")
+    parser.add_argument("--latency-ms", default=os.getenv("SHELFSENSE_REPLAY_LATENCY_MS"),
+                        help="Replay delay per request in ms, or 'recorded' (default: none)")
+    args = parser.parse_args(argv)
+
+    endpoint_stats, tool_stats = Stats(), Stats()
+    transport = archive_transport(args.record, args.replay, args.latency_ms)
+    server.shelfsense = instrumented_client(args.api_url, args.concurrency, endpoint_stats, transport)
+
+    if args.schedule:
+        with open(args.schedule) as f:
+            schedule = [tuple(json.loads(line)) for line in f if line.strip()]
+    else:
+        # Through the tool client, so a recording includes them for a replayed run
+        locations = await server.shelfsense.get_locations()
+        products = await server.shelfsense.get_products()
+        endpoint_stats.clear()
+        count = args.requests or (int(args.rate * args.duration) if args.rate else 500)
+        mix = parse_mix(args.mix) if args.mix else DEFAULT_MIX
+        schedule = build_schedule(mix, count, args.rate, args.seed, locations, products)
+
+    if args.save_schedule:
+        with open(args.save_schedule, "w") as f:
+            for entry in schedule:
+                f.write(json.dumps(entry) + "\n")
+
+    mode = f"open loop at {args.rate}/s" if schedule and schedule[0][0] is not None else "closed loop"
+    target = f"archive {args.replay}" if args.replay else args.api_url
+    print(f"Running {len(schedule)} tool calls against {target} ({mode}, concurrency {args.concurrency})")
+    elapsed = await run_schedule(schedule, args.concurrency, tool_stats)
+
+    tools = tool_stats.report(elapsed)
+    endpoints = endpoint_stats.report(elapsed)
+    total = sum(row["count"] for row in tools.values())
+    errors = sum(row["errors"] for row in tools.values())
+    print(f"\n{total} tool calls in {elapsed:.1f}s: {total / elapsed:.1f} calls/s, error rate {errors / max(total, 1):.2%}")
+    print_table("Per tool (ms)", tools)
+    print_table("Per API endpoint (ms)", endpoints)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"elapsed_seconds": elapsed, "tools": tools, "endpoints": endpoints}, f, indent=2)
+
+    await server.shelfsense.client.aclose()
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
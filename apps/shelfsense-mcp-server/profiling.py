@@ -0,0 +1,149 @@
+"""Opt-in profiling of individual MCP tool calls.
+
+Disabled unless PROFILE_TOKENS is set. Tool calls arrive over the MCP SSE
+session rather than as separate HTTP requests, so profiling is armed over HTTP
+and applied to the next call of the named tool:
+
+    curl -X POST -H "X-Profile: $TOKEN" "localhost:8001/profile/arm?tool=get_all_pick_lists"
+    # ... call the tool from ChatGPT or the MCP Inspector ...
+    curl -H "X-Profile: $TOKEN" "localhost:8001/profile/latest"
+
+Modes match the Mock API: `sample` (default) writes collapsed stacks (`.folded`)
+for flamegraph.pl or speedscope, `cprofile` writes a `.prof` file. Profiles are
+saved under PROFILE_DIR.
+"""
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+
+
+PROFILE_TOKENS = [t for t in os.getenv("PROFILE_TOKENS", "").split(",") if t]
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles"))
+SAMPLE_INTERVAL_SECONDS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", 1)) / 1000
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack from a background thread"""
+
+    extension = "folded"
+
+    def __init__(self, thread_id: Optional[int] = None, interval: float = SAMPLE_INTERVAL_SECONDS):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _label(code) -> str:
+        return f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+
+    def _run(self):
+        while not self._stop.is_set():
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def render(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def save(self, path: str):
+        with open(path, "w") as f:
+            f.write(self.render())
+
+
+class DeterministicProfiler:
+    """cProfile of everything run on the calling thread while enabled"""
+
+    extension = "prof"
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def render(self, limit: int = 60) -> str:
+        out = io.StringIO()
+        pstats.Stats(self.profile, stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+    def save(self, path: str):
+        self.profile.dump_stats(path)
+
+
+PROFILERS = {"sample": SamplingProfiler, "cprofile": DeterministicProfiler}
+
+
+def profile_path(directory: str, label: str, extension: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", label).strip("_") or "tool"
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    return os.path.join(directory, f"{stamp}-{slug}.{extension}")
+
+
+class ToolProfiler:
+    """Profiles the next call of each armed tool"""
+
+    def __init__(self, tokens=None, output_dir: str = PROFILE_DIR):
+        self.tokens = PROFILE_TOKENS if tokens is None else tokens
+        self.output_dir = output_dir
+        self.armed = {}
+        self.active = False
+        self.latest_path: Optional[str] = None
+        self.latest_text: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.tokens)
+
+    def authorized(self, token: Optional[str]) -> bool:
+        return bool(token) and any(hmac.compare_digest(token.encode(), allowed.encode()) for allowed in self.tokens)
+
+    def arm(self, tool: str, mode: str = "sample"):
+        if mode not in PROFILERS:
+            raise ValueError(f"Unknown profile mode: {mode}")
+        self.armed[tool] = mode
+
+    def begin(self, tool: str):
+        """A started profiler if this call should be profiled, else None"""
+        # cProfile can't nest, and concurrent samples would mix calls
+        if self.active or tool not in self.armed:
+            return None
+        self.active = True
+        profiler = PROFILERS[self.armed.pop(tool)]()
+        profiler.start()
+        return profiler
+
+    def end(self, tool: str, profiler) -> str:
+        profiler.stop()
+        self.active = False
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = profile_path(self.output_dir, tool, profiler.extension)
+        profiler.save(path)
+        self.latest_path = path
+        self.latest_text = profiler.render()
+        return path
@@ -0,0 +1,133 @@
+"""Record ShelfSense API traffic to an archive and replay it without the API.
+
+Tool benchmarks otherwise need a running Mock API, whose responses are random.
+Both modes are httpx transports under ShelfSenseClient's AsyncClient, so event
+hooks, instrumentation and response decoding behave exactly as they do live:
+
+- RecordingTransport forwards each request and appends it, with the raw
+  response (still compressed, as sent) and its upstream time, to a JSON lines
+  archive. Server-sent event streams are passed through unrecorded.
+- ReplayTransport answers from that archive with no network. Requests match
+  on method, path, sorted query parameters and body (not host), and repeated
+  requests get their recorded responses in order, cycling. Latency is none by
+  default, a fixed delay, or each response's recorded upstream time.
+
+    SHELFSENSE_RECORD=tools.jsonl python loadtest.py --requests 500
+    SHELFSENSE_REPLAY=tools.jsonl SHELFSENSE_REPLAY_LATENCY_MS=recorded python loadtest.py --requests 500
+"""
+from collections import defaultdict
+from typing import Dict, List, Optional, Union
+from urllib.parse import urlencode
+import asyncio
+import base64
+import hashlib
+import json
+import time
+
+import httpx
+
+
+# Response headers worth keeping: the rest describe the original connection
+RECORDED_HEADERS = ("content-type", "content-encoding")
+
+
+def request_key(request: httpx.Request) -> str:
+    """Host-independent identity of a request, e.g. "GET /api/pick-list?date=...&location_id=..." """
+    key = f"{request.method} {request.url.path}"
+    params = sorted(request.url.params.multi_items())
+    if params:
+        key += "?" + urlencode(params)
+    if request.content:
+        key += " " + hashlib.sha1(request.content).hexdigest()
+    return key
+
+
+def parse_latency(value: Optional[str]) -> Union[None, str, float]:
+    """SHELFSENSE_REPLAY_LATENCY_MS: unset or 0 -> None, "recorded", or milliseconds -> seconds"""
+    if not value or value == "0":
+        return None
+    if value == "recorded":
+        return value
+    return float(value) / 1000
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """Forwards requests and appends each exchange to an archive"""
+
+    def __init__(self, path: str, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.path = path
+        self.transport = transport or httpx.AsyncHTTPTransport()
+        self._archive = open(path, "a", encoding="utf-8")
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        response = await self.transport.handle_async_request(request)
+        if response.headers.get("content-type", "").startswith("text/event-stream"):
+            return response
+        try:
+            body = b"".join([chunk async for chunk in response.aiter_raw()])
+        finally:
+            await response.aclose()
+        elapsed = time.perf_counter() - started
+
+        self._archive.write(json.dumps({
+            "request": request_key(request),
+            "status": response.status_code,
+            "headers": {name: response.headers[name] for name in RECORDED_HEADERS if name in response.headers},
+            "body": base64.b64encode(body).decode(),
+            "elapsed": round(elapsed, 6),
+        }) + "\n")
+        self._archive.flush()
+        return httpx.Response(
+            response.status_code, headers=response.headers, stream=httpx.ByteStream(body),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self):
+        self._archive.close()
+        await self.transport.aclose()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """Answers requests from an archive written by RecordingTransport"""
+
+    def __init__(self, path: str, latency: Union[None, str, float] = None):
+        self.path = path
+        # None, a fixed delay in seconds, or "recorded" for each response's upstream time
+        self.latency = latency
+        self.responses: Dict[str, List[dict]] = defaultdict(list)
+        self._next: Dict[str, int] = defaultdict(int)
+        with open(path, encoding="utf-8") as archive:
+            for line in archive:
+                if line.strip():
+                    entry = json.loads(line)
+                    entry["body"] = base64.b64decode(entry["body"])
+                    self.responses[entry["request"]].append(entry)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = request_key(request)
+        recorded = self.responses.get(key)
+        if not recorded:
+            if request.url.path in ("/health", "/ready"):
+                # The archive stands in for the API, and it is always ready
+                return httpx.Response(200, json={"status": "replay", "archive": self.path})
+            return httpx.Response(404, json={"detail": f"No recorded response for {key}"})
+
+        entry = recorded[self._next[key] % len(recorded)]
+        self._next[key] += 1
+        delay = entry["elapsed"] if self.latency == "recorded" else self.latency
+        if delay:
+            await asyncio.sleep(delay)
+        return httpx.Response(entry["status"], headers=entry["headers"], stream=httpx.ByteStream(entry["body"]))
+
+
+def archive_transport(record: Optional[str] = None, replay: Optional[str] = None,
+                      latency: Optional[str] = None) -> Optional[httpx.AsyncBaseTransport]:
+    """Transport for SHELFSENSE_RECORD / SHELFSENSE_REPLAY, or None to talk to the API directly"""
+    if record and replay:
+        raise ValueError("set SHELFSENSE_RECORD or SHELFSENSE_REPLAY, not both")
+    if record:
+        return RecordingTransport(record)
+    if replay:
+        return ReplayTransport(replay, parse_latency(latency))
+    return None
@@ -1,29 +1,42 @@
 """ShelfSense MCP Server - Expose ShelfSense functionality to ChatGPT via HTTP/SSE"""
 import asyncio
 import os
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 from typing import Optional, Any
 import httpx
 import json
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse
 from mcp.server.fastmcp import FastMCP
 from mcp.server.sse import SseServerTransport
 from starlette.applications import Starlette
 from starlette.routing import Mount, Route
 import uvicorn
 
+from compression import CompressedBodyCache, CompressionMiddleware
+from instrumentation import ToolInstrumentation
+from profiling import PROFILERS, ToolProfiler
+from replay import archive_transport
+
 
 # API Base URL - will be set to Railway URL after deployment
 API_BASE_URL = os.getenv("SHELFSENSE_API_URL", "http://localhost:8000")
 
+# Record upstream traffic to an archive, or answer from one without the API (see replay.py)
+RECORD_PATH = os.getenv("SHELFSENSE_RECORD")
+REPLAY_PATH = os.getenv("SHELFSENSE_REPLAY")
+
 
 class ShelfSenseClient:
     """Client to interact with ShelfSense Mock API"""
 
-    def __init__(self, base_url: str):
+    def __init__(self, base_url: str, event_hooks: Optional[dict] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
         self.base_url = base_url
-        self.client = httpx.AsyncClient(timeout=30.0)
+        self.client = httpx.AsyncClient(timeout=30.0, event_hooks=event_hooks, transport=transport)
 
     async def get_locations(self, location_type: Optional[str] = None) -> list:
         """Get all locations"""
@@ -51,6 +64,23 @@ class ShelfSenseClient:
         response.raise_for_status()
         return response.json()
 
+    async def search_products(self, query: str, limit: int = 10, category: Optional[str] = None) -> list:
+        """Products ranked by how well they match a free-text name"""
+        params = {"q": query, "limit": limit}
+        if category:
+            params["category"] = category
+
+        response = await self.client.get(f"{self.base_url}/api/products/search", params=params)
+        response.raise_for_status()
+        return response.json()
+
+    async def resolve_product_id(self, product: Optional[str]) -> Optional[str]:
+        """A product id as given, or the best search match for a free-text name"""
+        if not product or product.startswith("prod_"):
+            return product
+        matches = await self.search_products(product, limit=1)
+        return matches[0]["id"] if matches else product
+
     async def get_pick_list(self, location_id: str, date: Optional[str] = None) -> dict:
         """Get pick list for a location"""
         params = {"location_id": location_id}
@@ -75,14 +105,18 @@ class ShelfSenseClient:
         self,
         location_id: str,
         product_id: Optional[str] = None,
-        forecast_date: Optional[str] = None
-    ) -> list:
-        """Get demand forecast"""
+        forecast_date: Optional[str] = None,
+        horizon_days: Optional[int] = None
+    ):
+        """Get demand forecast. With horizon_days, a product x day matrix (columnar) starting at forecast_date"""
         params = {"location_id": location_id}
         if product_id:
             params["product_id"] = product_id
         if forecast_date:
             params["forecast_date"] = forecast_date
+        if horizon_days:
+            params["horizon_days"] = horizon_days
+            params["format"] = "columnar"
 
         response = await self.client.get(f"{self.base_url}/api/forecast/demand", params=params)
         response.raise_for_status()
@@ -231,15 +265,129 @@ class ShelfSenseClient:
         response.raise_for_status()
         return response.json()
 
+    async def get_transfer_recommendations(
+        self,
+        location_id: Optional[str] = None,
+        product_id: Optional[str] = None,
+        limit: int = 20
+    ) -> dict:
+        """Get ranked stock transfer recommendations"""
+        params = {"limit": limit}
+        if location_id:
+            params["location_id"] = location_id
+        if product_id:
+            params["product_id"] = product_id
+
+        response = await self.client.get(f"{self.base_url}/api/transfers/recommendations", params=params)
+        response.raise_for_status()
+        return response.json()
+
+
+class AlertMirror:
+    """Local copy of active alerts, kept current from the API's alert stream.
+
+    The alert tools answer from this mirror instead of polling `/api/alerts`.
+    On reconnect the stream resumes from the last event id, so only missed
+    changes are transferred. Until the first snapshot arrives (or while the
+    stream is disconnected) the tools fall back to the HTTP endpoints.
+    """
+
+    SEVERITY_ORDER = {"critical": 0, "warning": 1, "info": 2}
+
+    def __init__(self, client: ShelfSenseClient):
+        self.client = client
+        self.alerts: dict = {}
+        self.resume_token: Optional[int] = None
+        self.synced = False
+
+    def apply(self, event: str, data: dict):
+        if event == "snapshot":
+            self.alerts = {alert["id"]: alert for alert in data["alerts"]}
+            self.synced = True
+        elif event == "resolved":
+            self.alerts.pop(data["alert"]["id"], None)
+        elif event in ("created", "updated", "acknowledged"):
+            self.alerts[data["alert"]["id"]] = data["alert"]
+        self.resume_token = data.get("resume_token", self.resume_token)
+
+    async def run(self):
+        """Consume the stream forever, reconnecting with backoff"""
+        backoff = 1.0
+        while True:
+            params = {}
+            if self.resume_token is not None:
+                params["resume_token"] = self.resume_token
+            try:
+                async with self.client.client.stream(
+                    "GET", f"{self.client.base_url}/api/alerts/stream", params=params, timeout=None
+                ) as response:
+                    response.raise_for_status()
+                    backoff = 1.0
+                    # A resumed stream sends only the missed changes, no snapshot:
+                    # the mirror is current again once the API accepts the token
+                    if "resume_token" in params:
+                        self.synced = True
+                    event, data = None, None
+                    async for line in response.aiter_lines():
+                        if line.startswith("event: "):
+                            event = line[7:]
+                        elif line.startswith("data: "):
+                            data = json.loads(line[6:])
+                        elif not line and event and data is not None:
+                            self.apply(event, data)
+                            event, data = None, None
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.synced = False
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    def summary(
+        self,
+        location_id: Optional[str] = None,
+        alert_type: Optional[str] = None,
+        severity: Optional[str] = None
+    ) -> Optional[dict]:
+        """Same shape as the `/api/alerts` response, or None if not synced"""
+        if not self.synced:
+            return None
+
+        alerts = [
+            alert for alert in self.alerts.values()
+            if (not location_id or alert.get("location_id") == location_id)
+            and (not alert_type or alert["alert_type"] == alert_type)
+            and (not severity or alert["severity"] == severity)
+        ]
+        alerts.sort(key=lambda a: self.SEVERITY_ORDER.get(a["severity"], 3))
+        return {
+            "total_alerts": len(alerts),
+            "critical_count": sum(1 for a in alerts if a["severity"] == "critical"),
+            "warning_count": sum(1 for a in alerts if a["severity"] == "warning"),
+            "info_count": sum(1 for a in alerts if a["severity"] == "info"),
+            "alerts": alerts,
+            "locations_affected": len(set(a["location_id"] for a in alerts if a.get("location_id"))),
+            "products_affected": len(set(a["product_id"] for a in alerts if a.get("product_id"))),
+        }
+
 
 # Initialize MCP server and API client
 mcp = FastMCP("shelfsense-mcp-server")
-shelfsense = ShelfSenseClient(API_BASE_URL)
+tool_profiler = ToolProfiler()
+instrumentation = ToolInstrumentation(profiler=tool_profiler)
+instrumented_tool = instrumentation.tool(mcp)
+shelfsense = ShelfSenseClient(
+    API_BASE_URL, event_hooks=instrumentation.event_hooks(),
+    transport=archive_transport(RECORD_PATH, REPLAY_PATH, os.getenv("SHELFSENSE_REPLAY_LATENCY_MS")),
+)
+alert_mirror = AlertMirror(shelfsense)
+# Alert tools poll over HTTP while recording or replaying, so their calls are archived
+ALERT_STREAM_ENABLED = os.getenv("SHELFSENSE_ALERT_STREAM", "1") == "1" and not (RECORD_PATH or REPLAY_PATH)
 
 
 # ==================== MCP Tools ====================
 
-@mcp.tool()
+@instrumented_tool
 async def get_locations(location_type: str = None) -> str:
     """Get all micromarket locations (hotels, offices, airports, hospitals). Optionally filter by type."""
     try:
@@ -249,7 +397,23 @@ async def get_locations(location_type: str = None) -> str:
         return f"Error: {str(e)}"
 
 
-@mcp.tool()
+@instrumented_tool
+async def search_products(query: str, category: str = None, limit: int = 5) -> str:
+    """Find products by free-text name, supplier or category. Tolerates typos and partial names, e.g. "redbull", "frapuccino" or "coke"."""
+    try:
+        data = await shelfsense.search_products(query, limit, category)
+        if not data:
+            return f"No products match '{query}'"
+
+        summary = f"# Products matching '{query}'\n\n"
+        for product in data:
+            summary += f"- **{product['name']}** (`{product['id']}`): {product['category']}, {product.get('supplier') or 'no supplier'}, ${product['price']:.2f}\n"
+        return summary
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+
+@instrumented_tool
 async def get_pick_list(location_id: str, date: str = None) -> str:
     """Get the AI-generated pick list for restocking a specific micromarket location. Shows recommended quantities for each product based on demand forecasts."""
     try:
@@ -259,7 +423,7 @@ async def get_pick_list(location_id: str, date: str = None) -> str:
         return f"Error: {str(e)}"
 
 
-@mcp.tool()
+@instrumented_tool
 async def get_all_pick_lists(date: str = None) -> str:
     """Get pick lists for all locations at once. Useful for seeing the complete daily restocking plan."""
     try:
@@ -278,20 +442,41 @@ async def get_all_pick_lists(date: str = None) -> str:
         return f"Error: {str(e)}"
 
 
-@mcp.tool()
-async def get_demand_forecast(location_id: str, product_id: str = None, forecast_date: str = None) -> str:
-    """Get AI-powered demand forecast with confidence intervals (P10/P50/P90) for products at a location. Shows factors influencing the forecast like occupancy and events."""
+@instrumented_tool
+async def get_demand_forecast(location_id: str, product_id: str = None, forecast_date: str = None,
+                              horizon_days: int = None) -> str:
+    """Get AI-powered demand forecast with confidence intervals (P10/P50/P90) for products at a location. Shows factors influencing the forecast like occupancy and events. Set horizon_days (up to 90) to forecast that many consecutive days from forecast_date in one call, e.g. 7 to plan a week. The product_id can also be a product name."""
     try:
-        data = await shelfsense.get_demand_forecast(location_id, product_id, forecast_date)
-        return json.dumps(data, indent=2)
+        product_id = await shelfsense.resolve_product_id(product_id)
+        data = await shelfsense.get_demand_forecast(location_id, product_id, forecast_date, horizon_days)
+        if not horizon_days:
+            return json.dumps(data, indent=2)
+
+        dates = data['dates']
+        summary = f"# Demand Forecast: {data['location_name']}, {dates[0]} to {dates[-1]}\n\n"
+        summary += "P50 units per day (P10-P90 in parentheses)\n\n"
+        summary += "| Product | " + " | ".join(f"{date[5:]} {day[:3]}" for date, day in zip(dates, data['factors']['day_of_week'])) + " | Total P50 |\n"
+        summary += "|---" * (len(dates) + 2) + "|\n"
+        for k, name in enumerate(data['product_names']):
+            cells = [f"{p50} ({p10}-{p90})" for p10, p50, p90 in zip(data['p10'][k], data['p50'][k], data['p90'][k])]
+            summary += f"| {name} | " + " | ".join(cells) + f" | {sum(data['p50'][k])} |\n"
+
+        summary += "\n## Daily Factors\n"
+        for d, date in enumerate(dates):
+            event = data['factors']['special_events'][d] or "no events"
+            summary += (f"- {date}: {data['factors']['weather_impact'][d]} weather, {event}, "
+                        f"seasonality {data['factors']['seasonality_factor'][d]}\n")
+
+        return summary + "\n\nFull data:\n" + json.dumps(data)
     except Exception as e:
         return f"Error: {str(e)}"
 
 
-@mcp.tool()
+@instrumented_tool
 async def get_model_accuracy(location_id: str = None, product_id: str = None) -> str:
-    """Get machine learning model accuracy metrics showing how well forecasts match actual demand. Includes MAE, RMSE, and accuracy percentage."""
+    """Get machine learning model accuracy metrics showing how well forecasts match actual demand. Includes MAE, RMSE, and accuracy percentage. The product_id can also be a product name."""
     try:
+        product_id = await shelfsense.resolve_product_id(product_id)
         data = await shelfsense.get_model_accuracy(location_id, product_id)
 
         if data:
@@ -306,7 +491,7 @@ async def get_model_accuracy(location_id: str = None, product_id: str = None) ->
         return f"Error: {str(e)}"
 
 
-@mcp.tool()
+@instrumented_tool
 async def get_inventory_status(location_id: str = None, status_filter: str = None) -> str:
     """Get current inventory levels and status (optimal, low, critical, overstock) across products and locations."""
     try:
@@ -327,7 +512,7 @@ async def get_inventory_status(location_id: str = None, status_filter: str = Non
         return f"Error: {str(e)}"
 
 
-@mcp.tool()
+@instrumented_tool
 async def get_analytics_summary() -> str:
     """Get overall analytics summary including total locations, forecast accuracy, stockout risks, and top-selling products."""
     try:
@@ -358,22 +543,29 @@ async def get_analytics_summary() -> str:
         return f"Error: {str(e)}"
 
 
-@mcp.tool()
+@instrumented_tool
 async def explain_pick_quantity(location_id: str, product_name: str, date: str = None) -> str:
-    """Get a detailed explanation for why a specific quantity was recommended for a product at a location."""
+    """Get a detailed explanation for why a specific quantity was recommended for a product at a location. The product name can be approximate, e.g. "redbull" or "frapuccino"."""
     try:
         pick_list = await shelfsense.get_pick_list(location_id, date)
 
-        # Find the product
+        # Find the product: exact name first, else the best search match on the pick list
         item = next(
             (item for item in pick_list["items"] if item["product_name"].lower() == product_name.lower()),
             None
         )
+        if not item:
+            # Only matches close to the best one, so "Red Bull Energy" never falls
+            # through to another energy drink that happens to be on the list
+            items = {item["product_id"]: item for item in pick_list["items"]}
+            matches = await shelfsense.search_products(product_name, limit=10)
+            close = [match for match in matches if match["score"] >= matches[0]["score"] * 0.75]
+            item = next((items[match["id"]] for match in close if match["id"] in items), None)
 
         if not item:
             return f"Product '{product_name}' not found in pick list for {location_id}"
 
-        explanation = f"""# Pick Quantity Explanation: {product_name}
+        explanation = f"""# Pick Quantity Explanation: {item['product_name']}
 
 **Location:** {item['location_name']}
 **Recommended Quantity:** {item['recommended_quantity']}
@@ -408,10 +600,11 @@ This ensures we maintain adequate inventory while minimizing stockouts.
 
 # ==================== NEW: Product Performance Tools ====================
 
-@mcp.tool()
+@instrumented_tool
 async def get_product_performance(location_id: str = None, product_id: str = None, category: str = None, performance_tier: str = None) -> str:
-    """Get product performance analytics including sales velocity, turnover rates, revenue, and performance scores. Filter by location, product, category, or tier (top_performer, average, underperformer, slow_mover)."""
+    """Get product performance analytics including sales velocity, turnover rates, revenue, and performance scores. Filter by location, product, category, or tier (top_performer, average, underperformer, slow_mover). The product_id can also be a product name."""
     try:
+        product_id = await shelfsense.resolve_product_id(product_id)
         data = await shelfsense.get_product_performance(location_id, product_id, category, performance_tier)
 
         if not data:
@@ -443,7 +636,7 @@ async def get_product_performance(location_id: str = None, product_id: str = Non
         return f"Error: {str(e)}"
 
 
-@mcp.tool()
+@instrumented_tool
 async def get_top_performers(location_id: str = None, limit: int = 10) -> str:
     """Get the top performing products ranked by performance score. Shows sales metrics, velocity, and revenue."""
     try:
@@ -471,10 +664,11 @@ async def get_top_performers(location_id: str = None, limit: int = 10) -> str:
 
 # ==================== NEW: Trend Detection Tools ====================
 
-@mcp.tool()
+@instrumented_tool
 async def get_trends(location_id: str = None, product_id: str = None, trend_direction: str = None) -> str:
-    """Get trend detection data showing week-over-week changes, seasonality patterns, and anomalies. Filter by direction: increasing, decreasing, or stable."""
+    """Get trend detection data showing week-over-week changes, seasonality patterns, and anomalies. Filter by direction: increasing, decreasing, or stable. The product_id can also be a product name."""
     try:
+        product_id = await shelfsense.resolve_product_id(product_id)
         data = await shelfsense.get_trends(location_id, product_id, trend_direction, None)
 
         if not data:
@@ -519,7 +713,7 @@ async def get_trends(location_id: str = None, product_id: str = None, trend_dire
         return f"Error: {str(e)}"
 
 
-@mcp.tool()
+@instrumented_tool
 async def get_anomalies(location_id: str = None, severity: str = None) -> str:
     """Get products with detected anomalies in sales patterns. Filter by severity: low, medium, or high."""
     try:
@@ -561,11 +755,11 @@ async def get_anomalies(location_id: str = None, severity: str = None) -> str:
 
 # ==================== NEW: Alerts Tools ====================
 
-@mcp.tool()
+@instrumented_tool
 async def get_alerts(location_id: str = None, alert_type: str = None, severity: str = None) -> str:
     """Get system alerts for stockouts, overstocks, anomalies, trends, and performance issues. Filter by type (stockout_risk, overstock, anomaly, trend_change, performance) or severity (critical, warning, info)."""
     try:
-        data = await shelfsense.get_alerts(location_id, alert_type, severity)
+        data = alert_mirror.summary(location_id, alert_type, severity) or await shelfsense.get_alerts(location_id, alert_type, severity)
 
         summary = f"# ShelfSense Alerts\n\n"
         summary += f"**Total Alerts:** {data['total_alerts']}\n"
@@ -594,11 +788,11 @@ async def get_alerts(location_id: str = None, alert_type: str = None, severity:
         return f"Error: {str(e)}"
 
 
-@mcp.tool()
+@instrumented_tool
 async def get_critical_alerts(location_id: str = None) -> str:
     """Get only critical severity alerts requiring immediate attention. These are urgent issues that need to be addressed now."""
     try:
-        data = await shelfsense.get_critical_alerts(location_id)
+        data = alert_mirror.summary(location_id, severity="critical") or await shelfsense.get_critical_alerts(location_id)
 
         if data['critical_count'] == 0:
             return "✅ No critical alerts at this time. All systems operating normally."
@@ -622,11 +816,11 @@ async def get_critical_alerts(location_id: str = None) -> str:
         return f"Error: {str(e)}"
 
 
-@mcp.tool()
+@instrumented_tool
 async def get_stockout_risks(location_id: str = None) -> str:
     """Get alerts for products at risk of stockout. Shows which products need immediate restocking attention."""
     try:
-        data = await shelfsense.get_stockout_alerts(location_id)
+        data = alert_mirror.summary(location_id, alert_type="stockout_risk") or await shelfsense.get_stockout_alerts(location_id)
 
         if data['total_alerts'] == 0:
             return "✅ No stockout risks detected. All products have adequate inventory levels."
@@ -649,12 +843,12 @@ async def get_stockout_risks(location_id: str = None) -> str:
         return f"Error: {str(e)}"
 
 
-@mcp.tool()
+@instrumented_tool
 async def get_real_time_insights(location_id: str = None) -> str:
     """Get a comprehensive real-time overview of stock insights, performance, and alerts for a location or all locations."""
     try:
         # Fetch multiple data sources
-        alerts_data = await shelfsense.get_alerts(location_id)
+        alerts_data = alert_mirror.summary(location_id) or await shelfsense.get_alerts(location_id)
         inventory_data = await shelfsense.get_inventory_status(location_id)
 
         summary = f"# Real-Time Stock Insights\n\n"
@@ -707,6 +901,37 @@ async def get_real_time_insights(location_id: str = None) -> str:
         return f"Error: {str(e)}"
 
 
+# ==================== Transfer Tools ====================
+
+@instrumented_tool
+async def get_transfer_recommendations(location_id: str = None, product_id: str = None, limit: int = 20) -> str:
+    """Recommend moving overstock between locations to cover stockout risks. Ranked by avoided stockout cost minus transfer cost. The product_id can also be a product name."""
+    try:
+        product_id = await shelfsense.resolve_product_id(product_id)
+        data = await shelfsense.get_transfer_recommendations(location_id, product_id, limit)
+
+        if data['total_transfers'] == 0:
+            return "✅ No worthwhile transfers. Overstock and stockout risks don't overlap for any product, or moving stock costs more than it saves."
+
+        summary = f"# Stock Transfer Recommendations\n\n"
+        summary += f"**{data['total_transfers']} transfers** moving {data['total_units']} units, "
+        summary += f"net benefit ${data['total_net_benefit']:.2f}\n\n"
+        if len(data['transfers']) < data['total_transfers']:
+            summary += f"Showing the top {len(data['transfers'])}.\n\n"
+
+        for i, t in enumerate(data['transfers'], 1):
+            summary += f"## {i}. {t['product_name']}: {t['quantity']} units\n"
+            summary += f"- **From:** {t['from_location_name']} ({t['from_stock']} in stock, overstocked)\n"
+            summary += f"- **To:** {t['to_location_name']} ({t['to_stock']} in stock, at risk)\n"
+            summary += f"- **Avoided stockout cost:** ${t['avoided_stockout_cost']:.2f}\n"
+            summary += f"- **Transfer cost:** ${t['transfer_cost']:.2f}\n"
+            summary += f"- **Net benefit:** ${t['net_benefit']:.2f}\n\n"
+
+        return summary
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+
 # ==================== SSE Transport Setup ====================
 
 def create_sse_server(mcp_server: FastMCP):
@@ -730,11 +955,32 @@ def create_sse_server(mcp_server: FastMCP):
     return Starlette(routes=routes)
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Keep the alert mirror current in the background instead of polling per tool call
+    task = asyncio.create_task(alert_mirror.run()) if ALERT_STREAM_ENABLED else None
+    yield
+    if task:
+        task.cancel()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="ShelfSense MCP Server",
     description="MCP server for ShelfSense inventory management - connects to ChatGPT via SSE",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
+)
+
+# Compresses JSON responses and the /sse stream that carries tool results
+compressed_bodies = CompressedBodyCache(int(float(os.getenv("COMPRESSION_CACHE_MB", 8)) * 1024 * 1024))
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.getenv("COMPRESSION_MIN_BYTES", 1024)),
+    gzip_level=int(os.getenv("COMPRESSION_GZIP_LEVEL", 6)),
+    brotli_quality=int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4)),
+    cache=compressed_bodies,
+    compress_streams=os.getenv("COMPRESS_STREAMS", "1") == "1",
 )
 
 
@@ -749,6 +995,7 @@ async def root():
         "api_backend": API_BASE_URL,
         "tools": [
             "get_locations",
+            "search_products",
             "get_pick_list",
             "get_all_pick_lists",
             "get_demand_forecast",
@@ -763,7 +1010,8 @@ async def root():
             "get_alerts",
             "get_critical_alerts",
             "get_stockout_risks",
-            "get_real_time_insights"
+            "get_real_time_insights",
+            "get_transfer_recommendations"
         ]
     }
 
@@ -774,8 +1022,97 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "api_backend": API_BASE_URL
+        "api_backend": API_BASE_URL,
+        "alert_stream": {
+            "synced": alert_mirror.synced,
+            "active_alerts": len(alert_mirror.alerts),
+            "resume_token": alert_mirror.resume_token,
+        },
+        "compression_cache": compressed_bodies.status(),
+        "tools": instrumentation.summary(),
+    }
+
+
+READY_CACHE_SECONDS = 5.0
+_upstream_ready = {"checked_at": float("-inf"), "ready": False, "detail": None}
+
+
+async def check_upstream_ready() -> dict:
+    """Whether the ShelfSense API is serving data, cached so probes don't hammer it"""
+    if time.monotonic() - _upstream_ready["checked_at"] < READY_CACHE_SECONDS:
+        return _upstream_ready
+    try:
+        response = await shelfsense.client.get(f"{shelfsense.base_url}/ready", timeout=2.0)
+        if response.status_code == 404:
+            # API build without a readiness probe: liveness is the best we have
+            response = await shelfsense.client.get(f"{shelfsense.base_url}/health", timeout=2.0)
+        ready, detail = response.status_code == 200, response.json()
+    except (httpx.HTTPError, ValueError) as e:
+        ready, detail = False, str(e)
+    _upstream_ready.update(checked_at=time.monotonic(), ready=ready, detail=detail)
+    return _upstream_ready
+
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 200 once the upstream API reports ready.
+
+    The alert mirror is reported but does not gate readiness; alert tools fall
+    back to polling the API until it has synced.
+    """
+    upstream = await check_upstream_ready()
+    body = {
+        "status": "ready" if upstream["ready"] else "waiting_for_api",
+        "api_backend": API_BASE_URL,
+        "api": upstream["detail"],
+        "alert_stream": {
+            "enabled": ALERT_STREAM_ENABLED,
+            "synced": alert_mirror.synced,
+        },
     }
+    return JSONResponse(body, status_code=200 if upstream["ready"] else 503)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Per-tool call, latency, upstream and output-size counters in Prometheus text format"""
+    return PlainTextResponse(instrumentation.render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def require_profile_token(token: Optional[str]):
+    if not tool_profiler.enabled:
+        raise HTTPException(status_code=404, detail="Profiling is disabled (set PROFILE_TOKENS)")
+    if not tool_profiler.authorized(token):
+        raise HTTPException(status_code=403, detail="Invalid profile token")
+
+
+@app.post("/profile/arm")
+async def arm_profile(
+    tool: str = Query(..., description="Tool whose next call is profiled"),
+    mode: str = Query("sample", description="sample (collapsed stacks) or cprofile"),
+    profile: Optional[str] = Query(None, description="Profile token (or X-Profile header)"),
+    x_profile: Optional[str] = Header(None)
+):
+    """Profile the next call of a tool"""
+    require_profile_token(x_profile or profile)
+    if tool not in instrumentation.tools:
+        raise HTTPException(status_code=404, detail=f"Tool {tool} not found")
+    if mode not in PROFILERS:
+        raise HTTPException(status_code=400, detail=f"Unknown mode {mode}")
+    tool_profiler.arm(tool, mode)
+    return {"armed": tool, "mode": mode}
+
+
+@app.get("/profile/latest", response_class=PlainTextResponse)
+async def latest_profile(
+    profile: Optional[str] = Query(None, description="Profile token (or X-Profile header)"),
+    x_profile: Optional[str] = Header(None)
+):
+    """The most recent tool profile (collapsed stacks or pstats report)"""
+    require_profile_token(x_profile or profile)
+    if tool_profiler.latest_text is None:
+        raise HTTPException(status_code=404, detail="No profile recorded yet")
+    return PlainTextResponse(tool_profiler.latest_text, headers={"X-Profile-File": tool_profiler.latest_path})
 
 
 # Mount the SSE server
@@ -1,8 +1,16 @@
 """Quick test script for ShelfSense MCP Server"""
 import asyncio
+import json
 import os
 import sys
-from server import ShelfSenseClient
+import tempfile
+
+import httpx
+
+from instrumentation import ToolInstrumentation
+from profiling import ToolProfiler
+from replay import RecordingTransport, ReplayTransport, request_key
+from server import AlertMirror, ShelfSenseClient
 
 
 async def test_mcp_client(api_url):
@@ -16,6 +24,8 @@ async def test_mcp_client(api_url):
         ("Get Products", client.get_products()),
         ("Get Pick List", client.get_pick_list("loc_westin_sf")),
         ("Get Analytics", client.get_analytics_summary()),
+        ("Search Products", client.search_products("red bull")),
+        ("Resolve Product Name", client.resolve_product_id("redbull energy")),
     ]
 
     passed = 0
@@ -44,7 +54,138 @@ async def test_mcp_client(api_url):
         return 1
 
 
+async def check_alert_mirror_resume():
+    alert = {"id": "a1", "severity": "warning", "alert_type": "low_stock", "location_id": "l", "product_id": "p"}
+    snapshot = f"event: snapshot\ndata: {json.dumps({'alerts': [alert], 'resume_token': 5})}\n\n".encode()
+
+    class Dropped(httpx.AsyncByteStream):
+        async def __aiter__(self):
+            yield snapshot
+            raise httpx.ReadError("connection reset")
+
+    class Idle(httpx.AsyncByteStream):
+        async def __aiter__(self):
+            await asyncio.Event().wait()
+            yield b""
+
+    requests = []
+
+    def upstream(request: httpx.Request) -> httpx.Response:
+        requests.append(dict(request.url.params))
+        stream = Dropped() if len(requests) == 1 else Idle()
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, stream=stream)
+
+    mirror = AlertMirror(ShelfSenseClient("http://api", transport=httpx.MockTransport(upstream)))
+    task = asyncio.ensure_future(mirror.run())
+    try:
+        while len(requests) < 2:
+            await asyncio.sleep(0.05)
+        await asyncio.sleep(0.05)
+        # Resumed after the drop: no new snapshot, yet the mirror serves again
+        assert requests == [{}, {"resume_token": "5"}]
+        assert mirror.synced and mirror.summary()["total_alerts"] == 1
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await mirror.client.client.aclose()
+
+
+async def check_tool_instrumentation():
+    instrumentation = ToolInstrumentation(slow_ms=float("inf"))
+    upstream = httpx.MockTransport(lambda request: httpx.Response(200, json=[{"id": "loc_1"}]))
+    client = ShelfSenseClient("http://api", event_hooks=instrumentation.event_hooks(), transport=upstream)
+
+    @instrumentation.wrap
+    async def list_locations() -> str:
+        hotels = await client.get_locations(location_type="hotel")
+        offices = await client.get_locations(location_type="office")
+        return json.dumps(hotels + offices)
+
+    @instrumentation.wrap
+    async def broken() -> str:
+        return "Error: API unavailable"
+
+    output = await list_locations()
+    await list_locations()
+    await broken()
+    # Requests made outside a tool call are not attributed to any tool
+    await client.get_locations()
+    await client.client.aclose()
+
+    summary = instrumentation.summary()
+    assert summary["list_locations"]["calls"] == 2 and summary["list_locations"]["errors"] == 0
+    assert summary["list_locations"]["avg_upstream_calls"] == 2
+    assert summary["list_locations"]["avg_output_bytes"] == len(output.encode())
+    assert summary["broken"]["errors"] == 1 and summary["broken"]["avg_upstream_calls"] == 0
+    metrics = instrumentation.render_prometheus()
+    assert 'shelfsense_mcp_tool_upstream_calls_total{tool="list_locations"} 4' in metrics
+
+
+async def check_profiling_tokens():
+    profiler = ToolProfiler(tokens=["secret"])
+    assert profiler.authorized("secret")
+    # Non-ASCII tokens are refused rather than raising TypeError
+    assert not profiler.authorized("sécret") and not profiler.authorized(None)
+
+
+async def check_record_replay():
+    def upstream(request: httpx.Request) -> httpx.Response:
+        upstream.calls += 1
+        body = json.dumps({"call": upstream.calls, "path": request.url.path}).encode()
+        # Unread, like a response off the network
+        return httpx.Response(200, headers={"content-type": "application/json"}, stream=httpx.ByteStream(body))
+    upstream.calls = 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = os.path.join(tmp, "tools.jsonl")
+        recorder = ShelfSenseClient("http://live:8000", transport=RecordingTransport(archive, httpx.MockTransport(upstream)))
+        await recorder.get_products(category="Snacks")
+        await recorder.get_products(category="Snacks")
+        await recorder.client.aclose()
+
+        # Replayed on another host, with no upstream, repeats cycling in order
+        replayer = ShelfSenseClient("http://elsewhere", transport=ReplayTransport(archive))
+        calls = [(await replayer.get_products(category="Snacks"))["call"] for _ in range(3)]
+        assert calls == [1, 2, 1] and upstream.calls == 2, calls
+        missing = await replayer.client.get("http://elsewhere/api/locations")
+        assert missing.status_code == 404
+        await replayer.client.aclose()
+
+    # Query parameters match regardless of order
+    assert request_key(httpx.Request("GET", "http://a/x?b=2&a=1")) == request_key(httpx.Request("GET", "http://b/x?a=1&b=2"))
+
+
+async def test_offline():
+    """Checks that need no API"""
+    print("Checking ShelfSense MCP Server modules\n")
+
+    checks = [
+        ("Alert Mirror Resume", check_alert_mirror_resume()),
+        ("Tool Instrumentation", check_tool_instrumentation()),
+        ("Profiling Tokens", check_profiling_tokens()),
+        ("Record and Replay", check_record_replay()),
+    ]
+
+    passed = 0
+    failed = 0
+
+    for name, coro in checks:
+        try:
+            await coro
+            print(f"✅ {name}: OK")
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {name}: Failed {e}")
+            failed += 1
+        except Exception as e:
+            print(f"❌ {name}: Error - {e!r}")
+            failed += 1
+
+    print(f"\nResults: {passed} passed, {failed} failed\n")
+    return 0 if failed == 0 else 1
+
+
 if __name__ == "__main__":
     api_url = sys.argv[1] if len(sys.argv) > 1 else os.getenv("SHELFSENSE_API_URL", "http://localhost:8000")
-    exit_code = asyncio.run(test_mcp_client(api_url))
+    exit_code = asyncio.run(test_offline()) | asyncio.run(test_mcp_client(api_url))
     sys.exit(exit_code)
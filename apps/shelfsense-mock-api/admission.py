@@ -0,0 +1,130 @@
+"""Cost-aware admission control for expensive routes.
+
+Handlers compute on the event loop, so a burst of catalog-wide requests queued
+behind each other delays every request that arrives after them, including cheap
+lookups. Each cost class admits a fixed number of requests at a time; the rest
+wait in a bounded queue without using the loop. Unclassified routes are never
+queued, so they run as soon as the request currently executing finishes.
+
+Saturated classes answer instead of piling up:
+- 429 with Retry-After when the class's queue is full
+- 503 with Retry-After when a queued request waited longer than its timeout
+"""
+from typing import Callable, Dict, Optional
+import asyncio
+import json
+import math
+import time
+
+
+class CostClass:
+    """Concurrency limit and bounded wait queue for one class of requests"""
+
+    def __init__(self, name: str, concurrency: int, queue_size: int, timeout: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(concurrency)
+        self.active = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "timeout": 0}
+        # Moving average of time holding a slot, for Retry-After estimates
+        self.avg_seconds = 0.0
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue has likely drained"""
+        backlog = (self.queued + self.active) / self.concurrency
+        return max(1, math.ceil(backlog * self.avg_seconds))
+
+    async def acquire(self) -> Optional[str]:
+        """None once admitted, otherwise the rejection reason"""
+        if self._slots.locked() and self.queued >= self.queue_size:
+            self.rejected["queue_full"] += 1
+            return "queue_full"
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self.rejected["timeout"] += 1
+            return "timeout"
+        finally:
+            self.queued -= 1
+        self.active += 1
+        self.admitted += 1
+        return None
+
+    def release(self, seconds: float):
+        self.active -= 1
+        self.avg_seconds += (seconds - self.avg_seconds) * (0.2 if self.avg_seconds else 1.0)
+        self._slots.release()
+
+    def status(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "queue_size": self.queue_size,
+            "timeout_seconds": self.timeout,
+            "active": self.active,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "avg_ms": round(self.avg_seconds * 1000, 2),
+        }
+
+
+def parse_limits(text: str, timeout: float) -> Dict[str, CostClass]:
+    """"catalog=1:16,location=2:32" -> {name: CostClass(concurrency, queue size)}"""
+    classes = {}
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        name, _, limits = part.partition("=")
+        concurrency, _, queue_size = limits.partition(":")
+        classes[name.strip()] = CostClass(name.strip(), int(concurrency), int(queue_size or 0), timeout)
+    return classes
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware; `classify(scope)` names the cost class or returns None"""
+
+    def __init__(self, app, classes: Dict[str, CostClass], classify: Callable[[dict], Optional[str]]):
+        self.app = app
+        self.classes = classes
+        self.classify = classify
+
+    async def __call__(self, scope, receive, send):
+        cost = self.classes.get(self.classify(scope)) if scope["type"] == "http" else None
+        if cost is None:
+            await self.app(scope, receive, send)
+            return
+
+        reason = await cost.acquire()
+        if reason is not None:
+            await self._reject(send, cost, reason)
+            return
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            cost.release(time.perf_counter() - started)
+
+    @staticmethod
+    async def _reject(send, cost: CostClass, reason: str):
+        status = 429 if reason == "queue_full" else 503
+        retry_after = cost.retry_after()
+        body = json.dumps({
+            "detail": f"Too many {cost.name} requests; retry in {retry_after}s",
+            "cost_class": cost.name,
+            "reason": reason,
+        }).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,498 @@
+"""Compiled alert rules and an incrementally maintained alert index"""
+from collections import Counter, defaultdict, deque
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import hashlib
+import operator
+
+from models import Alert, AlertsSummary
+
+
+SEVERITY_ORDER = {"critical": 0, "warning": 1, "info": 2}
+
+_OPERATORS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+class AlertLevel:
+    """One severity band of a rule: fires when `value <op> limit * factor`"""
+
+    __slots__ = ("severity", "op", "factor", "title", "action")
+
+    def __init__(self, severity: str, op: str, factor: float, title: str, action: str):
+        self.severity = severity
+        self.op = op
+        self.factor = factor
+        self.title = title
+        self.action = action
+
+
+class AlertRule:
+    """Declarative alert rule over one SKU-location metric.
+
+    `limit` is either a constant or the name of another state metric
+    (e.g. the stockout rule compares `current_stock` against `min_stock`).
+    Levels are checked in order and the first match wins.
+    """
+
+    def __init__(
+        self,
+        alert_type: str,
+        metric: str,
+        limit,
+        levels: List[AlertLevel],
+        description: str,
+    ):
+        self.alert_type = alert_type
+        self.metric = metric
+        self.limit = limit
+        self.levels = levels
+        self.description = description
+
+    @property
+    def inputs(self) -> Tuple[str, ...]:
+        """State metrics this rule reads"""
+        if isinstance(self.limit, str):
+            return (self.metric, self.limit)
+        return (self.metric,)
+
+
+class CompiledRule:
+    """A rule with its comparisons resolved to plain callables"""
+
+    __slots__ = ("rule", "alert_type", "inputs", "_metric", "_limit_key", "_limit", "_checks")
+
+    def __init__(self, rule: AlertRule):
+        self.rule = rule
+        self.alert_type = rule.alert_type
+        self.inputs = rule.inputs
+        self._metric = rule.metric
+        self._limit_key = rule.limit if isinstance(rule.limit, str) else None
+        self._limit = None if self._limit_key else float(rule.limit)
+        self._checks = tuple((_OPERATORS[level.op], level.factor, level) for level in rule.levels)
+
+    def evaluate(self, state: dict):
+        """Return (level, value, threshold), None if clear, or False if inputs are missing"""
+        value = state.get(self._metric)
+        limit = state.get(self._limit_key) if self._limit_key else self._limit
+        if value is None or limit is None:
+            return False
+
+        for compare, factor, level in self._checks:
+            if compare(value, limit * factor):
+                # Report the metric-based limit itself (e.g. min_stock), or the scaled constant band
+                return level, value, limit if self._limit_key else limit * factor
+        return None
+
+
+# Default thresholds - mirror the bands used by the inventory, trend and
+# performance generators so rule output agrees with the analytics endpoints
+ALERT_RULES = [
+    AlertRule(
+        alert_type="stockout_risk",
+        metric="current_stock",
+        limit="min_stock",
+        levels=[
+            AlertLevel("critical", "<", 0.5, "Critical: {product_name} stockout imminent",
+                       "Add {restock:.0f} units to today's pick list immediately"),
+            AlertLevel("warning", "<", 1.0, "Low stock: {product_name}",
+                       "Include in next scheduled pick list with {restock:.0f} units"),
+        ],
+        description="Stock level at {value:.0f} units, below minimum threshold of {limit:.0f}.",
+    ),
+    AlertRule(
+        alert_type="overstock",
+        metric="current_stock",
+        limit="max_stock",
+        levels=[
+            AlertLevel("warning", ">", 1.5, "Overstock: {product_name}",
+                       "Consider markdown pricing or transfer to higher-velocity location"),
+            AlertLevel("info", ">", 1.0, "Excess inventory: {product_name}",
+                       "Skip this product in next 2 restocking cycles"),
+        ],
+        description="Stock level {value:.0f} units, {excess:.0f} above optimal.",
+    ),
+    AlertRule(
+        alert_type="anomaly",
+        metric="demand_deviation_pct",
+        limit=50,
+        levels=[
+            AlertLevel("critical", ">=", 3.0, "Demand spike: {product_name} {value:+.0f}%",
+                       "Emergency restock and increase pick quantity for next 3 days"),
+            AlertLevel("warning", ">=", 1.0, "Demand spike: {product_name} {value:+.0f}%",
+                       "Increase pick quantity by 50% for next 3 days"),
+            AlertLevel("warning", "<=", -1.0, "Demand drop: {product_name} {value:+.0f}%",
+                       "Reduce pick quantity and check product placement"),
+        ],
+        description="Sales {value:+.0f}% versus 7-day average.",
+    ),
+    AlertRule(
+        alert_type="trend_change",
+        metric="week_over_week_change",
+        limit=15,
+        levels=[
+            AlertLevel("warning", "<=", -1.0, "Declining trend: {product_name} {value:+.0f}% WoW",
+                       "Review customer feedback and consider product placement optimization"),
+            AlertLevel("info", ">=", 1.0, "Upward trend: {product_name} {value:+.0f}% WoW",
+                       "Increase baseline stock level"),
+        ],
+        description="Week-over-week sales change of {value:+.1f}%.",
+    ),
+    AlertRule(
+        alert_type="performance",
+        metric="performance_score",
+        limit=40,
+        levels=[
+            AlertLevel("warning", "<", 1.0, "Underperforming: {product_name}",
+                       "Reduce stock levels or discontinue at this location"),
+            AlertLevel("info", ">=", 2.0, "Top performer: {product_name}",
+                       "Consider expanding facings and ensuring consistent availability"),
+        ],
+        description="Performance score {value:.0f}/100.",
+    ),
+]
+
+
+def compile_rules(rules: Iterable[AlertRule]) -> Dict[str, Tuple[CompiledRule, ...]]:
+    """Compile rules once and index them by the state metrics they read"""
+    by_metric = defaultdict(list)
+    for rule in rules:
+        compiled = CompiledRule(rule)
+        for metric in compiled.inputs:
+            by_metric[metric].append(compiled)
+    return {metric: tuple(compiled) for metric, compiled in by_metric.items()}
+
+
+def alert_id_for(title: str, location_id: Optional[str]) -> str:
+    """Stable alert ID derived from title and location"""
+    return "alert_" + hashlib.md5(f"{title}_{location_id}".encode()).hexdigest()[:12]
+
+
+class AlertEngine:
+    """Active alerts for the network, re-evaluated only for SKU-locations that change.
+
+    Alerts are indexed by location, type and severity, with running counts so
+    the unfiltered summary never scans the alert set. Every change is stamped
+    with a monotonically increasing version and kept in a bounded journal so
+    stream subscribers can resume from the last version they saw.
+    """
+
+    JOURNAL_SIZE = 10000
+
+    def __init__(self, rules: Iterable[AlertRule], product_names: dict, location_names: dict):
+        self.rules_by_metric = compile_rules(rules)
+        self.product_names = product_names
+        self.location_names = location_names
+
+        self.version = 0
+        self._journal = deque(maxlen=self.JOURNAL_SIZE)
+        self._listeners: List[Callable[[int, str, Alert], None]] = []
+
+        self._state: Dict[Tuple[str, str], dict] = {}
+        self._alerts: Dict[str, Alert] = {}
+        self._seq: Dict[str, int] = {}
+        self._next_seq = 0
+        # (alert_type, product_id, location_id) -> alert id, at most one per rule
+        self._by_key: Dict[Tuple[str, Optional[str], Optional[str]], str] = {}
+        # alert id -> the rule level that raised it, for alerts built by the rules
+        self._levels: Dict[str, AlertLevel] = {}
+
+        self._by_location: Dict[Optional[str], set] = defaultdict(set)
+        self._by_type: Dict[str, set] = defaultdict(set)
+        self._by_severity: Dict[str, set] = defaultdict(set)
+        self._severity_counts = Counter()
+        self._location_refs = Counter()
+        self._product_refs = Counter()
+
+    # ---------- index maintenance ----------
+
+    def _add(self, alert: Alert, level: Optional[AlertLevel] = None):
+        self._alerts[alert.id] = alert
+        if level is not None:
+            self._levels[alert.id] = level
+        self._seq[alert.id] = self._next_seq
+        self._next_seq += 1
+        self._by_key[(alert.alert_type, alert.product_id, alert.location_id)] = alert.id
+        self._by_location[alert.location_id].add(alert.id)
+        self._by_type[alert.alert_type].add(alert.id)
+        self._by_severity[alert.severity].add(alert.id)
+        self._severity_counts[alert.severity] += 1
+        if alert.location_id:
+            self._location_refs[alert.location_id] += 1
+        if alert.product_id:
+            self._product_refs[alert.product_id] += 1
+
+    def _remove(self, alert_id: str) -> Optional[Alert]:
+        alert = self._alerts.pop(alert_id, None)
+        if alert is None:
+            return None
+        del self._seq[alert_id]
+        self._levels.pop(alert_id, None)
+        self._by_key.pop((alert.alert_type, alert.product_id, alert.location_id), None)
+        self._by_location[alert.location_id].discard(alert_id)
+        self._by_type[alert.alert_type].discard(alert_id)
+        self._by_severity[alert.severity].discard(alert_id)
+        self._severity_counts[alert.severity] -= 1
+        if alert.location_id:
+            self._location_refs[alert.location_id] -= 1
+            if not self._location_refs[alert.location_id]:
+                del self._location_refs[alert.location_id]
+        if alert.product_id:
+            self._product_refs[alert.product_id] -= 1
+            if not self._product_refs[alert.product_id]:
+                del self._product_refs[alert.product_id]
+        return alert
+
+    def seed(self, alert: Alert):
+        """Insert a pre-built alert (curated demo content) into the index"""
+        existing = self._by_key.get((alert.alert_type, alert.product_id, alert.location_id))
+        if existing:
+            self._record("resolved", self._remove(existing))
+        self._add(alert)
+        self._record("created", alert)
+
+    def retain_locations(self, location_ids):
+        """Resolve alerts and forget rule inputs for locations outside `location_ids`"""
+        for alert in [a for a in self._alerts.values() if a.location_id and a.location_id not in location_ids]:
+            self._record("resolved", self._remove(alert.id))
+        self._state = {(p, l): metrics for (p, l), metrics in self._state.items() if l in location_ids}
+
+    def get(self, alert_id: str) -> Optional[Alert]:
+        return self._alerts.get(alert_id)
+
+    def acknowledge(self, alert_id: str) -> Optional[Alert]:
+        """Mark an alert acknowledged; it stays active until its condition clears"""
+        alert = self._alerts.get(alert_id)
+        if alert is None or alert.is_acknowledged:
+            return alert
+        alert = alert.model_copy(update={"is_acknowledged": True})
+        self._alerts[alert_id] = alert
+        self._record("acknowledged", alert)
+        return alert
+
+    def export(self) -> dict:
+        """Active alerts, per-SKU-location rule inputs and version, for snapshots"""
+        ordered = sorted(self._alerts.values(), key=lambda a: self._seq[a.id])
+        return {
+            "version": self.version,
+            "alerts": [alert.model_dump(mode="json") for alert in ordered],
+            "state": [[p, l, metrics] for (p, l), metrics in self._state.items()],
+        }
+
+    def restore(self, data: dict):
+        """Rebuild the index from export() output. The change journal starts empty,
+        so stream clients holding an older resume token get a fresh snapshot."""
+        for alert_id in list(self._alerts):
+            self._remove(alert_id)
+        self._state = {(p, l): metrics for p, l, metrics in data["state"]}
+        for raw in data["alerts"]:
+            self._add(Alert.model_validate(raw))
+        self._journal.clear()
+        self.version = data["version"]
+
+    # ---------- change journal ----------
+
+    def _record(self, change: str, alert: Alert):
+        self.version += 1
+        self._journal.append((self.version, change, alert))
+        for listener in self._listeners:
+            listener(self.version, change, alert)
+
+    def subscribe(self, listener: Callable[[int, str, Alert], None]):
+        """Call listener(version, change, alert) after every change"""
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[int, str, Alert], None]):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def changes_since(self, version: int) -> Optional[List[Tuple[int, str, Alert]]]:
+        """Journal entries after `version`, or None if they have been trimmed away or
+        `version` was never issued (e.g. a token from before a restart)"""
+        if version > self.version:
+            return None
+        if version == self.version:
+            return []
+        if not self._journal or self._journal[0][0] > version + 1:
+            return None
+        # Journal versions are contiguous, so the offset is direct
+        start = version + 1 - self._journal[0][0]
+        return [self._journal[i] for i in range(start, len(self._journal))]
+
+    def active(self) -> List[Alert]:
+        """All active alerts, critical first"""
+        return self.summary().alerts
+
+    # ---------- incremental evaluation ----------
+
+    def observe(self, product_id: str, location_id: str, **metrics) -> List[Tuple[str, Alert]]:
+        """Merge new metrics for one SKU-location and re-run only the rules that read them.
+
+        Returns a list of (change, alert) where change is created, updated or resolved.
+        Moving to another level of the rule resolves the old alert and creates a new one.
+        """
+        key = (product_id, location_id)
+        state = self._state.setdefault(key, {})
+        state.update(metrics)
+
+        rules = {}
+        for metric in metrics:
+            for compiled in self.rules_by_metric.get(metric, ()):
+                rules[id(compiled)] = compiled
+
+        changes = []
+        for compiled in rules.values():
+            self._apply(compiled, product_id, location_id, state, changes)
+        for change, alert in changes:
+            self._record(change, alert)
+        return changes
+
+    def _apply(self, compiled: CompiledRule, product_id: str, location_id: str, state: dict, changes: list):
+        result = compiled.evaluate(state)
+        if result is False:
+            return
+
+        existing_id = self._by_key.get((compiled.alert_type, product_id, location_id))
+        existing = self._alerts.get(existing_id) if existing_id else None
+
+        if result is None:
+            if existing:
+                self._remove(existing_id)
+                changes.append(("resolved", existing))
+            return
+
+        level, value, threshold = result
+        if existing and self._level_of(compiled.rule, existing) is level:
+            if existing.metric_value == value and existing.threshold_value == threshold:
+                return
+            # Same band: keep the id and acknowledgement, re-render the text for the new value
+            rendered = self._build(compiled.rule, level, product_id, location_id, value, threshold, state)
+            updated = existing.model_copy(update={
+                "title": rendered.title,
+                "description": rendered.description,
+                "recommended_action": rendered.recommended_action,
+                "metric_value": value,
+                "threshold_value": threshold,
+            })
+            self._alerts[existing_id] = updated
+            changes.append(("updated", updated))
+            return
+
+        if existing:
+            self._remove(existing_id)
+            changes.append(("resolved", existing))
+
+        alert = self._build(compiled.rule, level, product_id, location_id, value, threshold, state)
+        self._add(alert, level)
+        changes.append(("created", alert))
+
+    def _level_of(self, rule: AlertRule, alert: Alert) -> Optional[AlertLevel]:
+        """The level of `rule` that raised `alert`. Seeded and restored alerts
+        carry no level, so it is recognised by severity and rendered title."""
+        level = self._levels.get(alert.id)
+        if level is not None:
+            return level
+        for candidate in rule.levels:
+            if candidate.severity != alert.severity:
+                continue
+            try:
+                title = candidate.title.format(product_name=alert.product_name, value=alert.metric_value)
+            except (KeyError, ValueError, TypeError):
+                continue
+            if title == alert.title:
+                self._levels[alert.id] = candidate
+                return candidate
+        return None
+
+    def _build(self, rule: AlertRule, level: AlertLevel, product_id: str, location_id: str,
+               value: float, threshold: float, state: dict) -> Alert:
+        product_name = self.product_names.get(product_id, product_id)
+        location_name = self.location_names.get(location_id, location_id)
+        fields = {
+            "product_name": product_name,
+            "location_name": location_name,
+            "value": value,
+            "limit": threshold,
+            "excess": value - state.get("max_stock", value),
+            "restock": max(state.get("max_stock", threshold) - value, 0),
+        }
+        title = level.title.format(**fields)
+        return Alert(
+            id=alert_id_for(title, location_id),
+            alert_type=rule.alert_type,
+            severity=level.severity,
+            title=title,
+            description=rule.description.format(**fields),
+            product_id=product_id,
+            product_name=product_name,
+            location_id=location_id,
+            location_name=location_name,
+            metric_value=value,
+            threshold_value=threshold,
+            recommended_action=level.action.format(**fields),
+            created_at=datetime.now(),
+            is_acknowledged=False,
+        )
+
+    # ---------- queries ----------
+
+    def _select(self, location_id: Optional[str], alert_type: Optional[str], severity: Optional[str]):
+        candidates = []
+        if location_id:
+            candidates.append(self._by_location.get(location_id, set()))
+        if alert_type:
+            candidates.append(self._by_type.get(alert_type, set()))
+        if severity:
+            candidates.append(self._by_severity.get(severity, set()))
+        if not candidates:
+            return self._alerts.keys()
+
+        candidates.sort(key=len)
+        smallest, rest = candidates[0], candidates[1:]
+        return [alert_id for alert_id in smallest if all(alert_id in s for s in rest)]
+
+    def summary(
+        self,
+        location_id: Optional[str] = None,
+        alert_type: Optional[str] = None,
+        severity: Optional[str] = None,
+    ) -> AlertsSummary:
+        """Filtered alert summary, critical first"""
+        ids = self._select(location_id, alert_type, severity)
+        alerts = [self._alerts[alert_id] for alert_id in ids]
+        alerts.sort(key=lambda a: (SEVERITY_ORDER.get(a.severity, 3), self._seq[a.id]))
+
+        if not (location_id or alert_type or severity):
+            # Unfiltered: counts come straight from the running tallies
+            counts = self._severity_counts
+            locations_affected = len(self._location_refs)
+            products_affected = len(self._product_refs)
+        else:
+            counts = Counter(a.severity for a in alerts)
+            locations_affected = len({a.location_id for a in alerts if a.location_id})
+            products_affected = len({a.product_id for a in alerts if a.product_id})
+
+        return AlertsSummary(
+            total_alerts=len(alerts),
+            critical_count=counts["critical"],
+            warning_count=counts["warning"],
+            info_count=counts["info"],
+            alerts=alerts,
+            locations_affected=locations_affected,
+            products_affected=products_affected,
+        )
+
+    def counts(self) -> dict:
+        """O(1) severity counts for the whole network"""
+        return {
+            "total_alerts": len(self._alerts),
+            "critical_count": self._severity_counts["critical"],
+            "warning_count": self._severity_counts["warning"],
+            "info_count": self._severity_counts["info"],
+            "locations_affected": len(self._location_refs),
+            "products_affected": len(self._product_refs),
+        }
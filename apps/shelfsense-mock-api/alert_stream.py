@@ -0,0 +1,125 @@
+"""Server-sent event stream of alert changes"""
+from typing import AsyncIterator, Optional
+import asyncio
+import json
+
+from alert_engine import AlertEngine
+from changelog import EPOCH_SHIFT
+from models import Alert
+
+
+HEARTBEAT_SECONDS = 15
+RETRY_MILLISECONDS = 3000
+
+
+def format_event(event: str, data: dict, event_id: Optional[int] = None) -> str:
+    """Encode one SSE message"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+class AlertStream:
+    """Fans alert engine changes out to SSE subscribers.
+
+    Subscribers never poll the engine: each one sleeps on its own wakeup event,
+    which the engine's change listener sets, then reads the journal entries
+    after its cursor. The event id is the engine version, so a reconnecting
+    client resumes with Last-Event-ID (or `resume_token`) and only falls back
+    to a full snapshot if its position has been trimmed from the journal.
+
+    Engine versions count per process, so event ids carry the stream's epoch
+    on top, as delta sync versions do (see changelog.py): a token issued by
+    another worker behind the same port, or before a restart, gets a snapshot
+    instead of being read as a position in this engine's journal.
+    """
+
+    def __init__(self, engine: AlertEngine, epoch: int = 0):
+        self.engine = engine
+        self.epoch = epoch
+        self._wakeups = set()
+        engine.subscribe(self._notify)
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._wakeups)
+
+    def _notify(self, version: int, change: str, alert: Alert):
+        for wakeup in self._wakeups:
+            wakeup.set()
+
+    def token(self, version: int) -> int:
+        """Resume token (and event id) for an engine version"""
+        return (self.epoch << EPOCH_SHIFT) + version
+
+    def _cursor(self, resume_token: Optional[int]) -> Optional[int]:
+        """Engine version a resume token stands for, or None if another epoch issued it"""
+        if resume_token is None or resume_token >> EPOCH_SHIFT != self.epoch:
+            return None
+        return resume_token - (self.epoch << EPOCH_SHIFT)
+
+    def _snapshot(self, location_id, alert_type, severity) -> str:
+        summary = self.engine.summary(location_id, alert_type, severity)
+        token = self.token(self.engine.version)
+        return format_event(
+            "snapshot",
+            {
+                "resume_token": token,
+                "alerts": [alert.model_dump(mode="json") for alert in summary.alerts],
+            },
+            token,
+        )
+
+    async def events(
+        self,
+        request,
+        location_id: Optional[str] = None,
+        alert_type: Optional[str] = None,
+        severity: Optional[str] = None,
+        resume_token: Optional[int] = None,
+    ) -> AsyncIterator[str]:
+        def matches(alert: Alert) -> bool:
+            return (
+                (not location_id or alert.location_id == location_id)
+                and (not alert_type or alert.alert_type == alert_type)
+                and (not severity or alert.severity == severity)
+            )
+
+        wakeup = asyncio.Event()
+        self._wakeups.add(wakeup)
+        try:
+            yield f"retry: {RETRY_MILLISECONDS}\n\n"
+
+            cursor = self._cursor(resume_token)
+            while True:
+                changes = self.engine.changes_since(cursor) if cursor is not None else None
+                if changes is None:
+                    # New client, too far behind to replay, or a token this engine never
+                    # issued (another epoch, or ahead of its version): send current state
+                    cursor = self.engine.version
+                    yield self._snapshot(location_id, alert_type, severity)
+                else:
+                    for version, change, alert in changes:
+                        if matches(alert):
+                            token = self.token(version)
+                            yield format_event(
+                                change,
+                                {"resume_token": token, "alert": alert.model_dump(mode="json")},
+                                token,
+                            )
+                        cursor = version
+
+                wakeup.clear()
+                if cursor < self.engine.version:
+                    continue
+                try:
+                    await asyncio.wait_for(wakeup.wait(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keep-alive\n\n"
+        finally:
+            self._wakeups.discard(wakeup)
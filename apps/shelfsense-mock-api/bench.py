@@ -0,0 +1,465 @@
+"""Micro-benchmarks for ShelfSense Mock API generators and routes.
+
+Times every `sample_data.generate_*` function and every route in `main.py`
+in-process at several catalog sizes, and compares against a stored baseline.
+
+    python bench.py                     # run and compare against bench_baseline.json
+    python bench.py --save-baseline     # run and overwrite the baseline
+    python bench.py --sizes 30x11 --only pick-list
+    python bench.py --sizes 30x11 --only model:       # validated vs model_construct
+    python bench.py --only memory:                     # bytes per SKU-location, rows vs models
+    python bench.py --startup --runs 5                 # process start to listening / ready / first request
+"""
+import argparse
+import inspect
+import json
+import os
+import platform
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+# Keep benchmark runs away from the real ingestion log and snapshots
+os.environ.setdefault("SHELFSENSE_DATA_DIR", tempfile.mkdtemp(prefix="shelfsense-bench-"))
+os.environ.setdefault("INGEST_WAL_FSYNC", "0")
+
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+
+import main
+import models
+import sample_data
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+DEFAULT_SIZES = ["30x11", "500x50", "2000x100"]
+SKIPPED_ROUTES = {"/api/alerts/stream"}  # never completes
+MODEL_BATCH = 1000  # objects constructed per model case
+MEMORY_SAMPLE = 5000  # SKU-locations materialized per memory case
+HERE = os.path.dirname(os.path.abspath(__file__))
+MCP_SERVER_DIR = os.path.join(HERE, "..", "shelfsense-mcp-server")
+STARTUP_TIMEOUT = 60.0
+
+BASE_PRODUCTS = list(sample_data.PRODUCTS)
+BASE_LOCATIONS = list(sample_data.LOCATIONS)
+
+
+def scaled_catalog(n_products: int, n_locations: int):
+    """The demo catalog, extended with numbered copies up to the requested size"""
+    products = list(BASE_PRODUCTS[:n_products])
+    while len(products) < n_products:
+        base = BASE_PRODUCTS[len(products) % len(BASE_PRODUCTS)]
+        k = len(products)
+        products.append(base.model_copy(update={"id": f"{base.id}_{k}", "name": f"{base.name} #{k}"}))
+
+    locations = list(BASE_LOCATIONS[:n_locations])
+    while len(locations) < n_locations:
+        base = BASE_LOCATIONS[len(locations) % len(BASE_LOCATIONS)]
+        k = len(locations)
+        locations.append(base.model_copy(update={"id": f"{base.id}_{k}", "name": f"{base.name} #{k}"}))
+    return products, locations
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure(fn, budget_seconds: float, min_runs: int = 5, max_runs: int = 2000) -> dict:
+    """Call fn repeatedly within a time budget; latency stats in milliseconds"""
+    for _ in range(3):  # warm-up
+        fn()
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < max_runs:
+        t0 = time.perf_counter_ns()
+        fn()
+        samples.append((time.perf_counter_ns() - t0) / 1e6)
+        if len(samples) >= min_runs and time.perf_counter() - started > budget_seconds:
+            break
+    elapsed = time.perf_counter() - started
+    samples.sort()
+    return {
+        "runs": len(samples),
+        "ops_per_sec": round(len(samples) / elapsed, 2),
+        "p50_ms": round(percentile(samples, 50), 4),
+        "p99_ms": round(percentile(samples, 99), 4),
+    }
+
+
+# ---------- cases ----------
+
+def sample_values() -> dict:
+    # Last location has no curated demo rows, so pick lists take the synthetic path
+    location = sample_data.LOCATIONS[-1]
+    tomorrow = datetime.now().strftime("%Y-%m-%d")
+    return {
+        "location_id": location.id,
+        "product_id": sample_data.PRODUCTS[0].id,
+        "date_str": tomorrow,
+        "date": tomorrow,
+        "forecast_date": tomorrow,
+        "start_date": tomorrow,
+        "q": sample_data.PRODUCTS[0].name.lower(),
+        "alert_id": sample_data.generate_alerts().alerts[0].id,
+    }
+
+
+def generator_cases(values: dict):
+    """One case per sample_data.generate_* function, arguments filled by parameter name"""
+    for name in sorted(dir(sample_data)):
+        fn = getattr(sample_data, name)
+        if not name.startswith("generate_") or not callable(fn):
+            continue
+        kwargs = {}
+        for param in inspect.signature(fn).parameters.values():
+            if param.name in values:
+                kwargs[param.name] = values[param.name]
+            elif param.default is inspect.Parameter.empty:
+                raise RuntimeError(f"bench.py: don't know how to call {name}({param.name}=...)")
+        yield f"generator:{name}", (lambda fn=fn, kwargs=kwargs: fn(**kwargs))
+
+
+def _generated_instances(value, found: dict):
+    if isinstance(value, models.BaseModel):
+        found.setdefault(type(value), value)
+        for name in type(value).model_fields:
+            _generated_instances(getattr(value, name), found)
+    elif isinstance(value, list):
+        for item in value:
+            _generated_instances(item, found)
+
+
+def model_cases(values: dict):
+    """Validated constructor vs model_construct for each model type the generators
+    produce, using field values taken from real generator output.
+
+    With pydantic-core, validated construction is as fast as or faster than
+    model_construct (which runs in Python), so generators keep validating;
+    these cases catch it if that ever flips.
+    """
+    found = {}
+    for _, fn in generator_cases(values):
+        _generated_instances(fn(), found)
+
+    for cls, sample in sorted(found.items(), key=lambda item: item[0].__name__):
+        fields = {name: getattr(sample, name) for name in cls.model_fields}
+        batch = range(MODEL_BATCH)
+        yield f"model:{cls.__name__} x{MODEL_BATCH} validated", (lambda cls=cls, fields=fields: [cls(**fields) for _ in batch])
+        yield f"model:{cls.__name__} x{MODEL_BATCH} model_construct", (lambda cls=cls, fields=fields: [cls.model_construct(**fields) for _ in batch])
+
+
+def _traced_bytes(fn):
+    """(result, bytes still allocated by fn once it returns)"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = fn()
+        return result, tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+
+def memory_usage() -> dict:
+    """Bytes per SKU-location of the inventory arrays, and of holding each engine
+    row type versus its public model for a sample of SKU-locations"""
+    inventory = sample_data.INVENTORY
+    cells = inventory.shape[0] * inventory.shape[1]
+    usage = {"memory:inventory arrays": sum(getattr(inventory, name).nbytes for name in inventory.ARRAYS) / cells}
+
+    keys = [(p.id, loc.id) for loc in sample_data.LOCATIONS for p in sample_data.PRODUCTS][:MEMORY_SAMPLE]
+    for row_fn, model in (
+        (sample_data.inventory_status_row, models.InventoryStatus),
+        (sample_data.product_performance_row, models.ProductPerformance),
+        (sample_data.trend_row, models.TrendData),
+    ):
+        # Rows and models share the same field values; what differs is the container
+        rows, row_bytes = _traced_bytes(lambda: [row_fn(p, loc) for p, loc in keys])
+        _, model_extra = _traced_bytes(lambda: [model(**row._asdict()) for row in rows])
+        tuple_bytes = sum(sys.getsizeof(row) for row in rows)
+        usage[f"memory:{model.__name__} row"] = row_bytes / len(rows)
+        usage[f"memory:{model.__name__} model"] = (row_bytes - tuple_bytes + model_extra) / len(rows)
+    return usage
+
+
+def ingest_body(values: dict, events: int = 1000) -> bytes:
+    line = json.dumps({"type": "restock", "product_id": values["product_id"],
+                       "location_id": values["location_id"], "quantity": 1})
+    return "\n".join([line] * events).encode()
+
+
+def expect_ok(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request.method} {response.request.url} -> {response.status_code}: {response.text[:200]}")
+    return response
+
+
+def route_cases(client: TestClient, values: dict):
+    """One case per route (required parameters filled in), plus a location-scoped
+    variant for routes whose location_id is optional"""
+    for route in main.app.routes:
+        if not isinstance(route, APIRoute) or route.path in SKIPPED_ROUTES:
+            continue
+        method = sorted(route.methods)[0]
+        path = route.path
+        for param in route.dependant.path_params:
+            path = path.replace("{" + param.name + "}", str(values[param.name]))
+
+        required = {}
+        optional_location = False
+        for param in route.dependant.query_params:
+            if param.field_info.is_required():
+                required[param.name] = values[param.name]
+            elif param.name == "location_id":
+                optional_location = True
+
+        variants = [(f"{method} {route.path}", required)]
+        if optional_location:
+            variants.append((f"{method} {route.path}?location_id", {**required, "location_id": values["location_id"]}))
+
+        for name, params in variants:
+            if method == "POST" and route.path == "/api/ingest/events":
+                body = ingest_body(values)
+                yield f"route:{name}", (lambda path=path, body=body: expect_ok(client.post(path, content=body)))
+            elif method == "POST":
+                yield f"route:{name}", (lambda path=path, params=params: expect_ok(client.post(path, params=params)))
+            else:
+                yield f"route:{name}", (lambda path=path, params=params: expect_ok(client.get(path, params=params)))
+
+
+# ---------- startup ----------
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _get(url: str):
+    """(status, body) or None if nothing is listening yet"""
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+    except (urllib.error.URLError, ConnectionError):
+        return None
+
+
+def _wait_for(url: str, started: float, ok=lambda status: True) -> float:
+    """Milliseconds from `started` until url answers with a status accepted by ok"""
+    while time.perf_counter() - started < STARTUP_TIMEOUT:
+        result = _get(url)
+        if result is not None and ok(result[0]):
+            return (time.perf_counter() - started) * 1000
+        time.sleep(0.005)
+    raise RuntimeError(f"{url} not up after {STARTUP_TIMEOUT:.0f}s")
+
+
+def _import_ms(module: str, cwd: str, env: dict) -> float:
+    code = f"import time; t = time.perf_counter(); import {module}; print((time.perf_counter() - t) * 1000)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def startup_probe(app: str, cwd: str, env: dict, ready_path: str = None, first_path: str = None) -> dict:
+    """Spawn `uvicorn app` and time it from process start to listening, ready and first response"""
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    result = {"import_ms": _import_ms(app.split(":")[0], cwd, env)}
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--log-level", "warning"],
+        cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        result["listening_ms"] = _wait_for(f"{base}/health", started)
+        if ready_path:
+            result["ready_ms"] = _wait_for(base + ready_path, started, ok=lambda status: status == 200)
+        if first_path:
+            t0 = time.perf_counter()
+            status, _ = _get(base + first_path)
+            if status != 200:
+                raise RuntimeError(f"{first_path} -> {status}")
+            result["first_request_ms"] = (time.perf_counter() - t0) * 1000
+    finally:
+        proc.terminate()  # SIGTERM runs the lifespan shutdown, which writes the snapshot
+        proc.wait(timeout=30)
+    return result
+
+
+def _prepare_warm_data_dir(env: dict, events: int = 20000):
+    """Start once on env's data dir, ingest a burst of events, and shut down so a snapshot is written"""
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        _wait_for(f"{base}/ready", time.perf_counter(), ok=lambda status: status == 200)
+        values = sample_values()
+        request = urllib.request.Request(f"{base}/api/ingest/events", data=ingest_body(values, events), method="POST")
+        urllib.request.urlopen(request, timeout=30).read()
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def startup_cases(runs: int) -> dict:
+    """Median startup timings over `runs` fresh processes per scenario"""
+    scenarios = []
+    cold_dir = tempfile.mkdtemp(prefix="shelfsense-cold-")
+    warm_dir = tempfile.mkdtemp(prefix="shelfsense-warm-")
+    base_env = {**os.environ, "INGEST_WAL_FSYNC": "0"}
+    _prepare_warm_data_dir({**base_env, "SHELFSENSE_DATA_DIR": warm_dir})
+
+    def cold_api():
+        # A fresh directory every run, so no snapshot from the previous run's shutdown
+        shutil.rmtree(cold_dir, ignore_errors=True)
+        env = {**base_env, "SHELFSENSE_DATA_DIR": cold_dir}
+        return startup_probe("main:app", HERE, env, "/ready", "/api/inventory/status")
+
+    scenarios.append(("startup:mock-api cold (no snapshot)", cold_api))
+    scenarios.append(("startup:mock-api warm (snapshot)", lambda: startup_probe(
+        "main:app", HERE, {**base_env, "SHELFSENSE_DATA_DIR": warm_dir}, "/ready", "/api/inventory/status")))
+    if os.path.exists(os.path.join(MCP_SERVER_DIR, "server.py")):
+        # Alert stream off: the probe measures the server itself, not the upstream API
+        scenarios.append(("startup:mcp-server", lambda: startup_probe(
+            "server:app", MCP_SERVER_DIR, {**base_env, "SHELFSENSE_ALERT_STREAM": "0"})))
+
+    print(f"\n== startup (median of {runs} runs) ==")
+    print(f"{'case':<42} {'import ms':>10} {'listen ms':>10} {'ready ms':>10} {'1st req ms':>10}")
+    results = {}
+    try:
+        for name, probe in scenarios:
+            samples = [probe() for _ in range(runs)]
+            stats = {key: round(statistics.median(s[key] for s in samples), 1) for key in samples[0]}
+            results[name] = stats
+            print(f"{name:<42} " + " ".join(
+                f"{stats[key]:>10.1f}" if key in stats else f"{'-':>10}"
+                for key in ("import_ms", "listening_ms", "ready_ms", "first_request_ms")
+            ))
+    finally:
+        shutil.rmtree(cold_dir, ignore_errors=True)
+        shutil.rmtree(warm_dir, ignore_errors=True)
+    return results
+
+
+# ---------- reporting ----------
+
+def compare(results: dict, baseline: dict, tolerance: float):
+    """Cases whose p50 is more than `tolerance` slower than the baseline"""
+    regressions = []
+    for size, cases in results.items():
+        for case, stats in cases.items():
+            base = baseline.get("results", {}).get(size, {}).get(case)
+            if not base or not base.get("p50_ms") or "p50_ms" not in stats:
+                continue
+            ratio = stats["p50_ms"] / base["p50_ms"]
+            stats["vs_baseline"] = round(ratio, 3)
+            if ratio > 1 + tolerance:
+                regressions.append((size, case, base["p50_ms"], stats["p50_ms"], ratio))
+    return regressions
+
+
+def run(sizes, budget: float, only=None) -> dict:
+    # The client is used without its lifespan (no warm start or snapshots), so
+    # open the readiness gate by hand
+    client = TestClient(main.app)
+    main.readiness.mark_ready()
+    results = {}
+    for size in sizes:
+        n_products, n_locations = (int(n) for n in size.split("x"))
+        sample_data.load_catalog(*scaled_catalog(n_products, n_locations))
+        values = sample_values()
+        cases = list(generator_cases(values)) + list(route_cases(client, values))
+        if size == sizes[0]:
+            # Construction cost doesn't depend on catalog size
+            cases += list(model_cases(values))
+
+        print(f"\n== catalog {size} ({n_products} products x {n_locations} locations) ==")
+        print(f"{'case':<62} {'ops/s':>10} {'p50 ms':>10} {'p99 ms':>10}")
+        results[size] = {}
+        for name, fn in cases:
+            if only and only not in name:
+                continue
+            stats = measure(fn, budget)
+            results[size][name] = stats
+            print(f"{name:<62} {stats['ops_per_sec']:>10.1f} {stats['p50_ms']:>10.3f} {stats['p99_ms']:>10.3f}")
+
+        if not only or only in "memory:" or only.startswith("memory:"):
+            print(f"\n{'memory (bytes per SKU-location)':<62} {'bytes':>10}")
+            for name, per_key in memory_usage().items():
+                if only and only not in name:
+                    continue
+                results[size][name] = {"bytes_per_sku_location": round(per_key, 1)}
+                print(f"{name:<62} {per_key:>10.1f}")
+
+    sample_data.load_catalog(BASE_PRODUCTS, BASE_LOCATIONS)
+    return results
+
+
+def main_cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", default=",".join(DEFAULT_SIZES),
+                        help="Comma-separated catalog sizes as PRODUCTSxLOCATIONS")
+    parser.add_argument("--budget", type=float, default=0.5, help="Seconds to spend per case")
+    parser.add_argument("--only", help="Only run cases whose name contains this text")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Write results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed p50 slowdown versus baseline before flagging (0.25 = 25%%)")
+    parser.add_argument("--startup", action="store_true",
+                        help="Only time cold and warm process startup (not compared to the baseline)")
+    parser.add_argument("--runs", type=int, default=3, help="Processes started per --startup scenario")
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        startup_cases(args.runs)
+        return 0
+
+    results = run(args.sizes.split(","), args.budget, args.only)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "meta": {
+                    "created": datetime.now().isoformat(),
+                    "python": platform.python_version(),
+                    "machine": platform.platform(),
+                },
+                "results": results,
+            }, f, indent=2, sort_keys=True)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one.")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    if not regressions:
+        print(f"\n✅ No regressions beyond {args.tolerance:.0%} versus baseline")
+        return 0
+
+    print(f"\n❌ {len(regressions)} regressions beyond {args.tolerance:.0%} versus baseline:")
+    for size, case, before, after, ratio in regressions:
+        print(f"  [{size}] {case}: p50 {before:.3f} ms -> {after:.3f} ms ({ratio:.2f}x)")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,68 @@
+"""Versioned change log for delta sync.
+
+Every change to a synced row (an ingested SKU-location, a created, updated,
+resolved or acknowledged alert) is stamped with the next version. The log keeps
+only the latest version of each row, in version order, so "what changed since
+version N" walks back from the newest entry and stops at N: the cost follows
+the number of rows changed, not the size of the dataset.
+
+Compaction drops the oldest rows once the log holds `max_entries`, and raises
+`floor` to the newest version dropped. A client whose last version is below the
+floor may have missed a compacted change and has to resync in full.
+
+Versions are `epoch << EPOCH_SHIFT` plus a counter. Each process picks a fresh
+random epoch, so workers behind one port (and a restarted process) hand out
+disjoint version ranges, and a version from another epoch always means resync.
+"""
+from collections import OrderedDict
+from typing import Hashable, Iterable, List, Optional, Tuple
+import secrets
+
+# Counter bits per epoch; 20 epoch bits on top keep versions below 2**53 for JSON clients
+EPOCH_SHIFT = 32
+EPOCH_BITS = 20
+
+
+def new_epoch() -> int:
+    return secrets.randbits(EPOCH_BITS)
+
+
+class ChangeLog:
+    """Latest change version per row key, oldest first"""
+
+    def __init__(self, max_entries: int, epoch: int = 0):
+        self.max_entries = max_entries
+        self.epoch = epoch
+        self.version = epoch << EPOCH_SHIFT
+        self.floor = self.version
+        self._entries: "OrderedDict[Hashable, Tuple[int, bool]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def record(self, keys: Iterable[Hashable], removed: bool = False) -> int:
+        """Stamp rows as changed (or removed) at a new version, and return it"""
+        self.version += 1
+        for key in keys:
+            self._entries[key] = (self.version, removed)
+            self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            _, (version, _) = self._entries.popitem(last=False)
+            self.floor = version
+        return self.version
+
+    def since(self, version: int) -> Optional[List[Tuple[Hashable, bool]]]:
+        """(key, removed) for rows changed after `version`, newest first, or None
+        if the version is from another epoch, unknown or older than the floor
+        (resync required)"""
+        if version >> EPOCH_SHIFT != self.epoch or version < self.floor or version > self.version:
+            return None
+        changes = []
+        for key, (changed, removed) in reversed(self._entries.items()):
+            if changed <= version:
+                break
+            changes.append((key, removed))
+        return changes
+
+    def status(self) -> dict:
+        return {"epoch": self.epoch, "version": self.version, "floor": self.floor, "entries": len(self._entries)}
@@ -0,0 +1,83 @@
+"""Process pool for network-wide views, partitioned by location.
+
+Network-wide anomalies and pick-list builds are a Python loop over every
+SKU-location, which holds one core and the event loop for the whole request.
+With FANOUT_WORKERS > 0 the work is split into contiguous location ranges, one
+per pool process, and the handler awaits the results, so the event loop keeps
+serving other requests and the wall-clock time divides by the core count.
+
+Pool processes do not receive inventory arrays with each task: they map the
+same shared state file the web workers use (see shared_state.py) and read the
+current stock and sales history directly. They are forked lazily on first use
+and inherit the catalog, so only the items and the current day are sent per task.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional, Sequence
+import asyncio
+import multiprocessing
+import random
+
+from shared_state import SharedInventory
+
+
+def _attach(path: str):
+    # Pool process initializer: read inventory from the shared map. Reseed, as
+    # every forked process would otherwise draw the same "random" sample values.
+    from sample_data import INVENTORY
+    SharedInventory(path, INVENTORY).attach_reader()
+    random.seed()
+
+
+def _run(fn: Callable, day: int, items: list, args: tuple) -> list:
+    from sample_data import INVENTORY
+    INVENTORY.day = day
+    return fn(items, *args)
+
+
+class LocationPool:
+    """Runs fn(items, *args) -> one result per item over location partitions"""
+
+    def __init__(self, workers: int, shared_path: str):
+        self.workers = workers
+        self.shared_path = shared_path
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def _start(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_attach,
+                initargs=(self.shared_path,),
+            )
+        return self._executor
+
+    async def map(self, fn: Callable, items: list, locations: Sequence[int], n_locations: int,
+                  day: int, *args) -> list:
+        """fn over `items`, split by location position (`locations[k]` for items[k])
+        into one contiguous range per pool process; results keep the order of `items`"""
+        partitions: List[List[int]] = [[] for _ in range(self.workers)]
+        for k, j in enumerate(locations):
+            partitions[j * self.workers // n_locations].append(k)
+        partitions = [part for part in partitions if part]
+
+        executor = self._start()
+        loop = asyncio.get_running_loop()
+        chunks = await asyncio.gather(*(
+            loop.run_in_executor(executor, _run, fn, day, [items[k] for k in part], args)
+            for part in partitions
+        ))
+        results = [None] * len(items)
+        for part, chunk in zip(partitions, chunks):
+            for k, result in zip(part, chunk):
+                results[k] = result
+        return results
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
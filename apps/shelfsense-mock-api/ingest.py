@@ -0,0 +1,266 @@
+"""Bulk POS event ingestion: parsing, write-ahead log and batched apply"""
+from datetime import datetime
+from typing import Callable, Iterator, List, Tuple
+import json
+import os
+import struct
+import time
+import zlib
+
+import numpy as np
+
+from inventory_state import COUNT, RESTOCK, SALE, SECONDS_PER_DAY, InventoryState
+
+
+EVENT_TYPES = {"sale": SALE, "restock": RESTOCK, "count": COUNT}
+
+# Compact binary format: one packed little-endian record per event.
+# product and location are positions in GET /api/ingest/catalog;
+# timestamp is Unix seconds (0 means "now").
+EVENT_RECORD = np.dtype([
+    ("type", "u1"),
+    ("product", "<u2"),
+    ("location", "<u2"),
+    ("quantity", "<i4"),
+    ("timestamp", "<u4"),
+])
+
+MAX_REPORTED_ERRORS = 20
+
+
+def _in_range(field: str, value: int) -> int:
+    """value if it fits its EVENT_RECORD field, so one bad line can't overflow the batch"""
+    bounds = np.iinfo(EVENT_RECORD.fields[field][0])
+    if not bounds.min <= value <= bounds.max:
+        raise ValueError(f"{field} {value} is outside {bounds.min}..{bounds.max}")
+    return value
+
+
+def parse_json_lines(body: bytes, state: InventoryState) -> Tuple[np.ndarray, int, List[str]]:
+    """Parse newline-delimited JSON events into packed records.
+
+    Each line: {"type": "sale"|"restock"|"count", "product_id": ..., "location_id": ...,
+    "quantity": int, "timestamp": unix seconds or ISO-8601 (optional)}
+    """
+    now = int(time.time())
+    rows = []
+    rejected = 0
+    errors = []
+
+    for line_no, line in enumerate(body.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            event = json.loads(line)
+            kind = EVENT_TYPES[event["type"]]
+            product = state.product_index[event["product_id"]]
+            location = state.location_index[event["location_id"]]
+            quantity = int(event["quantity"])
+            if quantity < 0:
+                raise ValueError("quantity must be non-negative")
+            ts = event.get("timestamp")
+            if ts is None:
+                ts = now
+            elif isinstance(ts, str):
+                ts = int(datetime.fromisoformat(ts).timestamp())
+            rows.append((
+                kind,
+                _in_range("product", product),
+                _in_range("location", location),
+                _in_range("quantity", quantity),
+                _in_range("timestamp", min(int(ts), now)),
+            ))
+        except (ValueError, KeyError, TypeError, OverflowError) as e:
+            rejected += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append(f"line {line_no}: {e.__class__.__name__}: {e}")
+
+    return np.array(rows, dtype=EVENT_RECORD), rejected, errors
+
+
+def parse_binary(body: bytes, state: InventoryState) -> Tuple[np.ndarray, int, List[str]]:
+    """Decode packed EVENT_RECORD events, dropping records that fail validation"""
+    errors = []
+    usable = len(body) - len(body) % EVENT_RECORD.itemsize
+    if usable != len(body):
+        errors.append(f"trailing {len(body) - usable} bytes ignored (record size {EVENT_RECORD.itemsize})")
+
+    records = np.frombuffer(body[:usable], dtype=EVENT_RECORD).copy()
+    valid = (
+        (records["type"] <= COUNT)
+        & (records["product"] < state.shape[0])
+        & (records["location"] < state.shape[1])
+        & (records["quantity"] >= 0)
+    )
+    rejected = int((~valid).sum())
+    if rejected:
+        errors.append(f"{rejected} records with unknown type, product, location or negative quantity")
+
+    records = records[valid]
+    now = int(time.time())
+    records["timestamp"] = np.where(
+        (records["timestamp"] == 0) | (records["timestamp"] > now), now, records["timestamp"]
+    )
+    return records, rejected, errors
+
+
+class WriteAheadLog:
+    """Append-only log of accepted event batches.
+
+    Each batch is written as one framed record (sequence, length, crc32, payload)
+    and fsynced before it is applied, so an acknowledged batch survives a crash.
+    One fsync per batch keeps the cost per event small for large batches.
+    """
+
+    HEADER = struct.Struct("<QII")
+
+    def __init__(self, path: str, fsync: bool = True):
+        self.path = path
+        self.fsync = fsync
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.sequence = 0
+        self._file = open(path, "ab")
+
+    def append(self, payload: bytes) -> int:
+        self.sequence += 1
+        self._file.write(self.HEADER.pack(self.sequence, len(payload), zlib.crc32(payload)))
+        self._file.write(payload)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        return self.sequence
+
+    def replay(self) -> Iterator[Tuple[int, bytes]]:
+        """Yield (sequence, payload) for every intact record; stops at a torn tail.
+
+        A crash mid-append leaves a torn record at the end of the file. Once
+        replayed, the file is cut back to the last intact record, so batches
+        appended from then on are not hidden behind it at the next replay.
+        """
+        with open(self.path, "rb") as f:
+            intact = 0
+            while True:
+                header = f.read(self.HEADER.size)
+                if len(header) < self.HEADER.size:
+                    break
+                sequence, length, crc = self.HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    break
+                intact = f.tell()
+                self.sequence = max(self.sequence, sequence)
+                yield sequence, payload
+            torn = f.tell() > intact
+        if torn:
+            self._file.truncate(intact)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def truncate(self):
+        """Drop all records (after their effects have been persisted elsewhere)"""
+        self._file.truncate(0)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class EventIngestor:
+    """Parses, logs and applies event batches to inventory state and alerts"""
+
+    def __init__(self, state: InventoryState, wal: WriteAheadLog, alert_engine=None):
+        self.state = state
+        self.wal = wal
+        self.alert_engine = alert_engine
+        self.events_applied = 0
+        # Day the sales window stood at when derived state was last re-evaluated in full
+        self.evaluated_day = state.day
+        # Optional tracker told which SKU-locations each batch touched (see shared_state.py)
+        self.changes = None
+        # Callbacks given the touched SKU-locations after alerts are refreshed (e.g. leaderboards)
+        self.listeners: List[Callable[[np.ndarray], None]] = []
+
+    def ingest(self, body: bytes, binary: bool = False) -> dict:
+        parse = parse_binary if binary else parse_json_lines
+        records, rejected, errors = parse(body, self.state)
+        sequence = self.wal.append(records.tobytes()) if len(records) else self.wal.sequence
+        touched = self.apply(records, sequence)
+        return {
+            "accepted": int(len(records)),
+            "rejected": rejected,
+            "sku_locations_updated": int(len(touched)),
+            "sequence": sequence,
+            "errors": errors,
+        }
+
+    def apply(self, records: np.ndarray, sequence: int = 0) -> np.ndarray:
+        """Apply packed records in bulk, then re-evaluate derived state for touched SKU-locations only"""
+        if not len(records):
+            return np.empty(0, dtype=np.int64)
+
+        state = self.state
+        touched = state.apply(
+            records["type"],
+            records["product"].astype(np.intp),
+            records["location"].astype(np.intp),
+            records["quantity"].astype(np.int32),
+            records["timestamp"].astype(np.int64) // SECONDS_PER_DAY,
+        )
+        self.events_applied += len(records)
+        if self.changes is not None:
+            self.changes.mark(touched, sequence)
+        self.refresh(touched)
+        return touched
+
+    def advance_day(self, day: int) -> int:
+        """Move the sales window on to `day` (e.g. past midnight with nothing ingested yet).
+
+        Trailing velocity and demand deviation shift with the window, so every
+        SKU-location with sales history is re-evaluated once per new day, also when
+        the day already moved with a batch or another worker. Returns how many were.
+        """
+        self.state.advance_to(day)
+        if self.state.day == self.evaluated_day:
+            return 0
+        self.evaluated_day = self.state.day
+        touched = np.flatnonzero(self.state.observed.reshape(-1))
+        self.refresh(touched)
+        return len(touched)
+
+    def refresh(self, touched: np.ndarray):
+        """Re-evaluate alerts and notify listeners for SKU-locations (flat indices)"""
+        self._refresh_alerts(touched)
+        for listener in self.listeners:
+            listener(touched)
+
+    def _refresh_alerts(self, touched: np.ndarray):
+        if self.alert_engine is None:
+            return
+        state = self.state
+        for flat_key in touched.tolist():
+            product_id, location_id = state.unravel(flat_key)
+            current, min_stock, max_stock = state.levels(product_id, location_id)
+            metrics = state.sales_metrics(product_id, location_id) or {}
+            metrics.pop("month_over_month_change", None)
+            metrics.pop("daily_velocity", None)
+            self.alert_engine.observe(
+                product_id, location_id,
+                current_stock=current, min_stock=min_stock, max_stock=max_stock,
+                **metrics
+            )
+
+    def replay(self, after_sequence: int = 0) -> int:
+        """Re-apply logged batches newer than a snapshot checkpoint; returns the number of events"""
+        replayed = 0
+        for sequence, payload in self.wal.replay():
+            if sequence <= after_sequence:
+                continue
+            records = np.frombuffer(payload, dtype=EVENT_RECORD)
+            self.apply(records, sequence)
+            replayed += len(records)
+        # Keep numbering past the checkpoint even when the log was truncated
+        self.wal.sequence = max(self.wal.sequence, after_sequence)
+        return replayed
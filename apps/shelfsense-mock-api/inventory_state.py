@@ -0,0 +1,235 @@
+"""In-memory inventory state for every SKU-location, stored as dense arrays"""
+from typing import Dict, List, Optional, Tuple
+import time
+
+import numpy as np
+
+
+# Event type codes shared by the JSON and binary ingestion formats
+SALE = 0
+RESTOCK = 1
+COUNT = 2
+
+SECONDS_PER_DAY = 86400
+
+# Stock status names, indexed by the codes stock_status() returns
+STOCK_STATUSES = ("optimal", "low", "critical", "overstock")
+
+
+def current_day() -> int:
+    """Days since the Unix epoch (UTC), the unit of the sales history"""
+    return int(time.time()) // SECONDS_PER_DAY
+
+
+class InventoryState:
+    """Stock levels and daily unit sales, indexed [product, location].
+
+    Arrays are dense so a batch of events is applied with a handful of numpy
+    scatter-adds rather than a Python loop per event. Sales are bucketed per
+    day in a ring buffer of HISTORY_DAYS.
+    """
+
+    HISTORY_DAYS = 56
+    # Arrays that make up the persistent state (see snapshot.py)
+    ARRAYS = ("stock", "min_stock", "max_stock", "sales", "observed")
+    DTYPES = {"stock": np.int32, "min_stock": np.int32, "max_stock": np.int32, "sales": np.int32, "observed": bool}
+
+    def __init__(self, product_ids: List[str], location_ids: List[str], seed: Optional[int] = None):
+        self.reset(product_ids, location_ids, seed)
+
+    def reset(self, product_ids: List[str], location_ids: List[str], seed: Optional[int] = None):
+        """(Re)build state for a catalog, discarding everything ingested"""
+        self.product_ids = list(product_ids)
+        self.location_ids = list(location_ids)
+        self.product_index: Dict[str, int] = {pid: i for i, pid in enumerate(self.product_ids)}
+        self.location_index: Dict[str, int] = {lid: j for j, lid in enumerate(self.location_ids)}
+        self.shape = (len(self.product_ids), len(self.location_ids))
+        self.seed = seed
+        self.day = current_day()
+        # The baseline arrays are generated on first access (see __getattr__),
+        # so a warm start that restores a snapshot never builds them
+        for name in self.ARRAYS:
+            self.__dict__.pop(name, None)
+
+    def __getattr__(self, name: str):
+        # Only reached while an array has not been generated or restored yet
+        if name in self.ARRAYS:
+            self._generate_baseline()
+            return self.__dict__[name]
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+    def _generate_baseline(self):
+        # Same bands generate_inventory_status has always used
+        rng = np.random.default_rng(self.seed)
+        self.min_stock = rng.integers(3, 9, self.shape).astype(np.int32)
+        self.max_stock = (self.min_stock + rng.integers(10, 26, self.shape)).astype(np.int32)
+        self.stock = rng.integers(0, self.max_stock + 6).astype(np.int32)
+
+        self.sales = np.zeros(self.shape + (self.HISTORY_DAYS,), dtype=np.int32)
+        # SKU-locations that have received real sales, so trends come from history
+        self.observed = np.zeros(self.shape, dtype=bool)
+
+    def array_shape(self, name: str) -> Tuple[int, ...]:
+        return self.shape + (self.HISTORY_DAYS,) if name == "sales" else self.shape
+
+    def restore(self, arrays: Dict[str, np.ndarray], day: int):
+        """Replace state with previously exported arrays of the same shape"""
+        for name in self.ARRAYS:
+            expected = self.array_shape(name)
+            if arrays[name].shape != expected:
+                raise ValueError(f"{name} has shape {arrays[name].shape}, expected {expected}")
+            setattr(self, name, arrays[name].astype(self.DTYPES[name], copy=False))
+        self.day = day
+        self.advance_to(current_day())
+
+    def attach(self, arrays: Dict[str, np.ndarray], day: int):
+        """Use externally owned arrays (e.g. a shared memory map) as the state, without copying"""
+        for name in self.ARRAYS:
+            expected = self.array_shape(name)
+            if arrays[name].shape != expected or arrays[name].dtype != self.DTYPES[name]:
+                raise ValueError(f"{name} is {arrays[name].dtype}{arrays[name].shape}, expected {expected}")
+            setattr(self, name, arrays[name])
+        self.day = day
+
+    def index(self, product_id: str, location_id: str) -> Optional[Tuple[int, int]]:
+        i = self.product_index.get(product_id)
+        j = self.location_index.get(location_id)
+        if i is None or j is None:
+            return None
+        return i, j
+
+    def advance_to(self, day: int):
+        """Roll the sales ring buffer forward, clearing days that fell out of the window"""
+        if day <= self.day:
+            return
+        elapsed = min(day - self.day, self.HISTORY_DAYS)
+        for offset in range(1, elapsed + 1):
+            self.sales[:, :, (self.day + offset) % self.HISTORY_DAYS] = 0
+        self.day = day
+
+    def apply(self, kinds: np.ndarray, products: np.ndarray, locations: np.ndarray,
+              quantities: np.ndarray, days: np.ndarray) -> np.ndarray:
+        """Apply a batch of events in order. Returns the flat indices of touched SKU-locations."""
+        if not len(kinds):
+            return np.empty(0, dtype=np.int64)
+
+        self.advance_to(int(days.max()))
+        n_locations = self.shape[1]
+        keys = products.astype(np.int64) * n_locations + locations
+        flat_stock = self.stock.reshape(-1)
+
+        # Stock counts are absolute: the last count per SKU-location resets stock,
+        # and only deltas after it in the batch apply on top
+        delta = np.where(kinds == SALE, -quantities, np.where(kinds == RESTOCK, quantities, 0))
+        is_count = kinds == COUNT
+        if is_count.any():
+            order = np.arange(len(kinds))
+            count_positions = order[is_count]
+            count_keys = keys[is_count]
+            # Reverse so np.unique picks the last count for each key
+            uniq, first_rev = np.unique(count_keys[::-1], return_index=True)
+            last_positions = count_positions[::-1][first_rev]
+            flat_stock[uniq] = quantities[last_positions]
+
+            last_count = np.full(len(keys), -1, dtype=np.int64)
+            has_count = np.isin(keys, uniq)
+            last_count[has_count] = last_positions[np.searchsorted(uniq, keys[has_count])]
+            delta = np.where(order > last_count, delta, 0)
+
+        np.add.at(flat_stock, keys, delta.astype(np.int32))
+        np.maximum(flat_stock, 0, out=flat_stock)
+
+        is_sale = kinds == SALE
+        in_window = days > self.day - self.HISTORY_DAYS
+        recorded = is_sale & in_window
+        if recorded.any():
+            slots = days[recorded] % self.HISTORY_DAYS
+            np.add.at(self.sales, (products[recorded], locations[recorded], slots), quantities[recorded])
+            self.observed[products[recorded], locations[recorded]] = True
+
+        return np.unique(keys)
+
+    def unravel(self, flat_key: int) -> Tuple[str, str]:
+        i, j = divmod(int(flat_key), self.shape[1])
+        return self.product_ids[i], self.location_ids[j]
+
+    def levels(self, product_id: str, location_id: str) -> Optional[Tuple[int, int, int]]:
+        """(current_stock, min_stock, max_stock) or None for an unknown SKU-location"""
+        idx = self.index(product_id, location_id)
+        if idx is None:
+            return None
+        return int(self.stock[idx]), int(self.min_stock[idx]), int(self.max_stock[idx])
+
+    def stock_status(self, j: int) -> np.ndarray:
+        """Status code (position in STOCK_STATUSES) of every product at location j.
+
+        Same bands as inventory_status_row: below half of min_stock is critical,
+        below min_stock low, above max_stock overstock.
+        """
+        stock, min_stock, max_stock = self.stock[:, j], self.min_stock[:, j], self.max_stock[:, j]
+        return np.select(
+            [stock < min_stock * 0.5, stock < min_stock, stock > max_stock],
+            [2, 1, 3],
+            default=0,
+        ).astype(np.int8)
+
+    def history(self, i: int, j: int) -> np.ndarray:
+        """Daily unit sales, oldest first, ending today"""
+        return np.roll(self.sales[i, j], -(self.day % self.HISTORY_DAYS + 1))
+
+    def daily_velocity(self, product_id: str, location_id: Optional[str] = None) -> Optional[float]:
+        """Average daily units over the last 28 days, or None without ingested history.
+
+        With no location, averaged over the locations that have history for the product.
+        """
+        i = self.product_index.get(product_id)
+        if i is None:
+            return None
+        if location_id is None:
+            locations = np.flatnonzero(self.observed[i])
+            if not len(locations):
+                return None
+            rows = self.sales[i, locations]
+        else:
+            j = self.location_index.get(location_id)
+            if j is None or not self.observed[i, j]:
+                return None
+            locations, rows = (j,), self.sales[i, j]
+        total = self._window(rows, 28).sum()
+        return round(int(total) / 28 / len(locations), 2)
+
+    def _window(self, rows: np.ndarray, days: int) -> np.ndarray:
+        """The last `days` ring-buffer slots ending today (in slot order, not date order)"""
+        end = self.day % self.HISTORY_DAYS + 1
+        if end >= days:
+            return rows[..., end - days:end]
+        # As two slices, wrapping around the end of the buffer
+        return np.concatenate((rows[..., :end], rows[..., end - days:]), axis=-1)
+
+    def location_velocity(self, j: int) -> np.ndarray:
+        """Average daily units over the last 28 days of every product at location j,
+        NaN for products without ingested history"""
+        velocity = self._window(self.sales[:, j], 28).sum(axis=-1) / 28
+        return np.where(self.observed[:, j], velocity, np.nan)
+
+    def sales_metrics(self, product_id: str, location_id: str) -> Optional[dict]:
+        """Velocity and trend metrics from ingested sales, or None if the key has no history"""
+        idx = self.index(product_id, location_id)
+        if idx is None or not self.observed[idx]:
+            return None
+
+        history = self.history(*idx)
+        last_7 = int(history[-7:].sum())
+        prev_7 = int(history[-14:-7].sum())
+        last_28 = int(history[-28:].sum())
+        prev_28 = int(history[-56:-28].sum())
+        # Today against the trailing 7-day average before it
+        baseline = int(history[-8:-1].sum()) / 7
+        today = int(history[-1])
+
+        return {
+            "daily_velocity": round(last_28 / 28, 2),
+            "week_over_week_change": round((last_7 - prev_7) / prev_7 * 100, 1) if prev_7 else 0.0,
+            "month_over_month_change": round((last_28 - prev_28) / prev_28 * 100, 1) if prev_28 else 0.0,
+            "demand_deviation_pct": round((today - baseline) / baseline * 100, 1) if baseline else 0.0,
+        }
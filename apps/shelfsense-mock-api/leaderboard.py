@@ -0,0 +1,85 @@
+"""Incrementally maintained top-K rankings"""
+from bisect import bisect_left, insort
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class Leaderboard:
+    """Keys ranked by score, highest first; equal scores rank by key ascending.
+
+    Entries live in one sorted list of (-score, key), so a top-N read is a slice
+    (O(N)) and a score change is a binary search plus one list move.
+    """
+
+    def __init__(self):
+        self._order: List[Tuple[float, Hashable]] = []
+        self._scores: Dict[Hashable, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def update(self, key: Hashable, score: float):
+        old = self._scores.get(key)
+        if old == score:
+            return
+        if old is not None:
+            del self._order[bisect_left(self._order, (-old, key))]
+        self._scores[key] = score
+        insort(self._order, (-score, key))
+
+    def top(self, n: int) -> List[Hashable]:
+        return [key for _, key in self._order[:n]]
+
+
+class PerformanceLeaderboards:
+    """Per-location and network-wide product rankings by performance score.
+
+    `score(product_id, location_id)` gives the current score, with location_id
+    None for the network-wide figure. A board is built the first time it is
+    read; after that, refresh() re-scores only SKU-locations whose sales changed.
+    Velocity is a trailing window, so boards are rebuilt once `day()` moves on.
+    """
+
+    def __init__(self, score: Callable[[str, Optional[str]], float], day: Callable[[], int]):
+        self.score = score
+        self.day = day
+        self.built_day: Optional[int] = None
+        self.product_ids: List[str] = []
+        self.location_ids: List[str] = []
+        self.boards: Dict[Optional[str], Leaderboard] = {}
+
+    def reset(self, product_ids: List[str], location_ids: List[str]):
+        self.product_ids = list(product_ids)
+        self.location_ids = list(location_ids)
+        self.boards.clear()
+
+    def _board(self, location_id: Optional[str]) -> Leaderboard:
+        if self.day() != self.built_day:
+            self.boards.clear()
+            self.built_day = self.day()
+        board = self.boards.get(location_id)
+        if board is None:
+            board = Leaderboard()
+            for product_id in self.product_ids:
+                board.update(product_id, self.score(product_id, location_id))
+            self.boards[location_id] = board
+        return board
+
+    def top(self, location_id: Optional[str], n: int) -> List[str]:
+        """Product ids of the n best performers at a location (None: network-wide)"""
+        return self._board(location_id).top(n)
+
+    def refresh(self, touched):
+        """Re-score SKU-locations (flat indices) after their sales changed"""
+        if not self.boards:
+            return
+        n_locations = len(self.location_ids)
+        products = set()
+        for flat_key in touched.tolist():
+            i, j = divmod(flat_key, n_locations)
+            product_id, location_id = self.product_ids[i], self.location_ids[j]
+            products.add(product_id)
+            if location_id in self.boards:
+                self.boards[location_id].update(product_id, self.score(product_id, location_id))
+        if None in self.boards:
+            for product_id in products:
+                self.boards[None].update(product_id, self.score(product_id, None))
@@ -1,31 +1,367 @@
 """ShelfSense Mock API Server - FastAPI Application"""
-from fastapi import FastAPI, HTTPException, Query
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from typing import List, Optional
 from datetime import datetime, timedelta
+import asyncio
+import os
+import time
 import uvicorn
 
 from models import (
-    Product, Location, PickList, ModelAccuracy,
+    Product, ProductMatch, Location, PickList, ModelAccuracy,
     InventoryStatus, DemandForecast, AnalyticsSummary,
-    ProductPerformance, TrendData, AlertsSummary
+    ProductPerformance, TrendData, Alert, AlertsSummary, TransferPlan, SyncChanges, IngestResult
 )
+from admission import AdmissionMiddleware, parse_limits
+from compression import CompressedBodyCache, CompressionMiddleware, compress, negotiate
+from fanout import LocationPool
+from alert_stream import AlertStream
+from changelog import ChangeLog, new_epoch
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, MetricsRegistry, route_template
+from profiling import ProfilingMiddleware
+from readiness import Readiness, ReadinessGate
+from shared_state import SharedInventory
+from ingest import EVENT_RECORD, EVENT_TYPES, EventIngestor, WriteAheadLog
+from inventory_state import current_day
+from sharding import assign_shards, parse_shard
+from snapshot import SnapshotStore
 from sample_data import (
-    PRODUCTS, LOCATIONS,
-    generate_pick_list, generate_model_accuracy,
-    generate_inventory_status, generate_demand_forecast,
-    generate_analytics_summary, generate_product_performance,
-    generate_trend_data, generate_alerts
+    PRODUCTS, LOCATIONS, PRODUCTS_BY_ID, LOCATIONS_BY_ID, INVENTORY, ALERT_ENGINE, LEADERBOARDS,
+    PICK_LISTS, PRODUCT_SEARCH,
+    build_pick_lists, changed_pick_list_items, generate_model_accuracy,
+    inventory_status_row, location_inventory_rows, generate_forecast_matrix, forecast_rows,
+    MAX_FORECAST_HORIZON_DAYS,
+    generate_analytics_summary, product_performance_row,
+    trend_row, trend_rows, generate_alerts, transfer_plan, load_catalog
 )
 
+# Sharded deployment: SHARD=<index>/<count> serves only that shard's locations
+# (see sharding.py); router.py sends each request to the right shard
+SHARD = os.getenv("SHARD")
+if SHARD:
+    SHARD_INDEX, SHARD_COUNT = parse_shard(SHARD)
+    shard_of = assign_shards(LOCATIONS, SHARD_COUNT, os.getenv("SHARD_STRATEGY", "region"))
+    load_catalog(list(PRODUCTS), [loc for loc in LOCATIONS if shard_of[loc.id] == SHARD_INDEX])
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+if SHARD:
+    # Each shard restores its own catalog, so it keeps its own log and snapshot
+    DATA_DIR = os.path.join(DATA_DIR, f"shard-{SHARD_INDEX}-of-{SHARD_COUNT}")
+DATA_DIR = os.getenv("SHELFSENSE_DATA_DIR", DATA_DIR)
+
+ingestor = EventIngestor(
+    INVENTORY,
+    WriteAheadLog(os.path.join(DATA_DIR, "ingest.wal"), fsync=os.getenv("INGEST_WAL_FSYNC", "1") == "1"),
+    ALERT_ENGINE,
+)
+ingestor.listeners.append(LEADERBOARDS.refresh)
+ingestor.listeners.append(PICK_LISTS.invalidate)
+
+# Resume tokens carry a per-process epoch too, for the same reason as sync versions below
+alert_stream = AlertStream(ALERT_ENGINE, epoch=new_epoch())
+
+# Delta sync: one version per ingestion batch and alert change (see changelog.py).
+# Each worker and each restart gets its own epoch, so a version from another
+# process is never read as one of ours: the client resyncs instead.
+sync_log = ChangeLog(int(os.getenv("SYNC_LOG_MAX_ENTRIES", 100000)), epoch=new_epoch())
+
+
+def record_inventory_changes(touched):
+    if len(touched):
+        sync_log.record(("inventory", key) for key in touched.tolist())
+
+
+def record_alert_change(version: int, change: str, alert: Alert):
+    sync_log.record([("alert", alert.location_id, alert.id)], removed=change == "resolved")
+
+
+ingestor.listeners.append(record_inventory_changes)
+ALERT_ENGINE.subscribe(record_alert_change)
+
+snapshots = SnapshotStore(os.path.join(DATA_DIR, "snapshot.db"))
+SNAPSHOT_INTERVAL_SECONDS = float(os.getenv("SNAPSHOT_INTERVAL_SECONDS", 60))
+# How often to check whether the sales window has to move on to a new day
+DAY_ROLL_INTERVAL_SECONDS = float(os.getenv("DAY_ROLL_INTERVAL_SECONDS", 60))
+
+# uvicorn starts this many worker processes (its --workers default reads the same
+# variable); with more than one they share the inventory arrays (see shared_state.py)
+WORKERS = int(os.getenv("WEB_CONCURRENCY", 1))
+SHARED_STATE_PATH = os.getenv("SHARED_STATE_PATH", os.path.join(DATA_DIR, "inventory.shm"))
+SHARED_FOLLOW_INTERVAL_SECONDS = float(os.getenv("SHARED_FOLLOW_INTERVAL_SECONDS", 0.25))
+shared: Optional[SharedInventory] = None
+
+# Processes that network-wide anomalies and pick-list builds fan out over (see
+# fanout.py); 0 runs them in the request handler. The pool reads inventory from
+# the shared state map, so setting it also turns on shared state.
+FANOUT_WORKERS = int(os.getenv("FANOUT_WORKERS", 0))
+pool = LocationPool(FANOUT_WORKERS, SHARED_STATE_PATH)
+
+metrics = MetricsRegistry()
+metrics.gauge("alerts_active", "Active alerts by severity.",
+              lambda: {(("severity", s),): ALERT_ENGINE.counts()[f"{s}_count"] for s in ("critical", "warning", "info")})
+metrics.gauge("alert_stream_subscribers", "Open alert SSE connections.",
+              lambda: {(): alert_stream.subscribers})
+metrics.gauge("ingest_events_applied", "POS events applied since start (including replay).",
+              lambda: {(): ingestor.events_applied})
+metrics.gauge("ingest_wal_sequence", "Last ingestion batch sequence number.",
+              lambda: {(): ingestor.wal.sequence})
+metrics.gauge("sync_log_entries", "Rows held in the delta sync change log.",
+              lambda: {(): len(sync_log)})
+
+# Admission control: "class=concurrency:queue size" per cost class. Handlers
+# compute on the event loop, so admitting more than one catalog-wide request at
+# a time only lengthens the wait for everything behind them.
+ADMISSION_LIMITS = os.getenv("ADMISSION_LIMITS", "catalog=1:16,location=2:32,ingest=1:16")
+ADMISSION_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_TIMEOUT_SECONDS", 10))
+cost_classes = parse_limits(ADMISSION_LIMITS, ADMISSION_TIMEOUT_SECONDS)
+
+# Route template -> (cost class, cost class when scoped by location_id or product_id).
+# Unlisted routes are cheap lookups and never queued.
+ROUTE_COSTS = {
+    "/api/pick-list/all": ("catalog", "catalog"),
+    "/api/forecast/demand": ("location", "location"),
+    "/api/inventory/status": (None, "location"),
+    "/api/analytics/product-performance": (None, "location"),
+    "/api/analytics/top-performers": ("location", "location"),
+    "/api/analytics/trends": (None, "location"),
+    "/api/analytics/anomalies": ("catalog", "location"),
+    "/api/transfers/recommendations": ("catalog", "catalog"),
+    "/api/sync/changes": ("catalog", "location"),
+    "/api/ingest/events": ("ingest", "ingest"),
+}
+
+
+def cost_class(scope) -> Optional[str]:
+    costs = ROUTE_COSTS.get(route_template(scope))
+    if costs is None:
+        return None
+    query = scope.get("query_string", b"")
+    scoped = b"location_id=" in query or b"product_id=" in query
+    return costs[1] if scoped else costs[0]
+
+
+metrics.gauge("admission_active", "Requests holding an admission slot, by cost class.",
+              lambda: {(("class", c.name),): c.active for c in cost_classes.values()})
+metrics.gauge("admission_queued", "Requests waiting for an admission slot, by cost class.",
+              lambda: {(("class", c.name),): c.queued for c in cost_classes.values()})
+metrics.counter("admission_rejected_total", "Requests turned away (429 queue_full, 503 timeout).",
+                lambda: {(("class", c.name), ("reason", r)): n
+                         for c in cost_classes.values() for r, n in c.rejected.items()})
+
+# Response compression: bodies under COMPRESSION_MIN_BYTES are sent as-is, and
+# compressed bodies are cached by digest so identical responses compress once
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", 1024))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4))
+compressed_bodies = CompressedBodyCache(
+    int(float(os.getenv("COMPRESSION_CACHE_MB", 16)) * 1024 * 1024),
+    stats=metrics.cache("compressed_bodies"),
+)
+metrics.gauge("compression_cache_bytes", "Bytes held by the compressed response cache.",
+              lambda: {(): compressed_bodies.bytes})
+
+# Pick lists are served from stored plans (see pick_plans.py). Every night at
+# PICK_LIST_PRECOMPUTE_HOUR (local time, -1 disables) the next day's plans are
+# built for every location; other dates are built on first request.
+PICK_LIST_PRECOMPUTE_HOUR = int(os.getenv("PICK_LIST_PRECOMPUTE_HOUR", 22))
+PICK_LISTS.max_plans = int(os.getenv("PICK_LIST_MAX_PLANS", 10000))
+PICK_LISTS.stats = metrics.cache("pick_lists")
+PICK_LISTS.compress_min_bytes = COMPRESSION_MIN_BYTES
+PICK_LISTS.compress = lambda body, encoding: compress(
+    body, encoding, COMPRESSION_GZIP_LEVEL, COMPRESSION_BROTLI_QUALITY)
+metrics.gauge("pick_list_plans", "Stored pick-list plans.",
+              lambda: {(): len(PICK_LISTS)})
+
+
+def take_snapshot():
+    """Persist current state, then drop log records the snapshot now covers.
+
+    Runs synchronously on the event loop so no batch can be appended between
+    the save and the log truncation. With shared workers, only the leader
+    snapshots, under the write lock.
+    """
+    if shared is None:
+        snapshots.save(INVENTORY, ALERT_ENGINE, ingestor.wal.sequence)
+        ingestor.wal.truncate()
+        return
+    if not shared.try_lead():
+        return
+    with shared.locked():
+        shared.follow(ingestor)
+        snapshots.save(INVENTORY, ALERT_ENGINE, ingestor.wal.sequence)
+        ingestor.wal.truncate()
+
+
+async def snapshot_periodically():
+    saved = (ingestor.wal.sequence, ALERT_ENGINE.version)
+    while True:
+        await asyncio.sleep(SNAPSHOT_INTERVAL_SECONDS)
+        current = (ingestor.wal.sequence, ALERT_ENGINE.version)
+        if current != saved:
+            take_snapshot()
+            saved = current
+
+
+def roll_day():
+    """Move the sales window to today even when nothing was ingested since midnight"""
+    today = current_day()
+    if shared is not None and today > INVENTORY.day:
+        with shared.locked():
+            shared.follow(ingestor)
+            INVENTORY.advance_to(today)
+            shared.commit_day()
+    ingestor.advance_day(today)
+
+
+async def roll_day_periodically():
+    while True:
+        await asyncio.sleep(DAY_ROLL_INTERVAL_SECONDS)
+        roll_day()
+
+
+async def follow_shared_state():
+    """Apply other workers' ingestion to this worker's alert index"""
+    while True:
+        await asyncio.sleep(SHARED_FOLLOW_INTERVAL_SECONDS)
+        shared.follow(ingestor)
+
+
+async def build_pick_lists_in_pool(date: str, location_ids: List[str]):
+    """Build plans across the fan-out pool, keeping those whose stock did not change meanwhile"""
+    built_at = PICK_LISTS.changes
+    plans = await pool.map(build_pick_lists, location_ids, [INVENTORY.location_index[l] for l in location_ids],
+                           INVENTORY.shape[1], INVENTORY.day, date)
+    for location_id, plan in zip(location_ids, plans):
+        PICK_LISTS.put(location_id, date, plan, built_at)
+
+
+async def precompute_pick_lists(day: datetime):
+    """Build every location's plan for a day, letting requests run between locations"""
+    date = day.strftime("%Y-%m-%d")
+    if pool.enabled:
+        await build_pick_lists_in_pool(date, [loc.id for loc in LOCATIONS])
+        return
+    for location in list(LOCATIONS):
+        PICK_LISTS.precompute(date, [location.id])
+        await asyncio.sleep(0)
+
+
+async def precompute_pick_lists_nightly():
+    # Today's and tomorrow's plans at startup, then the next day's every night
+    await precompute_pick_lists(datetime.now())
+    await precompute_pick_lists(datetime.now() + timedelta(days=1))
+    while True:
+        now = datetime.now()
+        run_at = now.replace(hour=PICK_LIST_PRECOMPUTE_HOUR, minute=0, second=0, microsecond=0)
+        if run_at <= now:
+            run_at += timedelta(days=1)
+        await asyncio.sleep((run_at - now).total_seconds())
+        PICK_LISTS.prune(datetime.now().strftime("%Y-%m-%d"))
+        await precompute_pick_lists(datetime.now() + timedelta(days=1))
+
+
+readiness = Readiness()
+
+
+def warm_start() -> dict:
+    """Load the last snapshot, then replay only newer ingestion batches"""
+    started = time.perf_counter()
+    meta = snapshots.load(INVENTORY, ALERT_ENGINE)
+    replayed = ingestor.replay(after_sequence=meta["wal_sequence"] if meta else 0)
+    return {
+        "snapshot_loaded": meta is not None,
+        "events_replayed": replayed,
+        "warm_start_seconds": round(time.perf_counter() - started, 4),
+    }
+
+
+def shared_warm_start() -> dict:
+    """Restore state into the shared map, or attach to the one another worker restored"""
+    global shared
+    started = time.perf_counter()
+    shared = SharedInventory(SHARED_STATE_PATH, INVENTORY)
+    with shared.locked():
+        if not shared.is_live():
+            shared.reset_changes()
+            ingestor.changes = shared
+            details = warm_start()
+            shared.publish(ingestor.wal.sequence)
+            return {**details, "worker": os.getpid(), "role": "restored shared state",
+                    "leader": shared.try_lead()}
+
+        # Arrays are already current; only the alert index is per worker
+        shared.attach()
+        ingestor.changes = shared
+        meta = snapshots.load(INVENTORY, ALERT_ENGINE, restore_inventory=False)
+        shared.seen_sequence = meta["wal_sequence"] if meta else 0
+        refreshed = shared.follow(ingestor)
+    return {
+        "snapshot_loaded": meta is not None,
+        "alerts_refreshed": refreshed,
+        "warm_start_seconds": round(time.perf_counter() - started, 4),
+        "worker": os.getpid(),
+        "role": "attached to shared state",
+        "leader": shared.try_lead(),
+    }
+
+
+async def start_in_background():
+    # Off the event loop so /health and /ready answer while state is restored;
+    # /api/* is held back by ReadinessGate until this finishes
+    try:
+        details = await asyncio.to_thread(shared_warm_start if WORKERS > 1 or pool.enabled else warm_start)
+    except Exception as exc:
+        readiness.mark_failed(repr(exc))
+        raise
+    readiness.mark_ready(**details)
+    tasks = []
+    if shared is not None:
+        tasks.append(follow_shared_state())
+    if SNAPSHOT_INTERVAL_SECONDS > 0:
+        tasks.append(snapshot_periodically())
+    if DAY_ROLL_INTERVAL_SECONDS > 0:
+        tasks.append(roll_day_periodically())
+    if PICK_LIST_PRECOMPUTE_HOUR >= 0:
+        tasks.append(precompute_pick_lists_nightly())
+    await asyncio.gather(*tasks)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    task = asyncio.create_task(start_in_background())
+    yield
+    task.cancel()
+    # A snapshot taken before the warm start finished would overwrite the good one
+    if readiness.ready:
+        take_snapshot()
+    ingestor.wal.close()
+    pool.shutdown()
+
 
 app = FastAPI(
     title="ShelfSense Mock API",
     description="Mock API server for ShelfSense micromarket inventory management",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
-# Enable CORS for all origins (adjust in production)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=COMPRESSION_MIN_BYTES,
+    gzip_level=COMPRESSION_GZIP_LEVEL,
+    brotli_quality=COMPRESSION_BROTLI_QUALITY,
+    cache=compressed_bodies,
+    compress_streams=os.getenv("COMPRESS_STREAMS", "1") == "1",
+)
+app.add_middleware(AdmissionMiddleware, classes=cost_classes, classify=cost_class)
+app.add_middleware(ReadinessGate, readiness=readiness)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware, registry=metrics)
+# Enable CORS for all origins (adjust in production). Added last so it is the
+# outermost layer and admission and readiness rejections carry CORS headers too
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -41,14 +377,21 @@ async def root():
     return {
         "message": "ShelfSense Mock API",
         "version": "1.0.0",
+        "shard": SHARD,
         "endpoints": {
             "locations": "/api/locations",
             "products": "/api/products",
+            "product_search": "/api/products/search",
             "pick_list": "/api/pick-list",
             "model_accuracy": "/api/models/product-accuracy",
             "inventory_status": "/api/inventory/status",
             "demand_forecast": "/api/forecast/demand",
-            "analytics": "/api/analytics/summary"
+            "analytics": "/api/analytics/summary",
+            "ingest_events": "/api/ingest/events",
+            "alert_stream": "/api/alerts/stream",
+            "sync_changes": "/api/sync/changes",
+            "metrics": "/metrics",
+            "ready": "/ready"
         }
     }
 
@@ -59,6 +402,18 @@ async def health_check():
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 200 once the snapshot is loaded and the ingestion log replayed"""
+    return JSONResponse(readiness.status(), status_code=200 if readiness.ready else 503)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Request, cache and state metrics in Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+
 # ==================== Locations ====================
 
 @app.get("/api/locations", response_model=List[Location])
@@ -75,7 +430,7 @@ async def get_locations(
 @app.get("/api/locations/{location_id}", response_model=Location)
 async def get_location(location_id: str):
     """Get a specific location by ID"""
-    location = next((loc for loc in LOCATIONS if loc.id == location_id), None)
+    location = LOCATIONS_BY_ID.get(location_id)
     if not location:
         raise HTTPException(status_code=404, detail=f"Location {location_id} not found")
     return location
@@ -94,10 +449,23 @@ async def get_products(
     return PRODUCTS
 
 
+@app.get("/api/products/search", response_model=List[ProductMatch])
+async def search_products(
+    q: str = Query(..., description="Free-text product name, supplier or category; typos and partial words are fine"),
+    category: Optional[str] = Query(None, description="Only products in this category"),
+    limit: int = Query(10, description="Number of matches to return", ge=1, le=50)
+):
+    """Products ranked by how well they match a free-text query"""
+    return [
+        ProductMatch(**product.model_dump(), score=score)
+        for product, score in PRODUCT_SEARCH.search(q, limit, category)
+    ]
+
+
 @app.get("/api/products/{product_id}", response_model=Product)
 async def get_product(product_id: str):
     """Get a specific product by ID"""
-    product = next((prod for prod in PRODUCTS if prod.id == product_id), None)
+    product = PRODUCTS_BY_ID.get(product_id)
     if not product:
         raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
     return product
@@ -107,13 +475,14 @@ async def get_product(product_id: str):
 
 @app.get("/api/pick-list", response_model=PickList)
 async def get_pick_list(
+    request: Request,
     location_id: str = Query(..., description="Location ID"),
     date: Optional[str] = Query(None, description="Date (YYYY-MM-DD), defaults to today")
 ):
     """Get pick list for a specific location and date"""
     # Validate location exists unless using the aggregate "all" view
     if location_id != "all":
-        location = next((loc for loc in LOCATIONS if loc.id == location_id), None)
+        location = LOCATIONS_BY_ID.get(location_id)
         if not location:
             raise HTTPException(status_code=404, detail=f"Location {location_id} not found")
 
@@ -121,9 +490,16 @@ async def get_pick_list(
     if not date:
         date = datetime.now().strftime("%Y-%m-%d")
 
-    # Generate pick list
-    pick_list = generate_pick_list(location_id, date)
-    return pick_list
+    # Stored plans are already rendered, and compressed once per encoding, so they
+    # skip response validation and CompressionMiddleware passes them through
+    accept = request.headers.get("accept-encoding")
+    encoding = negotiate(accept) if accept else None
+    if encoding is not None:
+        body = PICK_LISTS.compressed(location_id, date, encoding)
+        if body is not None:
+            return Response(body, media_type="application/json",
+                            headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"})
+    return Response(PICK_LISTS.json(location_id, date), media_type="application/json")
 
 
 @app.get("/api/pick-list/all", response_model=List[PickList])
@@ -134,8 +510,13 @@ async def get_all_pick_lists(
     if not date:
         date = datetime.now().strftime("%Y-%m-%d")
 
-    pick_lists = [generate_pick_list(loc.id, date) for loc in LOCATIONS]
-    return pick_lists
+    if pool.enabled:
+        missing = PICK_LISTS.missing(date, [loc.id for loc in LOCATIONS])
+        if missing:
+            await build_pick_lists_in_pool(date, missing)
+
+    body = b",".join(PICK_LISTS.json(loc.id, date) for loc in LOCATIONS)
+    return Response(b"[" + body + b"]", media_type="application/json")
 
 
 # ==================== Model Accuracy ====================
@@ -181,24 +562,21 @@ async def get_inventory_status(
 
     if location_id:
         # All products at a location
-        location = next((loc for loc in LOCATIONS if loc.id == location_id), None)
+        location = LOCATIONS_BY_ID.get(location_id)
         if not location:
             raise HTTPException(status_code=404, detail=f"Location {location_id} not found")
 
-        for prod in PRODUCTS:
-            inv_status = generate_inventory_status(prod.id, location_id)
-            if not status_filter or inv_status.status == status_filter:
-                results.append(inv_status)
+        results = location_inventory_rows(location_id, status_filter)
     else:
         # Sample across all locations
         import random
         sample_combos = [(random.choice(PRODUCTS).id, random.choice(LOCATIONS).id) for _ in range(20)]
         for prod_id, loc_id in sample_combos:
-            inv_status = generate_inventory_status(prod_id, loc_id)
+            inv_status = inventory_status_row(prod_id, loc_id)
             if not status_filter or inv_status.status == status_filter:
                 results.append(inv_status)
 
-    return results
+    return [row._asdict() for row in results]
 
 
 # ==================== Demand Forecasting ====================
@@ -207,32 +585,37 @@ async def get_inventory_status(
 async def get_demand_forecast(
     location_id: str = Query(..., description="Location ID"),
     product_id: Optional[str] = Query(None, description="Product ID (optional, returns all if not specified)"),
-    forecast_date: Optional[str] = Query(None, description="Forecast date (YYYY-MM-DD), defaults to tomorrow")
+    forecast_date: Optional[str] = Query(None, description="Forecast date (YYYY-MM-DD), defaults to tomorrow"),
+    start_date: Optional[str] = Query(None, description="First day of a multi-day forecast (YYYY-MM-DD), defaults to forecast_date"),
+    horizon_days: int = Query(1, description="Number of consecutive days to forecast", ge=1, le=MAX_FORECAST_HORIZON_DAYS),
+    format: str = Query("rows", description="rows: one object per product and day; columnar: product x day arrays",
+                        pattern="^(rows|columnar)$")
 ):
-    """Get demand forecast for products at a location"""
+    """Get demand forecast for products at a location, for one day or a horizon of days"""
     # Validate location
-    location = next((loc for loc in LOCATIONS if loc.id == location_id), None)
+    location = LOCATIONS_BY_ID.get(location_id)
     if not location:
         raise HTTPException(status_code=404, detail=f"Location {location_id} not found")
 
-    # Default to tomorrow
-    if not forecast_date:
-        forecast_date = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
-
-    results = []
-
+    product_ids = None
     if product_id:
         # Specific product
-        product = next((prod for prod in PRODUCTS if prod.id == product_id), None)
-        if not product:
+        if product_id not in PRODUCTS_BY_ID:
             raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
-        results.append(generate_demand_forecast(product_id, location_id, forecast_date))
-    else:
-        # All products at location
-        for prod in PRODUCTS:
-            results.append(generate_demand_forecast(prod.id, location_id, forecast_date))
+        product_ids = [product_id]
 
-    return results
+    # Default to tomorrow
+    start_date = start_date or forecast_date or (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+    try:
+        matrix = generate_forecast_matrix(location_id, start_date, horizon_days, product_ids)
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"Invalid date {start_date}, expected YYYY-MM-DD")
+
+    if format == "columnar":
+        # A ForecastMatrix rather than the rows the route is declared with, so
+        # rendered here instead of going through response_model validation
+        return Response(matrix.model_dump_json(), media_type="application/json")
+    return forecast_rows(matrix)
 
 
 # ==================== Analytics ====================
@@ -257,23 +640,23 @@ async def get_product_performance(
 
     if product_id:
         # Specific product
-        product = next((p for p in PRODUCTS if p.id == product_id), None)
+        product = PRODUCTS_BY_ID.get(product_id)
         if not product:
             raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
 
         if location_id:
             # Specific product at specific location
-            location = next((loc for loc in LOCATIONS if loc.id == location_id), None)
+            location = LOCATIONS_BY_ID.get(location_id)
             if not location:
                 raise HTTPException(status_code=404, detail=f"Location {location_id} not found")
-            results.append(generate_product_performance(product_id, location_id))
+            results.append(product_performance_row(product_id, location_id))
         else:
             # Product across all locations
             for loc in LOCATIONS:
-                results.append(generate_product_performance(product_id, loc.id))
+                results.append(product_performance_row(product_id, loc.id))
     elif location_id:
         # All products at a location
-        location = next((loc for loc in LOCATIONS if loc.id == location_id), None)
+        location = LOCATIONS_BY_ID.get(location_id)
         if not location:
             raise HTTPException(status_code=404, detail=f"Location {location_id} not found")
 
@@ -282,8 +665,8 @@ async def get_product_performance(
             products_to_query = [p for p in PRODUCTS if p.category.lower() == category.lower()]
 
         for prod in products_to_query:
-            perf = generate_product_performance(prod.id, location_id)
-            if not performance_tier or perf.performance_tier == performance_tier:
+            perf = product_performance_row(prod.id, location_id, tier=performance_tier)
+            if perf:
                 results.append(perf)
     else:
         # Sample across all - top products at random locations
@@ -294,13 +677,13 @@ async def get_product_performance(
 
         sample_combos = [(p.id, random.choice(LOCATIONS).id) for p in products_to_query[:15]]
         for prod_id, loc_id in sample_combos:
-            perf = generate_product_performance(prod_id, loc_id)
-            if not performance_tier or perf.performance_tier == performance_tier:
+            perf = product_performance_row(prod_id, loc_id, tier=performance_tier)
+            if perf:
                 results.append(perf)
 
     # Sort by performance score descending
     results.sort(key=lambda x: x.performance_score, reverse=True)
-    return results
+    return [row._asdict() for row in results]
 
 
 @app.get("/api/analytics/top-performers", response_model=List[ProductPerformance])
@@ -308,25 +691,14 @@ async def get_top_performers(
     location_id: Optional[str] = Query(None, description="Filter by location"),
     limit: int = Query(10, description="Number of top performers to return", ge=1, le=50)
 ):
-    """Get top performing products by performance score"""
-    results = []
-
-    if location_id:
-        location = next((loc for loc in LOCATIONS if loc.id == location_id), None)
-        if not location:
-            raise HTTPException(status_code=404, detail=f"Location {location_id} not found")
-
-        for prod in PRODUCTS:
-            results.append(generate_product_performance(prod.id, location_id))
-    else:
-        import random
-        for prod in PRODUCTS:
-            loc = random.choice(LOCATIONS)
-            results.append(generate_product_performance(prod.id, loc.id))
+    """Get top performing products by performance score (network-wide without a location)"""
+    if location_id and location_id not in LOCATIONS_BY_ID:
+        raise HTTPException(status_code=404, detail=f"Location {location_id} not found")
 
-    # Sort by performance score and return top N
-    results.sort(key=lambda x: x.performance_score, reverse=True)
-    return results[:limit]
+    # Leaderboards are kept ranked as sales arrive; ties rank by product id
+    location_id = location_id or None
+    top = LEADERBOARDS.top(location_id, limit)
+    return [product_performance_row(prod_id, location_id)._asdict() for prod_id in top]
 
 
 # ==================== Trend Detection ====================
@@ -339,43 +711,38 @@ async def get_trends(
     has_anomaly: Optional[bool] = Query(None, description="Filter for products with anomalies")
 ):
     """Get trend detection data including week-over-week changes, seasonality, and anomalies"""
-    results = []
-
     if product_id:
         # Specific product
-        product = next((p for p in PRODUCTS if p.id == product_id), None)
+        product = PRODUCTS_BY_ID.get(product_id)
         if not product:
             raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
 
         if location_id:
-            results.append(generate_trend_data(product_id, location_id))
+            products_locs = [(product_id, location_id)]
         else:
-            for loc in LOCATIONS:
-                results.append(generate_trend_data(product_id, loc.id))
+            products_locs = [(product_id, loc.id) for loc in LOCATIONS]
     elif location_id:
         # All products at a location
-        location = next((loc for loc in LOCATIONS if loc.id == location_id), None)
+        location = LOCATIONS_BY_ID.get(location_id)
         if not location:
             raise HTTPException(status_code=404, detail=f"Location {location_id} not found")
 
-        for prod in PRODUCTS:
-            results.append(generate_trend_data(prod.id, location_id))
+        products_locs = [(prod.id, location_id) for prod in PRODUCTS]
     else:
         # Sample across all
         import random
-        sample_combos = [(p.id, random.choice(LOCATIONS).id) for p in PRODUCTS[:20]]
-        for prod_id, loc_id in sample_combos:
-            results.append(generate_trend_data(prod_id, loc_id))
+        products_locs = [(p.id, random.choice(LOCATIONS).id) for p in PRODUCTS[:20]]
 
-    # Apply filters
-    if trend_direction:
-        results = [r for r in results if r.trend_direction == trend_direction]
-    if has_anomaly is not None:
-        results = [r for r in results if r.has_anomaly == has_anomaly]
+    # Filters are pushed into trend_row, which skips rows that can't match
+    results = []
+    for prod_id, loc_id in products_locs:
+        trend = trend_row(prod_id, loc_id, direction=trend_direction, anomaly=has_anomaly)
+        if trend:
+            results.append(trend)
 
     # Sort by trend strength descending
     results.sort(key=lambda x: x.trend_strength, reverse=True)
-    return results
+    return [row._asdict() for row in results]
 
 
 @app.get("/api/analytics/anomalies", response_model=List[TrendData])
@@ -384,10 +751,8 @@ async def get_anomalies(
     severity: Optional[str] = Query(None, description="Filter by severity: low, medium, high")
 ):
     """Get products with detected anomalies"""
-    results = []
-
     if location_id:
-        location = next((loc for loc in LOCATIONS if loc.id == location_id), None)
+        location = LOCATIONS_BY_ID.get(location_id)
         if not location:
             raise HTTPException(status_code=404, detail=f"Location {location_id} not found")
         products_locs = [(p.id, location_id) for p in PRODUCTS]
@@ -395,16 +760,18 @@ async def get_anomalies(
         import random
         products_locs = [(p.id, random.choice(LOCATIONS).id) for p in PRODUCTS]
 
-    for prod_id, loc_id in products_locs:
-        trend = generate_trend_data(prod_id, loc_id)
-        if trend.has_anomaly:
-            if not severity or trend.anomaly_severity == severity:
-                results.append(trend)
+    if location_id or not pool.enabled:
+        rows = trend_rows(products_locs, anomaly=True, severity=severity)
+    else:
+        # Partitioned by location across the fan-out pool, rows back in request order
+        rows = await pool.map(trend_rows, products_locs, [INVENTORY.location_index[l] for _, l in products_locs],
+                              INVENTORY.shape[1], INVENTORY.day, None, True, severity)
+    results = [row for row in rows if row]
 
     # Sort by severity
     severity_order = {"high": 0, "medium": 1, "low": 2}
     results.sort(key=lambda x: severity_order.get(x.anomaly_severity, 3))
-    return results
+    return [row._asdict() for row in results]
 
 
 # ==================== Alerts ====================
@@ -417,7 +784,7 @@ async def get_alerts(
 ):
     """Get system alerts for stockouts, overstocks, anomalies, trends, and performance issues"""
     if location_id:
-        location = next((loc for loc in LOCATIONS if loc.id == location_id), None)
+        location = LOCATIONS_BY_ID.get(location_id)
         if not location:
             raise HTTPException(status_code=404, detail=f"Location {location_id} not found")
 
@@ -440,9 +807,164 @@ async def get_stockout_alerts(
     return generate_alerts(location_id, alert_type="stockout_risk")
 
 
+@app.get("/api/alerts/stream")
+async def stream_alerts(
+    request: Request,
+    location_id: Optional[str] = Query(None, description="Filter by location"),
+    alert_type: Optional[str] = Query(None, description="Filter by type: stockout_risk, overstock, anomaly, trend_change, performance"),
+    severity: Optional[str] = Query(None, description="Filter by severity: critical, warning, info"),
+    resume_token: Optional[int] = Query(None, description="Last event id received; replays changes after it instead of a full snapshot")
+):
+    """Server-sent events for created, updated, resolved and acknowledged alerts.
+
+    The first message is a `snapshot` of matching alerts unless the client resumes
+    via `resume_token` or the `Last-Event-ID` header.
+    """
+    if resume_token is None:
+        last_event_id = request.headers.get("last-event-id")
+        if last_event_id and last_event_id.isdigit():
+            resume_token = int(last_event_id)
+
+    return StreamingResponse(
+        alert_stream.events(request, location_id, alert_type, severity, resume_token),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/api/alerts/{alert_id}/acknowledge", response_model=Alert)
+async def acknowledge_alert(alert_id: str):
+    """Acknowledge an alert; stream subscribers receive an `acknowledged` event"""
+    alert = ALERT_ENGINE.acknowledge(alert_id)
+    if not alert:
+        raise HTTPException(status_code=404, detail=f"Alert {alert_id} not found")
+    return alert
+
+
+# ==================== Transfers ====================
+
+@app.get("/api/transfers/recommendations", response_model=TransferPlan)
+async def get_transfer_recommendations(
+    location_id: Optional[str] = Query(None, description="Only transfers into or out of this location"),
+    product_id: Optional[str] = Query(None, description="Filter by product"),
+    limit: int = Query(50, description="Number of transfers to return", ge=1, le=500)
+):
+    """Move overstock to SKU-locations at risk of stockout, ranked by avoided stockout cost minus transfer cost"""
+    if location_id and location_id not in LOCATIONS_BY_ID:
+        raise HTTPException(status_code=404, detail=f"Location {location_id} not found")
+    if product_id and product_id not in PRODUCTS_BY_ID:
+        raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
+
+    plan = transfer_plan(product_id, location_id, limit)
+    plan["transfers"] = [row._asdict() for row in plan["transfers"]]
+    return plan
+
+
+# ==================== Delta Sync ====================
+
+@app.get("/api/sync/changes", response_model=SyncChanges)
+async def get_sync_changes(
+    since: Optional[int] = Query(None, description="`version` from the previous sync; omit to get the current version"),
+    location_id: Optional[str] = Query(None, description="Filter by location"),
+    date: Optional[str] = Query(None, description="Pick list date (YYYY-MM-DD), defaults to today")
+):
+    """Inventory rows, pick list items and alerts added, changed or removed after version `since`.
+
+    Take the current `version` first (no `since`), load the full data, then pass
+    the last `version` received as `since` on every refresh.
+
+    Versions belong to one worker process. With WEB_CONCURRENCY > 1, a refresh
+    served by a worker other than the one that issued `since` gets `full_resync`,
+    so delta sync only pays off with a single worker or sticky routing.
+    """
+    if location_id and location_id not in LOCATIONS_BY_ID:
+        raise HTTPException(status_code=404, detail=f"Location {location_id} not found")
+
+    version = sync_log.version
+    changes = sync_log.since(since) if since is not None else None
+    if changes is None:
+        return {"since": since, "version": version, "full_resync": True}
+
+    if not date:
+        date = datetime.now().strftime("%Y-%m-%d")
+
+    column = INVENTORY.location_index[location_id] if location_id else None
+    inventory_keys = []
+    alerts, removed_alert_ids = [], []
+    for key, removed in changes:
+        if key[0] == "inventory":
+            i, j = divmod(key[1], INVENTORY.shape[1])
+            if column is None or j == column:
+                inventory_keys.append((i, j))
+        elif location_id is None or key[1] == location_id:
+            alert = None if removed else ALERT_ENGINE.get(key[2])
+            if alert is None:
+                removed_alert_ids.append(key[2])
+            else:
+                alerts.append(alert)
+
+    inventory_keys.sort()
+    products_by_location = {}
+    for i, j in inventory_keys:
+        products_by_location.setdefault(j, set()).add(INVENTORY.product_ids[i])
+    pick_list_items = [
+        item
+        for j, product_ids in sorted(products_by_location.items())
+        for item in changed_pick_list_items(INVENTORY.location_ids[j], date, product_ids)
+    ]
+
+    return {
+        "since": since,
+        "version": version,
+        "full_resync": False,
+        "inventory": [inventory_status_row(INVENTORY.product_ids[i], INVENTORY.location_ids[j])._asdict()
+                      for i, j in inventory_keys],
+        "pick_list_items": pick_list_items,
+        "alerts": alerts,
+        "removed_alert_ids": removed_alert_ids,
+    }
+
+
+# ==================== Event Ingestion ====================
+
+@app.post("/api/ingest/events", response_model=IngestResult)
+async def ingest_events(request: Request):
+    """Bulk-ingest POS sales, restock and stock count events.
+
+    Send newline-delimited JSON (`application/x-ndjson`) or packed binary records
+    (`application/octet-stream`, layout from `/api/ingest/catalog`). The batch is
+    written to the write-ahead log before it is applied and acknowledged.
+    """
+    body = await request.body()
+    binary = request.headers.get("content-type", "").startswith("application/octet-stream")
+    if shared is None:
+        return ingestor.ingest(body, binary=binary)
+    with shared.locked():
+        # Catch up first so the day rollover and log sequence continue from other workers
+        shared.follow(ingestor)
+        result = ingestor.ingest(body, binary=binary)
+        shared.commit(ingestor.wal.sequence)
+    return result
+
+
+@app.get("/api/ingest/catalog")
+async def get_ingest_catalog():
+    """Product and location positions used by the binary event format"""
+    return {
+        "record_format": {name: EVENT_RECORD.fields[name][0].str for name in EVENT_RECORD.names},
+        "record_size": EVENT_RECORD.itemsize,
+        "event_types": EVENT_TYPES,
+        "products": INVENTORY.product_ids,
+        "locations": INVENTORY.location_ids,
+    }
+
+
 # ==================== Run Server ====================
 
 if __name__ == "__main__":
-    import os
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True)
+    if WORKERS > 1:
+        # Reload and multiple workers are mutually exclusive in uvicorn
+        uvicorn.run("main:app", host="0.0.0.0", port=port, workers=WORKERS)
+    else:
+        uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True)
@@ -0,0 +1,233 @@
+"""Request metrics middleware and Prometheus text exposition"""
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Callable, Dict, List, Tuple
+import time
+
+from starlette.routing import Match
+
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+UNMATCHED_ROUTE = "<unmatched>"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    """Fixed-bucket histogram; counts are per bucket and made cumulative on export"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class CacheStats:
+    """Hit and miss counters for one cache"""
+
+    __slots__ = ("hits", "misses")
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def hit(self):
+        self.hits += 1
+
+    def miss(self):
+        self.misses += 1
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Per-route request metrics, cache counters and gauges read at scrape time.
+
+    Request series are labelled by route template (`/api/locations/{location_id}`),
+    never the raw path, so cardinality is bounded by the number of routes.
+    Everything runs on the event loop, so plain counters need no locking.
+    """
+
+    def __init__(self, prefix: str = "shelfsense"):
+        self.prefix = prefix
+        self.requests: Dict[Tuple[str, str, int], int] = defaultdict(int)
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.response_size: Dict[Tuple[str, str], Histogram] = {}
+        self.in_flight: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.caches: Dict[str, CacheStats] = {}
+        self.gauges: List[Tuple[str, str, str, Callable[[], dict]]] = []
+        self.started_at = time.time()
+
+    def cache(self, name: str) -> CacheStats:
+        """Counters for a named cache, created on first use"""
+        if name not in self.caches:
+            self.caches[name] = CacheStats()
+        return self.caches[name]
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], dict]):
+        """Register a gauge read at scrape time.
+
+        `read` returns {labels: value}, where labels is a tuple of (name, value)
+        pairs, or an empty tuple for an unlabelled series.
+        """
+        self.gauges.append((name, "gauge", help_text, read))
+
+    def counter(self, name: str, help_text: str, read: Callable[[], dict]):
+        """Like gauge(), for values that only increase"""
+        self.gauges.append((name, "counter", help_text, read))
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, size: int):
+        key = (method, route)
+        self.requests[(method, route, status)] += 1
+        if key not in self.latency:
+            self.latency[key] = Histogram(LATENCY_BUCKETS)
+            self.response_size[key] = Histogram(SIZE_BUCKETS)
+        self.latency[key].observe(seconds)
+        self.response_size[key].observe(size)
+
+    # ---------- exposition ----------
+
+    def _histogram_lines(self, name: str, series: Dict[Tuple[str, str], Histogram]) -> List[str]:
+        lines = []
+        for (method, route), hist in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(hist.buckets + (float("inf"),), hist.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(method=method, route=route, le=_format(bound))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(method=method, route=route)} {_format(hist.sum)}")
+            lines.append(f"{name}_count{_labels(method=method, route=route)} {hist.count}")
+        return lines
+
+    def render(self) -> str:
+        p = self.prefix
+        out = [
+            f"# HELP {p}_http_requests_total Requests handled, by route template and status.",
+            f"# TYPE {p}_http_requests_total counter",
+        ]
+        for (method, route, status), count in sorted(self.requests.items()):
+            out.append(f"{p}_http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+
+        out += [
+            f"# HELP {p}_http_request_duration_seconds Time from request start to last response byte.",
+            f"# TYPE {p}_http_request_duration_seconds histogram",
+        ]
+        out += self._histogram_lines(f"{p}_http_request_duration_seconds", self.latency)
+
+        out += [
+            f"# HELP {p}_http_response_size_bytes Response body size.",
+            f"# TYPE {p}_http_response_size_bytes histogram",
+        ]
+        out += self._histogram_lines(f"{p}_http_response_size_bytes", self.response_size)
+
+        out += [
+            f"# HELP {p}_http_requests_in_flight Requests currently being handled.",
+            f"# TYPE {p}_http_requests_in_flight gauge",
+        ]
+        for (method, route), count in sorted(self.in_flight.items()):
+            out.append(f"{p}_http_requests_in_flight{_labels(method=method, route=route)} {count}")
+
+        if self.caches:
+            out += [
+                f"# HELP {p}_cache_hits_total Cache lookups served from the cache.",
+                f"# TYPE {p}_cache_hits_total counter",
+            ]
+            out += [f"{p}_cache_hits_total{_labels(cache=n)} {c.hits}" for n, c in sorted(self.caches.items())]
+            out += [
+                f"# HELP {p}_cache_misses_total Cache lookups that had to compute the value.",
+                f"# TYPE {p}_cache_misses_total counter",
+            ]
+            out += [f"{p}_cache_misses_total{_labels(cache=n)} {c.misses}" for n, c in sorted(self.caches.items())]
+            out += [
+                f"# HELP {p}_cache_hit_ratio Hits over total lookups since start.",
+                f"# TYPE {p}_cache_hit_ratio gauge",
+            ]
+            out += [f"{p}_cache_hit_ratio{_labels(cache=n)} {_format(c.hit_ratio)}" for n, c in sorted(self.caches.items())]
+
+        for name, kind, help_text, read in self.gauges:
+            out += [f"# HELP {p}_{name} {help_text}", f"# TYPE {p}_{name} {kind}"]
+            for labels, value in read().items():
+                label_text = _labels(**dict(labels)) if labels else ""
+                out.append(f"{p}_{name}{label_text} {_format(value)}")
+
+        out += [
+            f"# HELP {p}_process_start_time_seconds Unix time the process started.",
+            f"# TYPE {p}_process_start_time_seconds gauge",
+            f"{p}_process_start_time_seconds {_format(self.started_at)}",
+        ]
+        return "\n".join(out) + "\n"
+
+
+def route_template(scope) -> str:
+    """The path template of the route this request will hit (or has hit)"""
+    route = scope.get("route")
+    if route is not None and hasattr(route, "path"):
+        return route.path
+    app = scope.get("app")
+    for candidate in getattr(app, "routes", ()):
+        match, _ = candidate.matches(scope)
+        if match == Match.FULL:
+            return candidate.path
+    return UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware so streamed responses are measured to the last byte"""
+
+    def __init__(self, app, registry: MetricsRegistry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        # Resolve the template up front so long-running requests (SSE) show
+        # up in the in-flight gauge while they are still open
+        route = route_template(scope)
+        key = (method, route)
+        status = 500
+        size = 0
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        self.registry.in_flight[key] += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.registry.in_flight[key] -= 1
+            self.registry.observe_request(method, route, status, time.perf_counter() - started, size)
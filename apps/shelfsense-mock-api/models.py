@@ -14,6 +14,11 @@ class Product(BaseModel):
     supplier: Optional[str] = None
 
 
+class ProductMatch(Product):
+    """Product search result"""
+    score: float = Field(description="Relevance, higher is better; above 1 for an exact name match")
+
+
 class Location(BaseModel):
     """Micromarket location model"""
     id: str
@@ -102,6 +107,27 @@ class DemandForecast(BaseModel):
     model_version: str = "v2.1-lstm"
 
 
+class ForecastMatrix(BaseModel):
+    """Demand forecast for products at a location over consecutive days, column-oriented.
+
+    p10/p50/p90 hold one row per product (in `product_ids` order) with one value
+    per day (in `dates` order); `factors` holds one value per day for each factor.
+    """
+    location_id: str
+    location_name: str
+    start_date: str
+    horizon_days: int
+    dates: List[str]
+    product_ids: List[str]
+    product_names: List[str]
+    p10: List[List[int]]
+    p50: List[List[int]]
+    p90: List[List[int]]
+    occupancy_rate: float
+    factors: dict = Field(default_factory=dict, description="Per-day factors: day of week, weather, events, seasonality")
+    model_version: str = "v2.1-lstm"
+
+
 class AnalyticsSummary(BaseModel):
     """Analytics summary across locations"""
     total_locations: int
@@ -187,3 +213,47 @@ class AlertsSummary(BaseModel):
     alerts: List[Alert]
     locations_affected: int
     products_affected: int
+
+
+class TransferRecommendation(BaseModel):
+    """Stock to move from an overstocked location to one at risk of stockout"""
+    product_id: str
+    product_name: str
+    from_location_id: str
+    from_location_name: str
+    to_location_id: str
+    to_location_name: str
+    quantity: int
+    from_stock: int = Field(description="Current stock at the source (above its max_stock)")
+    to_stock: int = Field(description="Current stock at the destination (below its min_stock)")
+    avoided_stockout_cost: float = Field(description="Stockout cost the transfer avoids in dollars")
+    transfer_cost: float = Field(description="Trip and handling cost in dollars")
+    net_benefit: float = Field(description="avoided_stockout_cost minus transfer_cost")
+
+
+class TransferPlan(BaseModel):
+    """Ranked network-wide transfer recommendations"""
+    total_transfers: int
+    total_units: int
+    total_net_benefit: float
+    transfers: List[TransferRecommendation]
+
+
+class SyncChanges(BaseModel):
+    """Rows added, changed or removed after a sync version"""
+    since: Optional[int] = None
+    version: int = Field(description="Pass as `since` on the next sync")
+    full_resync: bool = Field(description="The changes are no longer in the log: reload inventory, pick lists and alerts, then sync from `version`")
+    inventory: List[InventoryStatus] = Field(default_factory=list)
+    pick_list_items: List[PickListItem] = Field(default_factory=list)
+    alerts: List[Alert] = Field(default_factory=list, description="Created, updated or acknowledged alerts")
+    removed_alert_ids: List[str] = Field(default_factory=list, description="Alerts resolved since `since`")
+
+
+class IngestResult(BaseModel):
+    """Acknowledgement for a batch of ingested POS events"""
+    accepted: int = Field(description="Events applied to inventory state")
+    rejected: int = Field(description="Events that failed validation")
+    sku_locations_updated: int
+    sequence: int = Field(description="Write-ahead log sequence number of the batch")
+    errors: List[str] = Field(default_factory=list, description="First few validation errors")
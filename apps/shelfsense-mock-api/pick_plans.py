@@ -0,0 +1,139 @@
+"""Pick-list plans computed ahead of time and served from memory"""
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from compression import compress
+from models import PickList
+
+
+class PickListPlans:
+    """Pick lists keyed by (location_id, date), with their JSON rendered once.
+
+    `build(location_id, date)` computes a plan. precompute() fills a date for
+    every location ahead of demand (main.py runs it nightly for the next day),
+    and anything else is built on first request. A plan is dropped when stock
+    changes for one of its (product, location) items, and rebuilt on its next
+    read. At most `max_plans` are kept, least recently read dropped first.
+
+    Plans of at least `compress_min_bytes` are also kept compressed, per
+    encoding from the first request that asks for it, so serving a stored plan
+    neither re-renders nor re-compresses it.
+    """
+
+    def __init__(self, build: Callable[[str, str], PickList], max_plans: int = 10000, stats=None,
+                 compress_min_bytes: int = 1024):
+        self.build = build
+        self.max_plans = max_plans
+        # Optional hit/miss counters (metrics.CacheStats)
+        self.stats = stats
+        self.compress_min_bytes = compress_min_bytes
+        # (body, encoding) -> compressed body; main.py applies its compression levels
+        self.compress: Callable[[bytes, str], bytes] = compress
+        self.product_ids: List[str] = []
+        self.location_ids: List[str] = []
+        self._plans: "OrderedDict[Tuple[str, str], Tuple[PickList, bytes, Dict[str, bytes]]]" = OrderedDict()
+        # Item location -> plans holding an item there, and each plan's (product, location) items
+        self._by_location: Dict[str, Set[Tuple[str, str]]] = {}
+        self._items: Dict[Tuple[str, str], Set[Tuple[str, str]]] = {}
+        # Invalidation count, and its value when each location last changed, so a
+        # plan built elsewhere (see fanout.py) is not stored if its stock moved since
+        self.changes = 0
+        self._changed_at: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._plans)
+
+    def reset(self, product_ids: List[str], location_ids: List[str]):
+        self.product_ids = list(product_ids)
+        self.location_ids = list(location_ids)
+        self._plans.clear()
+        self._by_location.clear()
+        self._items.clear()
+        self._changed_at.clear()
+
+    def _entry(self, location_id: str, date: str) -> Tuple[PickList, bytes, Dict[str, bytes]]:
+        key = (location_id, date)
+        entry = self._plans.get(key)
+        if entry is not None:
+            self._plans.move_to_end(key)
+            if self.stats is not None:
+                self.stats.hit()
+            return entry
+        if self.stats is not None:
+            self.stats.miss()
+        return self._store(key, self.build(location_id, date))
+
+    def _store(self, key: Tuple[str, str], plan: PickList) -> Tuple[PickList, bytes, Dict[str, bytes]]:
+        self._drop(key)
+        entry = (plan, plan.model_dump_json().encode(), {})
+        self._plans[key] = entry
+        items = {(item.product_id, item.location_id) for item in plan.items}
+        self._items[key] = items
+        for _, location_id in items:
+            self._by_location.setdefault(location_id, set()).add(key)
+        while len(self._plans) > self.max_plans:
+            self._drop(next(iter(self._plans)))
+        return entry
+
+    def _drop(self, key: Tuple[str, str]):
+        if self._plans.pop(key, None) is None:
+            return
+        for _, location_id in self._items.pop(key):
+            plans = self._by_location.get(location_id)
+            if plans is not None:
+                plans.discard(key)
+                if not plans:
+                    del self._by_location[location_id]
+
+    def get(self, location_id: str, date: str) -> PickList:
+        return self._entry(location_id, date)[0]
+
+    def json(self, location_id: str, date: str) -> bytes:
+        """The plan rendered as JSON"""
+        return self._entry(location_id, date)[1]
+
+    def compressed(self, location_id: str, date: str, encoding: str) -> Optional[bytes]:
+        """The plan's JSON compressed with `encoding`, or None below `compress_min_bytes`"""
+        _, body, encoded = self._entry(location_id, date)
+        if len(body) < self.compress_min_bytes:
+            return None
+        compressed = encoded.get(encoding)
+        if compressed is None:
+            compressed = encoded[encoding] = self.compress(body, encoding)
+        return compressed
+
+    def missing(self, date: str, location_ids: Iterable[str]) -> List[str]:
+        """Locations without a stored plan for a date"""
+        return [location_id for location_id in location_ids if (location_id, date) not in self._plans]
+
+    def put(self, location_id: str, date: str, plan: PickList, built_at: int):
+        """Store a plan built when `changes` was `built_at`, unless its location changed since"""
+        if self._changed_at.get(location_id, -1) <= built_at:
+            self._store((location_id, date), plan)
+
+    def precompute(self, date: str, location_ids: Optional[Iterable[str]] = None) -> int:
+        """(Re)build plans for a date, every location by default. Returns the number built."""
+        location_ids = self.location_ids if location_ids is None else list(location_ids)
+        for location_id in location_ids:
+            self._store((location_id, date), self.build(location_id, date))
+        return len(location_ids)
+
+    def prune(self, before: str):
+        """Drop plans for dates before `before` (YYYY-MM-DD)"""
+        for key in [key for key in self._plans if key[1] < before]:
+            self._drop(key)
+
+    def invalidate(self, touched):
+        """Drop plans with an item at SKU-locations (flat indices) whose stock changed"""
+        self.changes += 1
+        n_locations = len(self.location_ids)
+        for flat_key in touched.tolist():
+            i, j = divmod(flat_key, n_locations)
+            location_id = self.location_ids[j]
+            self._changed_at[location_id] = self.changes
+            plans = self._by_location.get(location_id)
+            if not plans:
+                continue
+            item = (self.product_ids[i], location_id)
+            for key in [key for key in plans if item in self._items[key]]:
+                self._drop(key)
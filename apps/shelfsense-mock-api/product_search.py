@@ -0,0 +1,153 @@
+"""Free-text product lookup over names, suppliers, categories and ids.
+
+Names in the catalog nearly collide ("Red Bull Energy" and "Red Bull Energy
+8.4oz") and people type them loosely ("redbull", "frapuccino", "coke"), so an
+exact, case-insensitive name comparison misses most real queries. The index is
+built once per catalog:
+
+- tokens: lowercased words, plus each adjacent pair joined ("coca-cola" ->
+  coca, cola, cocacola), mapped to the products carrying them and the weight
+  of the field they came from
+- trigrams of each token, for typo-tolerant matches between query words and
+  indexed tokens
+
+A query word matches indexed tokens exactly, by prefix, or by trigram (Dice)
+similarity. Each product scores the sum over query words of its best weighted
+match, divided by the number of words. An exact full-name match adds a bonus,
+and longer names lose a little, so "Red Bull Energy" ranks above its 8.4oz
+sibling for "red bull energy".
+"""
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+import re
+
+import numpy as np
+
+from models import Product
+
+# Weight of a match by the field it is in
+FIELD_WEIGHTS = (("name", 1.0), ("supplier", 0.6), ("id", 0.6), ("category", 0.4))
+MIN_SIMILARITY = 0.45
+MIN_SCORE = 0.25
+# Query words whose token matches are kept between searches
+EXPANSION_CACHE_SIZE = 4096
+
+_WORD = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?[a-z]*")
+
+
+def words(text: str) -> List[str]:
+    return _WORD.findall(text.lower().replace("'", ""))
+
+
+def tokenize(text: str) -> List[str]:
+    """Words plus adjacent pairs of non-numeric words joined
+    ("Red Bull Energy" -> red, bull, energy, redbull, bullenergy)"""
+    tokens = words(text)
+    return tokens + [a + b for a, b in zip(tokens, tokens[1:]) if not (a[0].isdigit() or b[0].isdigit())]
+
+
+def _trigrams(token: str) -> FrozenSet[str]:
+    padded = f" {token} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class ProductSearchIndex:
+    """Token and trigram index over a product catalog"""
+
+    def __init__(self, products: List[Product]):
+        self.reset(products)
+
+    def reset(self, products: List[Product]):
+        self.products = list(products)
+        postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        self._by_name: Dict[str, List[int]] = defaultdict(list)
+        self._by_category: Dict[str, List[int]] = defaultdict(list)
+        name_lengths = []
+        for position, product in enumerate(self.products):
+            name_words = words(product.name)
+            self._by_name[" ".join(name_words)].append(position)
+            self._by_category[product.category.lower()].append(position)
+            name_lengths.append(len(name_words))
+            for field, weight in FIELD_WEIGHTS:
+                value = getattr(product, field) or ""
+                if field == "id":
+                    value = value.replace("_", " ").removeprefix("prod ")
+                for token in tokenize(value):
+                    postings[token][position] = max(postings[token].get(position, 0.0), weight)
+
+        # Per token: positions of the products carrying it, and the field weight there
+        self._postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {
+            token: (np.fromiter(entries.keys(), dtype=np.intp, count=len(entries)),
+                    np.fromiter(entries.values(), dtype=float, count=len(entries)))
+            for token, entries in postings.items()
+        }
+        # Longer names lose a little, so the shorter of two near-identical names ranks first
+        self._name_penalty = 0.01 * np.array(name_lengths, dtype=float)
+        self._vocabulary = sorted(self._postings)
+        self._grams: Dict[str, FrozenSet[str]] = {token: _trigrams(token) for token in self._vocabulary}
+        self._gram_tokens: Dict[str, Set[str]] = defaultdict(set)
+        for token, grams in self._grams.items():
+            for gram in grams:
+                self._gram_tokens[gram].add(token)
+        self._expansions: Dict[str, Dict[str, float]] = {}
+
+    def _expand(self, term: str) -> Dict[str, float]:
+        """Indexed tokens similar to a query word, with their similarity (0-1]"""
+        matches = self._expansions.get(term)
+        if matches is not None:
+            return matches
+        matches = {}
+        if term in self._postings:
+            matches[term] = 1.0
+        # Prefixes: "frap" -> frappuccino, scaled by how much of the token was typed
+        if len(term) >= 2:
+            start = bisect_left(self._vocabulary, term)
+            for token in self._vocabulary[start:]:
+                if not token.startswith(term):
+                    break
+                if token != term:
+                    matches[token] = max(matches.get(token, 0.0), 0.6 + 0.3 * len(term) / len(token))
+        # Typos: Dice similarity of trigram sets
+        grams = _trigrams(term)
+        shared: Dict[str, int] = defaultdict(int)
+        for gram in grams:
+            for token in self._gram_tokens.get(gram, ()):
+                shared[token] += 1
+        for token, count in shared.items():
+            similarity = 2 * count / (len(grams) + len(self._grams[token]))
+            if similarity >= MIN_SIMILARITY:
+                matches[token] = max(matches.get(token, 0.0), 0.9 * similarity)
+
+        if len(self._expansions) >= EXPANSION_CACHE_SIZE:
+            self._expansions.clear()
+        self._expansions[term] = matches
+        return matches
+
+    def search(self, query: str, limit: int = 10, category: Optional[str] = None) -> List[Tuple[Product, float]]:
+        """(product, score) best first, score 0-2 (above 1 only for an exact name match)"""
+        query_words = words(query)
+        terms = list(dict.fromkeys(query_words))
+        if not terms:
+            return []
+
+        # Each query word adds its best weighted match per product
+        scores = np.zeros(len(self.products))
+        for term in terms:
+            best = np.zeros(len(self.products))
+            for token, similarity in self._expand(term).items():
+                positions, weights = self._postings[token]
+                best[positions] = np.maximum(best[positions], similarity * weights)
+            scores += best
+        scores = scores / len(terms) - self._name_penalty
+        scores[self._by_name.get(" ".join(query_words), [])] += 1.0
+        if category is not None:
+            in_category = np.zeros(len(self.products), dtype=bool)
+            in_category[self._by_category.get(category.lower(), [])] = True
+            scores[~in_category] = 0.0
+
+        candidates = np.flatnonzero(scores >= MIN_SCORE)
+        rounded = np.round(scores[candidates], 4)
+        # Best first, ties in catalog order
+        ranked = candidates[np.lexsort((candidates, -rounded))][:limit]
+        return [(self.products[position], float(round(scores[position], 4))) for position in ranked.tolist()]
@@ -0,0 +1,179 @@
+"""Opt-in profiling of individual requests.
+
+Disabled unless PROFILE_TOKENS is set. A request carrying one of the tokens in
+an `X-Profile` header (or `?profile=` query parameter) is profiled:
+
+    curl -H "X-Profile: $TOKEN" "localhost:8000/api/pick-list/all"
+    curl "localhost:8000/api/pick-list/all?profile=$TOKEN&profile_mode=cprofile&profile_inline=1"
+
+Modes:
+- `sample` (default): stack samples of the event-loop thread, written as
+  collapsed stacks (`.folded`), the input format of flamegraph.pl and speedscope
+- `cprofile`: deterministic cProfile, written as a `.prof` file for pstats or snakeviz
+
+The profile is saved under PROFILE_DIR and its path returned in `X-Profile-File`.
+With `profile_inline=1` (or `X-Profile-Inline: 1`) the profile itself is returned
+as the response body instead of the endpoint's response. Only one request is
+profiled at a time; others arriving meanwhile run normally.
+"""
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+from urllib.parse import parse_qs
+import asyncio
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+
+
+PROFILE_TOKENS = [t for t in os.getenv("PROFILE_TOKENS", "").split(",") if t]
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles"))
+SAMPLE_INTERVAL_SECONDS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", 1)) / 1000
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack from a background thread"""
+
+    extension = "folded"
+
+    def __init__(self, thread_id: Optional[int] = None, interval: float = SAMPLE_INTERVAL_SECONDS):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _label(code) -> str:
+        return f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+
+    def _run(self):
+        while not self._stop.is_set():
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def render(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def save(self, path: str):
+        with open(path, "w") as f:
+            f.write(self.render())
+
+
+class DeterministicProfiler:
+    """cProfile of everything run on the calling thread while enabled"""
+
+    extension = "prof"
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def render(self, limit: int = 60) -> str:
+        out = io.StringIO()
+        pstats.Stats(self.profile, stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+    def save(self, path: str):
+        self.profile.dump_stats(path)
+
+
+PROFILERS = {"sample": SamplingProfiler, "cprofile": DeterministicProfiler}
+
+
+def profile_path(directory: str, label: str, extension: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", label).strip("_") or "root"
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    return os.path.join(directory, f"{stamp}-{slug}.{extension}")
+
+
+def _truthy(value: Optional[str]) -> bool:
+    return (value or "").lower() in ("1", "true", "yes")
+
+
+class ProfilingMiddleware:
+    """Profiles requests that present an allowlisted token"""
+
+    def __init__(self, app, tokens=None, output_dir: str = PROFILE_DIR):
+        self.app = app
+        self.tokens = PROFILE_TOKENS if tokens is None else tokens
+        self.output_dir = output_dir
+        self._lock = asyncio.Lock()
+
+    def _options(self, scope) -> Optional[dict]:
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+        query = {k: v[-1] for k, v in parse_qs(scope.get("query_string", b"").decode("latin-1")).items()}
+        token = headers.get("x-profile") or query.get("profile")
+        if not token or not any(hmac.compare_digest(token.encode(), allowed.encode()) for allowed in self.tokens):
+            return None
+        mode = headers.get("x-profile-mode") or query.get("profile_mode") or "sample"
+        if mode not in PROFILERS:
+            return None
+        return {
+            "mode": mode,
+            "inline": _truthy(headers.get("x-profile-inline") or query.get("profile_inline")),
+        }
+
+    async def __call__(self, scope, receive, send):
+        options = self._options(scope) if scope["type"] == "http" and self.tokens else None
+        if options is None or self._lock.locked():
+            await self.app(scope, receive, send)
+            return
+
+        async with self._lock:
+            profiler = PROFILERS[options["mode"]]()
+            os.makedirs(self.output_dir, exist_ok=True)
+            path = profile_path(self.output_dir, f"{scope['method']} {scope['path']}", profiler.extension)
+
+            async def send_wrapper(message):
+                if options["inline"]:
+                    return  # replaced by the profile below
+                if message["type"] == "http.response.start":
+                    message = {**message, "headers": list(message.get("headers", [])) + [
+                        (b"x-profile-file", path.encode()),
+                    ]}
+                await send(message)
+
+            profiler.start()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                profiler.stop()
+                profiler.save(path)
+
+            if options["inline"]:
+                body = profiler.render().encode()
+                await send({
+                    "type": "http.response.start",
+                    "status": 200,
+                    "headers": [
+                        (b"content-type", b"text/plain; charset=utf-8"),
+                        (b"content-length", str(len(body)).encode()),
+                        (b"x-profile-file", path.encode()),
+                    ],
+                })
+                await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,65 @@
+"""Startup readiness: liveness (/health) answers at once, data routes wait for the warm start.
+
+The process binds its port before the snapshot is loaded and the ingestion log
+replayed, so platform health checks pass and the listen socket is open while
+state is still being restored. Until then `/api/*` answers 503 with Retry-After
+rather than serving a half-restored view.
+"""
+from typing import Optional
+import json
+import time
+
+
+class Readiness:
+    """Progress of the warm start, reported by GET /ready"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.ready = False
+        self.ready_after_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+        self.details = {}
+
+    def mark_ready(self, **details):
+        self.details.update(details)
+        self.ready = True
+        self.ready_after_seconds = round(time.perf_counter() - self.started_at, 4)
+
+    def mark_failed(self, error: str):
+        self.error = error
+
+    def status(self) -> dict:
+        return {
+            "status": "ready" if self.ready else ("failed" if self.error else "starting"),
+            "ready_after_seconds": self.ready_after_seconds,
+            "waiting_seconds": None if self.ready else round(time.perf_counter() - self.started_at, 4),
+            "error": self.error,
+            **self.details,
+        }
+
+
+class ReadinessGate:
+    """Answers 503 for gated paths until the readiness flag is set"""
+
+    def __init__(self, app, readiness: Readiness, prefix: str = "/api/", retry_after: int = 1):
+        self.app = app
+        self.readiness = readiness
+        self.prefix = prefix
+        self.retry_after = retry_after
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.readiness.ready or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        body = json.dumps({"detail": "Service is starting", **self.readiness.status()}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(self.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
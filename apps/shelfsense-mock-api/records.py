@@ -0,0 +1,76 @@
+"""Compact internal rows for the engine layer.
+
+Generators produce these instead of Pydantic models so routes can filter,
+sort and hold network-wide sets cheaply. A row converts to its public model
+(same field names, same order) only at the edge: routes return `row._asdict()`
+and FastAPI validates it against the response_model once.
+"""
+from typing import NamedTuple, Optional
+
+
+class InventoryRow(NamedTuple):
+    """Engine-side InventoryStatus"""
+    product_id: str
+    product_name: str
+    location_id: str
+    location_name: str
+    current_stock: int
+    min_stock: int
+    max_stock: int
+    status: str
+    days_until_stockout: Optional[float]
+
+
+class PerformanceRow(NamedTuple):
+    """Engine-side ProductPerformance"""
+    product_id: str
+    product_name: str
+    category: str
+    location_id: Optional[str]
+    location_name: Optional[str]
+    units_sold_7d: int
+    units_sold_30d: int
+    revenue_7d: float
+    revenue_30d: float
+    daily_velocity: float
+    turnover_rate: float
+    days_of_supply: float
+    sell_through_rate: float
+    gross_margin: float
+    performance_score: float
+    performance_tier: str
+
+
+class TrendRow(NamedTuple):
+    """Engine-side TrendData"""
+    product_id: str
+    product_name: str
+    location_id: Optional[str]
+    location_name: Optional[str]
+    trend_direction: str
+    trend_strength: float
+    week_over_week_change: float
+    month_over_month_change: float
+    seasonality_factor: float
+    is_seasonal_peak: bool
+    seasonal_pattern: Optional[str]
+    has_anomaly: bool
+    anomaly_type: Optional[str]
+    anomaly_severity: Optional[str]
+    anomaly_description: Optional[str]
+
+
+class TransferRow(NamedTuple):
+    """Engine-side TransferRecommendation"""
+    product_id: str
+    product_name: str
+    from_location_id: str
+    from_location_name: str
+    to_location_id: str
+    to_location_name: str
+    quantity: int
+    from_stock: int
+    to_stock: int
+    avoided_stockout_cost: float
+    transfer_cost: float
+    net_benefit: float
@@ -0,0 +1,494 @@
+"""Routing layer in front of a sharded deployment (see sharding.py).
+
+Run one API process per shard with SHARD=<index>/<count>, then this router with
+SHARD_URLS listing the shards in index order. `python router.py --local 3`
+starts three shards on this machine first. Clients use the router as if it
+were a single API:
+
+- Requests for one location (a `location_id` query parameter, or
+  /api/locations/{location_id}) are proxied to that location's shard as they
+  are, server-sent event streams included.
+- Network-wide views are requested from every shard concurrently and merged:
+  locations and pick lists in catalog order, alert summaries with recomputed
+  counts, anomalies by severity, top performers and transfers by score, the
+  analytics summary with summed counts, and product performance and model
+  accuracy rows from every shard.
+- Ingestion batches are split by location and each part is posted to its
+  shard. Binary records are renumbered to the shard's own location positions.
+- Anything else (products, sampled views) is answered by one shard, in turn.
+"""
+from contextlib import asynccontextmanager
+from itertools import chain
+from typing import Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+
+import httpx
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from alert_engine import SEVERITY_ORDER
+from compression import CompressionMiddleware
+from ingest import EVENT_RECORD, EVENT_TYPES, MAX_REPORTED_ERRORS
+from sample_data import LOCATIONS, PRODUCTS
+from sharding import assign_shards
+
+SHARD_STRATEGY = os.getenv("SHARD_STRATEGY", "region")
+ROUTER_TIMEOUT_SECONDS = float(os.getenv("ROUTER_TIMEOUT_SECONDS", 30))
+
+# Request and response headers that describe one connection, not the message
+HOP_HEADERS = {"host", "connection", "keep-alive", "transfer-encoding", "te", "upgrade", "content-length"}
+LOCATION_ORDER = {loc.id: k for k, loc in enumerate(LOCATIONS)}
+ANOMALY_SEVERITY_ORDER = {"high": 0, "medium": 1, "low": 2}
+
+
+class Shards:
+    """Shard URLs and the location -> shard assignment every shard also derives"""
+
+    def __init__(self, urls: List[str], strategy: str = "region"):
+        self.urls = [url.rstrip("/") for url in urls]
+        self.shard_of = assign_shards(LOCATIONS, len(self.urls), strategy) if self.urls else {}
+        # Catalog position -> (shard, position in that shard's catalog), for binary events
+        self.position_shard = np.array([self.shard_of.get(loc.id, 0) for loc in LOCATIONS], dtype=np.int64)
+        self.local_position = np.zeros(len(LOCATIONS), dtype=np.int64)
+        counts = [0] * max(len(self.urls), 1)
+        for k, shard in enumerate(self.position_shard.tolist()):
+            self.local_position[k] = counts[shard]
+            counts[shard] += 1
+        self._next = 0
+
+    def for_location(self, location_id: str) -> int:
+        shard = self.shard_of.get(location_id)
+        if shard is None:
+            raise HTTPException(status_code=404, detail=f"Location {location_id} not found")
+        return shard
+
+    def next(self) -> int:
+        """Round-robin pick for requests any shard can answer"""
+        self._next = (self._next + 1) % len(self.urls)
+        return self._next
+
+
+shards = Shards([url for url in os.getenv("SHARD_URLS", "").split(",") if url.strip()], SHARD_STRATEGY)
+client: Optional[httpx.AsyncClient] = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global client
+    # Streams hold a connection open for their whole life, so the pool is unbounded
+    client = httpx.AsyncClient(
+        timeout=ROUTER_TIMEOUT_SECONDS,
+        limits=httpx.Limits(max_connections=None, max_keepalive_connections=64),
+    )
+    yield
+    await client.aclose()
+
+
+app = FastAPI(
+    title="ShelfSense Shard Router",
+    description="Routes ShelfSense Mock API requests across location shards",
+    version="1.0.0",
+    lifespan=lifespan,
+)
+app.add_middleware(CompressionMiddleware)
+
+
+# ---------- shard requests ----------
+
+async def relay(request: Request, response: httpx.Response):
+    """Response bytes as they arrive. The client is checked between chunks, so an
+    abandoned event stream is closed at the shard on its next heartbeat."""
+    try:
+        async for chunk in response.aiter_raw():
+            yield chunk
+            if await request.is_disconnected():
+                break
+    finally:
+        await response.aclose()
+
+
+async def forward(shard: int, request: Request) -> StreamingResponse:
+    """Proxy a request to one shard, streaming the response back untouched"""
+    url = shards.urls[shard] + request.url.path
+    if request.url.query:
+        url += "?" + request.url.query
+    upstream = client.build_request(
+        request.method,
+        url,
+        headers=[(k, v) for k, v in request.headers.items() if k not in HOP_HEADERS],
+        content=await request.body(),
+        # No read timeout: alert streams stay open between events
+        timeout=httpx.Timeout(ROUTER_TIMEOUT_SECONDS, read=None),
+    )
+    try:
+        response = await client.send(upstream, stream=True)
+    except httpx.TransportError as exc:
+        raise HTTPException(status_code=502, detail=f"Shard {shard} unavailable: {exc!r}")
+    return StreamingResponse(
+        relay(request, response),
+        status_code=response.status_code,
+        headers={k: v for k, v in response.headers.items() if k not in HOP_HEADERS},
+    )
+
+
+async def _send(shard: int, method: str, path: str, **kwargs) -> httpx.Response:
+    try:
+        return await client.request(method, shards.urls[shard] + path, **kwargs)
+    except httpx.TransportError as exc:
+        raise HTTPException(status_code=502, detail=f"Shard {shard} unavailable: {exc!r}")
+
+
+async def gather(path: str, request: Request) -> list:
+    """GET `path` with the request's query from every shard at once; the first error is passed on"""
+    params = dict(request.query_params)
+    responses = await asyncio.gather(*(_send(shard, "GET", path, params=params) for shard in range(len(shards.urls))))
+    for response in responses:
+        if response.status_code != 200:
+            raise HTTPException(status_code=response.status_code, detail=response.json().get("detail"))
+    return [response.json() for response in responses]
+
+
+def merge_analytics_summaries(parts: List[dict]) -> dict:
+    """One AnalyticsSummary from per-shard summaries: counts summed, accuracy
+    weighted by locations, top sellers re-ranked by units sold"""
+    total_locations = sum(p["total_locations"] for p in parts)
+    sellers: Dict[str, dict] = {}
+    for row in chain.from_iterable(p["top_selling_products"] for p in parts):
+        merged = sellers.setdefault(row["product_name"], {**row, "units_sold": 0, "revenue": 0.0})
+        merged["units_sold"] += row["units_sold"]
+        merged["revenue"] = round(merged["revenue"] + row["revenue"], 2)
+    underperforming = {row["location_name"]: row for row in chain.from_iterable(p["underperforming_locations"] for p in parts)}
+    return {
+        "total_locations": total_locations,
+        "total_products": max(p["total_products"] for p in parts),
+        "avg_forecast_accuracy": round(
+            sum(p["avg_forecast_accuracy"] * p["total_locations"] for p in parts) / max(total_locations, 1), 1
+        ),
+        "total_picks_today": sum(p["total_picks_today"] for p in parts),
+        "stockout_risk_count": sum(p["stockout_risk_count"] for p in parts),
+        "overstock_count": sum(p["overstock_count"] for p in parts),
+        "optimal_stock_count": sum(p["optimal_stock_count"] for p in parts),
+        "top_selling_products": sorted(sellers.values(), key=lambda r: -r["units_sold"])[:3],
+        "underperforming_locations": list(underperforming.values()),
+    }
+
+
+def merge_alert_summaries(parts: List[dict]) -> dict:
+    """One AlertsSummary from per-shard summaries; shards hold disjoint locations"""
+    alerts = sorted(chain.from_iterable(p["alerts"] for p in parts), key=lambda a: SEVERITY_ORDER.get(a["severity"], 3))
+    return {
+        "total_alerts": sum(p["total_alerts"] for p in parts),
+        "critical_count": sum(p["critical_count"] for p in parts),
+        "warning_count": sum(p["warning_count"] for p in parts),
+        "info_count": sum(p["info_count"] for p in parts),
+        "alerts": alerts,
+        "locations_affected": sum(p["locations_affected"] for p in parts),
+        "products_affected": len({a["product_id"] for a in alerts if a["product_id"]}),
+    }
+
+
+# ==================== Router ====================
+
+@app.get("/")
+async def root():
+    """Router root endpoint"""
+    return {"message": "ShelfSense Shard Router", "strategy": SHARD_STRATEGY, "shards": shards.urls}
+
+
+@app.get("/health")
+async def health_check():
+    """Liveness of the router itself"""
+    return {"status": "healthy", "shards": len(shards.urls)}
+
+
+@app.get("/ready")
+async def readiness_check():
+    """200 once every shard is ready, with each shard's readiness"""
+    statuses = []
+    for shard in range(len(shards.urls)):
+        try:
+            response = await _send(shard, "GET", "/ready")
+            statuses.append(response.json())
+        except HTTPException as exc:
+            statuses.append({"status": "unavailable", "error": exc.detail})
+    ready = bool(statuses) and all(s.get("status") == "ready" for s in statuses)
+    return JSONResponse({"status": "ready" if ready else "starting", "shards": statuses},
+                        status_code=200 if ready else 503)
+
+
+# ==================== Scatter-Gather ====================
+
+@app.get("/api/locations")
+async def get_locations(request: Request):
+    """All shards' locations, in catalog order"""
+    parts = await gather("/api/locations", request)
+    return sorted(chain.from_iterable(parts), key=lambda loc: LOCATION_ORDER.get(loc["id"], len(LOCATION_ORDER)))
+
+
+@app.get("/api/pick-list/all")
+async def get_all_pick_lists(request: Request):
+    """Every shard's pick lists, in catalog order"""
+    parts = await gather("/api/pick-list/all", request)
+    return sorted(chain.from_iterable(parts), key=lambda pl: LOCATION_ORDER.get(pl["location_id"], len(LOCATION_ORDER)))
+
+
+@app.get("/api/alerts")
+@app.get("/api/alerts/critical")
+@app.get("/api/alerts/stockout-risks")
+async def get_alerts(request: Request, location_id: Optional[str] = Query(None)):
+    """One location's alerts from its shard, or all shards' alerts merged"""
+    if location_id:
+        return await forward(shards.for_location(location_id), request)
+    return merge_alert_summaries(await gather(request.url.path, request))
+
+
+@app.get("/api/analytics/anomalies")
+async def get_anomalies(request: Request, location_id: Optional[str] = Query(None)):
+    """One location's anomalies from its shard, or all shards' merged by severity"""
+    if location_id:
+        return await forward(shards.for_location(location_id), request)
+    parts = await gather("/api/analytics/anomalies", request)
+    return sorted(chain.from_iterable(parts), key=lambda t: ANOMALY_SEVERITY_ORDER.get(t["anomaly_severity"], 3))
+
+
+@app.get("/api/analytics/top-performers")
+async def get_top_performers(
+    request: Request,
+    location_id: Optional[str] = Query(None),
+    limit: int = Query(10, ge=1, le=50),
+):
+    """Network-wide top performers: each shard's top `limit`, best shard score per product.
+
+    A shard scores a product over its own locations, so this ranks products by
+    their strongest region rather than by one network-wide average.
+    """
+    if location_id:
+        return await forward(shards.for_location(location_id), request)
+    best: Dict[str, dict] = {}
+    for row in chain.from_iterable(await gather("/api/analytics/top-performers", request)):
+        if row["product_id"] not in best or row["performance_score"] > best[row["product_id"]]["performance_score"]:
+            best[row["product_id"]] = row
+    return sorted(best.values(), key=lambda r: (-r["performance_score"], r["product_id"]))[:limit]
+
+
+@app.get("/api/transfers/recommendations")
+async def get_transfer_recommendations(
+    request: Request,
+    location_id: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+):
+    """Transfers from every shard, best net benefit first. Stock is only matched within a shard."""
+    if location_id:
+        return await forward(shards.for_location(location_id), request)
+    parts = await gather("/api/transfers/recommendations", request)
+    transfers = sorted(
+        chain.from_iterable(p["transfers"] for p in parts),
+        key=lambda t: (-t["net_benefit"], t["product_id"], t["to_location_id"]),
+    )
+    return {
+        "total_transfers": sum(p["total_transfers"] for p in parts),
+        "total_units": sum(p["total_units"] for p in parts),
+        "total_net_benefit": round(sum(p["total_net_benefit"] for p in parts), 2),
+        "transfers": transfers[:limit],
+    }
+
+
+@app.get("/api/analytics/summary")
+async def get_analytics_summary(request: Request):
+    """Every shard's summary merged into one for the network"""
+    return merge_analytics_summaries(await gather("/api/analytics/summary", request))
+
+
+@app.get("/api/analytics/product-performance")
+async def get_product_performance(request: Request, location_id: Optional[str] = Query(None)):
+    """One location's rows from its shard, or every shard's rows by performance score"""
+    if location_id:
+        return await forward(shards.for_location(location_id), request)
+    parts = await gather("/api/analytics/product-performance", request)
+    return sorted(chain.from_iterable(parts), key=lambda r: -r["performance_score"])
+
+
+@app.get("/api/models/product-accuracy")
+async def get_model_accuracy(request: Request, location_id: Optional[str] = Query(None)):
+    """One location's rows from its shard, or every shard's rows in catalog order"""
+    if location_id:
+        return await forward(shards.for_location(location_id), request)
+    parts = await gather("/api/models/product-accuracy", request)
+    return sorted(chain.from_iterable(parts), key=lambda r: LOCATION_ORDER.get(r["location_id"], len(LOCATION_ORDER)))
+
+
+@app.post("/api/alerts/{alert_id}/acknowledge")
+async def acknowledge_alert(alert_id: str):
+    """Acknowledge on whichever shard holds the alert"""
+    for shard in range(len(shards.urls)):
+        response = await _send(shard, "POST", f"/api/alerts/{alert_id}/acknowledge")
+        if response.status_code != 404:
+            return JSONResponse(response.json(), status_code=response.status_code)
+    raise HTTPException(status_code=404, detail=f"Alert {alert_id} not found")
+
+
+@app.get("/api/alerts/stream")
+@app.get("/api/sync/changes")
+async def location_only(request: Request, location_id: Optional[str] = Query(None)):
+    """Streams and sync versions are per shard, so these need a location"""
+    if not location_id:
+        raise HTTPException(status_code=400, detail="location_id is required behind the shard router")
+    return await forward(shards.for_location(location_id), request)
+
+
+# ==================== Event Ingestion ====================
+
+def split_json_lines(body: bytes) -> Tuple[Dict[int, List[bytes]], int, List[str]]:
+    """NDJSON lines grouped by shard, plus lines rejected for an unknown or missing location"""
+    parts: Dict[int, List[bytes]] = {}
+    rejected, errors = 0, []
+    for line_no, line in enumerate(body.split(b"\n"), 1):
+        if not line.strip():
+            continue
+        try:
+            location_id = json.loads(line).get("location_id")
+        except (ValueError, AttributeError) as e:
+            location_id, error = None, f"line {line_no}: {e.__class__.__name__}: {e}"
+        else:
+            error = f"line {line_no}: unknown location_id {location_id!r}"
+        shard = shards.shard_of.get(location_id)
+        if shard is None:
+            rejected += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append(error)
+            continue
+        parts.setdefault(shard, []).append(line)
+    return {shard: b"\n".join(lines) for shard, lines in parts.items()}, rejected, errors
+
+
+def split_binary(body: bytes) -> Tuple[Dict[int, bytes], int, List[str]]:
+    """Packed records grouped by shard, with locations renumbered for each shard's catalog"""
+    errors = []
+    usable = len(body) - len(body) % EVENT_RECORD.itemsize
+    if usable != len(body):
+        errors.append(f"trailing {len(body) - usable} bytes ignored (record size {EVENT_RECORD.itemsize})")
+    records = np.frombuffer(body[:usable], dtype=EVENT_RECORD)
+    locations = records["location"].astype(np.int64)
+    known = locations < len(LOCATIONS)
+    rejected = int((~known).sum())
+    if rejected:
+        errors.append(f"{rejected} records with unknown location")
+
+    parts = {}
+    owner = np.full(len(records), -1, dtype=np.int64)
+    owner[known] = shards.position_shard[locations[known]]
+    for shard in np.unique(owner[known]).tolist():
+        part = records[owner == shard].copy()
+        part["location"] = shards.local_position[part["location"].astype(np.int64)]
+        parts[shard] = part.tobytes()
+    return parts, rejected, errors
+
+
+@app.post("/api/ingest/events")
+async def ingest_events(request: Request):
+    """Split a batch by shard and post the parts concurrently.
+
+    If a shard fails, the response is a 502 listing the shards that applied
+    their part; re-send only the events for the others.
+    """
+    body = await request.body()
+    content_type = request.headers.get("content-type", "application/x-ndjson")
+    split = split_binary if content_type.startswith("application/octet-stream") else split_json_lines
+    parts, rejected, errors = split(body)
+
+    shard_ids = sorted(parts)
+    responses = await asyncio.gather(*(
+        _send(shard, "POST", "/api/ingest/events", content=parts[shard], headers={"content-type": content_type})
+        for shard in shard_ids
+    ))
+    applied = {shard: r.json() for shard, r in zip(shard_ids, responses) if r.status_code == 200}
+    failed = [shard for shard, r in zip(shard_ids, responses) if r.status_code != 200]
+    if failed:
+        return JSONResponse({"detail": f"Shards {failed} did not apply their events", "applied": applied},
+                            status_code=502)
+
+    results = list(applied.values())
+    return {
+        "accepted": sum(r["accepted"] for r in results),
+        "rejected": rejected + sum(r["rejected"] for r in results),
+        "sku_locations_updated": sum(r["sku_locations_updated"] for r in results),
+        "sequence": max((r["sequence"] for r in results), default=0),
+        "shard_sequences": {str(shard): r["sequence"] for shard, r in applied.items()},
+        "errors": (errors + list(chain.from_iterable(r["errors"] for r in results)))[:MAX_REPORTED_ERRORS],
+    }
+
+
+@app.get("/api/ingest/catalog")
+async def get_ingest_catalog():
+    """Positions for the whole network; the router renumbers locations per shard"""
+    return {
+        "record_format": {name: EVENT_RECORD.fields[name][0].str for name in EVENT_RECORD.names},
+        "record_size": EVENT_RECORD.itemsize,
+        "event_types": EVENT_TYPES,
+        "products": [p.id for p in PRODUCTS],
+        "locations": [loc.id for loc in LOCATIONS],
+    }
+
+
+# ==================== Routed by Location ====================
+
+@app.api_route("/api/{path:path}", methods=["GET", "POST"])
+async def route_by_location(path: str, request: Request):
+    """Location-scoped requests go to the location's shard, the rest to any shard"""
+    location_id = request.query_params.get("location_id")
+    if path.startswith("locations/"):
+        location_id = path.split("/", 1)[1]
+    if location_id and location_id != "all":
+        return await forward(shards.for_location(location_id), request)
+    return await forward(shards.next(), request)
+
+
+# ==================== Run Router ====================
+
+def spawn_local_shards(count: int, base_port: int) -> Tuple[List[subprocess.Popen], List[str]]:
+    """Start `count` shard processes on localhost, ports base_port and up"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    processes, urls = [], []
+    for index in range(count):
+        env = {**os.environ, "SHARD": f"{index}/{count}", "SHARD_STRATEGY": SHARD_STRATEGY}
+        if "SHELFSENSE_DATA_DIR" in os.environ:
+            env["SHELFSENSE_DATA_DIR"] = os.path.join(os.environ["SHELFSENSE_DATA_DIR"], f"shard-{index}-of-{count}")
+        port = base_port + index
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+            cwd=here, env=env,
+        ))
+        urls.append(f"http://127.0.0.1:{port}")
+    return processes, urls
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Route ShelfSense Mock API requests across location shards")
+    parser.add_argument("--local", type=int, metavar="N", help="start N shards on this machine first")
+    parser.add_argument("--shard-port", type=int, default=8100, help="port of the first local shard")
+    args = parser.parse_args()
+
+    processes = []
+    if args.local:
+        processes, urls = spawn_local_shards(args.local, args.shard_port)
+        shards = Shards(urls, SHARD_STRATEGY)
+        # uvicorn re-raises SIGTERM once it has shut down; exit normally instead
+        # so the shards are stopped below
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    if not shards.urls:
+        parser.error("set SHARD_URLS or pass --local N")
+    try:
+        uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", 8000)))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
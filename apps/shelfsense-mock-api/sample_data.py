@@ -1,12 +1,21 @@
 """Realistic sample data for ShelfSense Mock API"""
 from datetime import datetime, timedelta
+from typing import Dict, List, Optional
 from models import (
     Product, Location, PickListItem, PickList, ModelAccuracy,
-    InventoryStatus, DemandForecast, ForecastConfidence, AnalyticsSummary,
+    InventoryStatus, DemandForecast, ForecastConfidence, ForecastMatrix, AnalyticsSummary,
     ProductPerformance, TrendData, Alert, AlertsSummary
 )
+from alert_engine import ALERT_RULES, AlertEngine, alert_id_for
+from inventory_state import STOCK_STATUSES, InventoryState
+from leaderboard import PerformanceLeaderboards
+from pick_plans import PickListPlans
+from product_search import ProductSearchIndex
+from records import InventoryRow, PerformanceRow, TransferRow, TrendRow
+from transfers import recommend_transfers, region_codes
 import random
-import hashlib
+
+import numpy as np
 
 
 # Locations - Micromarkets at various venues
@@ -313,9 +322,20 @@ DEMO_PICK_ROWS = [
 ]
 
 
+# Live stock levels and sales history, updated by POST /api/ingest/events.
+# Fixed seed so write-ahead log replay lands on the same baseline after a restart.
+INVENTORY_SEED = 20240601
+INVENTORY = InventoryState([p.id for p in PRODUCTS], [loc.id for loc in LOCATIONS], seed=INVENTORY_SEED)
+
+# Primary-key indexes over the catalog; load_catalog rebuilds them in place
+PRODUCTS_BY_ID: Dict[str, Product] = {p.id: p for p in PRODUCTS}
+LOCATIONS_BY_ID: Dict[str, Location] = {loc.id: loc for loc in LOCATIONS}
+PRODUCT_SEARCH = ProductSearchIndex(PRODUCTS)
+
+
 def generate_pick_list(location_id: str, date_str: str) -> PickList:
     """Generate a realistic pick list for a location"""
-    location = next((loc for loc in LOCATIONS if loc.id == location_id), LOCATIONS[0])
+    location = LOCATIONS_BY_ID.get(location_id, LOCATIONS[0])
 
     # If "all" or a known demo location, return the curated UI-aligned rows
     demo_rows = (
@@ -327,7 +347,7 @@ def generate_pick_list(location_id: str, date_str: str) -> PickList:
     items: list[PickListItem] = []
     if demo_rows:
         for idx, row in enumerate(demo_rows):
-            product = next((p for p in PRODUCTS if p.id == row["product_id"]), None)
+            product = PRODUCTS_BY_ID.get(row["product_id"])
             p50 = row["demand"]
             p10 = max(1, int(p50 * 0.7))
             p90 = int(p50 * 1.2)
@@ -365,14 +385,17 @@ def generate_pick_list(location_id: str, date_str: str) -> PickList:
             status="pending",
         )
 
-    # Otherwise fall back to synthetic generation with richer fields
+    # Otherwise fall back to synthetic generation with richer fields. Draws are
+    # seeded per (location, date) and stock comes from inventory state, so an
+    # item only changes when its SKU-location does (see /api/sync/changes).
+    rng = random.Random(f"{INVENTORY_SEED}:{location.id}:{date_str}")
     if location.type == "hotel":
-        product_sample = random.sample(PRODUCTS, min(15, len(PRODUCTS)))
+        product_sample = rng.sample(PRODUCTS, min(15, len(PRODUCTS)))
     elif location.type == "office":
         product_sample = [p for p in PRODUCTS if p.category in ["Beverages", "Snacks"]]
-        product_sample = random.sample(product_sample, min(12, len(product_sample)))
+        product_sample = rng.sample(product_sample, min(12, len(product_sample)))
     else:
-        product_sample = random.sample(PRODUCTS, min(18, len(PRODUCTS)))
+        product_sample = rng.sample(PRODUCTS, min(18, len(PRODUCTS)))
 
     reasons = [
         "Based on occupancy rate and historical trends",
@@ -383,25 +406,26 @@ def generate_pick_list(location_id: str, date_str: str) -> PickList:
     ]
 
     for idx, product in enumerate(product_sample):
-        base_demand = random.randint(3, 15)
+        base_demand = rng.randint(3, 15)
         if location.occupancy_rate:
             base_demand = int(base_demand * location.occupancy_rate)
 
-        p10 = max(1, base_demand - random.randint(2, 4))
+        p10 = max(1, base_demand - rng.randint(2, 4))
         p50 = base_demand
-        p90 = base_demand + random.randint(2, 5)
+        p90 = base_demand + rng.randint(2, 5)
         recommended = int(p50 * 1.3)
-        current_stock = random.randint(0, 8)
+        current_stock, min_stock, _ = INVENTORY.levels(product.id, location.id)
 
-        if current_stock <= 2:
+        # Same bands as inventory status: critical is high priority, low is medium
+        if current_stock < min_stock * 0.5:
             priority = "high"
-        elif current_stock <= 5:
+        elif current_stock < min_stock:
             priority = "medium"
         else:
             priority = "low"
 
-        last_updated = datetime.now() - timedelta(minutes=random.randint(5, 240))
-        factor = random.choice(reasons)
+        last_updated = datetime.now() - timedelta(minutes=rng.randint(5, 240))
+        factor = rng.choice(reasons)
         ai_factor_list = [factor]
 
         items.append(
@@ -416,11 +440,11 @@ def generate_pick_list(location_id: str, date_str: str) -> PickList:
                 forecast=ForecastConfidence(p10=p10, p50=p50, p90=p90),
                 recommended_quantity=recommended,
                 priority=priority,
-                confidence_score=random.uniform(0.75, 0.95),
+                confidence_score=rng.uniform(0.75, 0.95),
                 stockout_cost=round(recommended * (product.price or 2.0) * 0.9, 2),
                 ai_factors=ai_factor_list,
                 reason=factor,
-                last_restocked=datetime.now() - timedelta(days=random.randint(1, 5)),
+                last_restocked=datetime.now() - timedelta(days=rng.randint(1, 5)),
                 last_updated=last_updated,
             )
         )
@@ -439,10 +463,30 @@ def generate_pick_list(location_id: str, date_str: str) -> PickList:
     )
 
 
+def build_pick_lists(location_ids: List[str], date_str: str) -> List[PickList]:
+    """Pick lists for several locations (a fanout.LocationPool task)"""
+    return [generate_pick_list(location_id, date_str) for location_id in location_ids]
+
+
+# Stored plans that the pick-list routes serve; main.py precomputes them nightly
+PICK_LISTS = PickListPlans(generate_pick_list)
+PICK_LISTS.reset([p.id for p in PRODUCTS], [loc.id for loc in LOCATIONS])
+
+
+def changed_pick_list_items(location_id: str, date_str: str, product_ids: set) -> List[PickListItem]:
+    """Items of a location's pick list for the given products, after their stock changed.
+
+    Curated demo lists do not read inventory state, so they never change.
+    """
+    if any(row["location_id"] == location_id for row in DEMO_PICK_ROWS):
+        return []
+    return [item for item in PICK_LISTS.get(location_id, date_str).items if item.product_id in product_ids]
+
+
 def generate_model_accuracy(product_id: str, location_id: str) -> ModelAccuracy:
     """Generate model accuracy metrics"""
-    product = next((p for p in PRODUCTS if p.id == product_id), PRODUCTS[0])
-    location = next((loc for loc in LOCATIONS if loc.id == location_id), LOCATIONS[0])
+    product = PRODUCTS_BY_ID.get(product_id, PRODUCTS[0])
+    location = LOCATIONS_BY_ID.get(location_id, LOCATIONS[0])
 
     # Hotels have better predictability
     if location.type == "hotel":
@@ -469,18 +513,18 @@ def generate_model_accuracy(product_id: str, location_id: str) -> ModelAccuracy:
     )
 
 
-def generate_inventory_status(product_id: str, location_id: str) -> InventoryStatus:
-    """Generate current inventory status"""
-    product = next((p for p in PRODUCTS if p.id == product_id), PRODUCTS[0])
-    location = next((loc for loc in LOCATIONS if loc.id == location_id), LOCATIONS[0])
+def inventory_status_row(product_id: str, location_id: str) -> InventoryRow:
+    """Current inventory status as an engine row"""
+    product = PRODUCTS_BY_ID.get(product_id, PRODUCTS[0])
+    location = LOCATIONS_BY_ID.get(location_id, LOCATIONS[0])
 
-    min_stock = random.randint(3, 8)
-    max_stock = min_stock + random.randint(10, 25)
-    current = random.randint(0, max_stock + 5)
+    current, min_stock, max_stock = INVENTORY.levels(product.id, location.id)
 
     if current < min_stock:
         status = "critical" if current < min_stock * 0.5 else "low"
-        days_until_stockout = current / random.uniform(2, 5)
+        sales = INVENTORY.sales_metrics(product.id, location.id)
+        velocity = sales["daily_velocity"] if sales and sales["daily_velocity"] else random.uniform(2, 5)
+        days_until_stockout = current / velocity
     elif current > max_stock:
         status = "overstock"
         days_until_stockout = None
@@ -488,7 +532,7 @@ def generate_inventory_status(product_id: str, location_id: str) -> InventorySta
         status = "optimal"
         days_until_stockout = None
 
-    return InventoryStatus(
+    return InventoryRow(
         product_id=product.id,
         product_name=product.name,
         location_id=location.id,
@@ -501,45 +545,132 @@ def generate_inventory_status(product_id: str, location_id: str) -> InventorySta
     )
 
 
-def generate_demand_forecast(product_id: str, location_id: str, forecast_date: str) -> DemandForecast:
-    """Generate demand forecast for a product"""
-    product = next((p for p in PRODUCTS if p.id == product_id), PRODUCTS[0])
-    location = next((loc for loc in LOCATIONS if loc.id == location_id), LOCATIONS[0])
+def location_inventory_rows(location_id: str, status: Optional[str] = None) -> List[InventoryRow]:
+    """Inventory rows for every product at a location, optionally only those with a given status.
 
-    base_demand = random.randint(5, 20)
+    The status is evaluated over the location's stock column in one vectorized
+    pass, so rows are built only for matching products.
+    """
+    if status is None:
+        return [inventory_status_row(p.id, location_id) for p in PRODUCTS]
+    if status not in STOCK_STATUSES:
+        return []
+    codes = INVENTORY.stock_status(INVENTORY.location_index[location_id])
+    matches = np.flatnonzero(codes == STOCK_STATUSES.index(status))
+    return [inventory_status_row(PRODUCTS[i].id, location_id) for i in matches.tolist()]
 
-    # Factor in occupancy
-    if location.occupancy_rate:
-        base_demand = int(base_demand * location.occupancy_rate)
 
-    factors = {
-        "occupancy_rate": location.occupancy_rate or 0.8,
-        "day_of_week": "Monday",  # Would be dynamic
-        "weather_impact": random.choice(["neutral", "positive", "negative"]),
-        "special_events": random.choice([None, "conference", "holiday"]),
-        "seasonality_factor": round(random.uniform(0.9, 1.1), 2)
-    }
-
-    # Adjust for factors
-    if factors["special_events"]:
-        base_demand = int(base_demand * 1.2)
-
-    p10 = max(1, base_demand - random.randint(2, 5))
-    p50 = base_demand
-    p90 = base_demand + random.randint(3, 7)
-
-    return DemandForecast(
-        product_id=product.id,
-        product_name=product.name,
+def generate_inventory_status(product_id: str, location_id: str) -> InventoryStatus:
+    """Generate current inventory status"""
+    return InventoryStatus(**inventory_status_row(product_id, location_id)._asdict())
+
+
+# Demand multiplier by day of week (Monday first) for each location type
+FORECAST_WEEKDAY_FACTORS = {
+    "hotel": (0.9, 0.9, 0.95, 1.0, 1.15, 1.25, 1.1),
+    "office": (1.1, 1.15, 1.15, 1.1, 0.95, 0.3, 0.25),
+    "airport": (1.05, 0.95, 0.95, 1.0, 1.15, 1.0, 1.1),
+    "hospital": (1.05, 1.05, 1.0, 1.0, 1.0, 0.95, 0.95),
+    "retail": (0.9, 0.9, 0.95, 1.0, 1.1, 1.25, 1.15),
+}
+FORECAST_WEATHER_FACTORS = {"neutral": 1.0, "positive": 1.05, "negative": 0.9}
+MAX_FORECAST_HORIZON_DAYS = 90
+
+
+def generate_forecast_matrix(location_id: str, start_date: str, horizon_days: int = 7,
+                             product_ids: Optional[List[str]] = None) -> ForecastMatrix:
+    """Demand forecast for every product (or `product_ids`) at a location for
+    `horizon_days` days from `start_date`, computed as SKU x day arrays.
+
+    Baseline demand is the 28-day sales velocity where sales have been ingested,
+    otherwise a draw fixed per SKU-location and scaled by occupancy. Each day
+    scales the baseline by its day of week, weather, events and seasonality, and
+    the interval widens with lead time. Draws are seeded per (location, date), so
+    a date forecasts the same on its own as within a longer horizon.
+    """
+    location = LOCATIONS_BY_ID.get(location_id, LOCATIONS[0])
+    start = datetime.strptime(start_date, "%Y-%m-%d")
+    days = [start + timedelta(days=d) for d in range(horizon_days)]
+    rows = (np.arange(len(PRODUCTS)) if product_ids is None
+            else np.array([INVENTORY.product_index[pid] for pid in product_ids], dtype=np.intp))
+    occupancy = location.occupancy_rate or 0.8
+
+    drawn = np.random.default_rng(random.Random(f"{INVENTORY_SEED}:{location.id}").getrandbits(64))
+    base = drawn.integers(5, 21, len(PRODUCTS)) * (location.occupancy_rate or 1.0)
+    velocity = INVENTORY.location_velocity(INVENTORY.location_index[location.id])
+    base = np.where(np.isnan(velocity), base, velocity)[rows]
+
+    weekday_factors = FORECAST_WEEKDAY_FACTORS.get(location.type, (1.0,) * 7)
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    factors = {"day_of_week": [], "weather_impact": [], "special_events": [], "seasonality_factor": []}
+    multipliers = np.empty(horizon_days)
+    low = np.empty((len(rows), horizon_days))
+    high = np.empty((len(rows), horizon_days))
+    for d, day in enumerate(days):
+        rng = random.Random(f"{INVENTORY_SEED}:forecast:{location.id}:{day:%Y-%m-%d}")
+        weather = rng.choice(["neutral", "positive", "negative"])
+        event = rng.choice([None, "conference", "holiday"])
+        seasonality = round(rng.uniform(0.9, 1.1), 2)
+        factors["day_of_week"].append(day.strftime("%A"))
+        factors["weather_impact"].append(weather)
+        factors["special_events"].append(event)
+        factors["seasonality_factor"].append(seasonality)
+        multipliers[d] = weekday_factors[day.weekday()] * FORECAST_WEATHER_FACTORS[weather] * seasonality * (1.2 if event else 1.0)
+
+        # Spreads are drawn for every product, so a product's interval does not
+        # depend on which others were asked for
+        spread = np.random.default_rng(rng.getrandbits(64))
+        widen = np.sqrt(max(1, (day - today).days))
+        low[:, d] = spread.integers(2, 6, len(PRODUCTS))[rows] * widen
+        high[:, d] = spread.integers(3, 8, len(PRODUCTS))[rows] * widen
+
+    p50 = np.rint(base[:, None] * multipliers).astype(np.int64)
+    # At least one unit at P10 unless the median is zero
+    p10 = np.maximum(p50 - np.rint(low).astype(np.int64), np.minimum(p50, 1))
+    p90 = p50 + np.rint(high).astype(np.int64)
+
+    return ForecastMatrix(
         location_id=location.id,
         location_name=location.name,
-        forecast_date=forecast_date,
-        forecast=ForecastConfidence(p10=p10, p50=p50, p90=p90),
+        start_date=start_date,
+        horizon_days=horizon_days,
+        dates=[day.strftime("%Y-%m-%d") for day in days],
+        product_ids=[PRODUCTS[i].id for i in rows.tolist()],
+        product_names=[PRODUCTS[i].name for i in rows.tolist()],
+        p10=p10.tolist(),
+        p50=p50.tolist(),
+        p90=p90.tolist(),
+        occupancy_rate=occupancy,
         factors=factors,
-        model_version="v2.1-lstm"
     )
 
 
+def forecast_rows(matrix: ForecastMatrix) -> List[DemandForecast]:
+    """One DemandForecast per product and day of a forecast matrix, day by day"""
+    rows = []
+    for d, date in enumerate(matrix.dates):
+        factors = {"occupancy_rate": matrix.occupancy_rate}
+        factors.update((name, values[d]) for name, values in matrix.factors.items())
+        for k, product_id in enumerate(matrix.product_ids):
+            rows.append(DemandForecast(
+                product_id=product_id,
+                product_name=matrix.product_names[k],
+                location_id=matrix.location_id,
+                location_name=matrix.location_name,
+                forecast_date=date,
+                forecast=ForecastConfidence(p10=matrix.p10[k][d], p50=matrix.p50[k][d], p90=matrix.p90[k][d]),
+                factors=factors,
+                model_version=matrix.model_version,
+            ))
+    return rows
+
+
+def generate_demand_forecast(product_id: str, location_id: str, forecast_date: str) -> DemandForecast:
+    """Generate demand forecast for a product"""
+    product = PRODUCTS_BY_ID.get(product_id, PRODUCTS[0])
+    return forecast_rows(generate_forecast_matrix(location_id, forecast_date, 1, [product.id]))[0]
+
+
 def generate_analytics_summary() -> AnalyticsSummary:
     """Generate overall analytics summary"""
     return AnalyticsSummary(
@@ -561,10 +692,11 @@ def generate_analytics_summary() -> AnalyticsSummary:
     )
 
 
-def generate_product_performance(product_id: str, location_id: str = None) -> ProductPerformance:
-    """Generate product performance analytics"""
-    product = next((p for p in PRODUCTS if p.id == product_id), PRODUCTS[0])
-    location = next((loc for loc in LOCATIONS if loc.id == location_id), None) if location_id else None
+def product_performance_row(product_id: str, location_id: str = None,
+                            tier: str = None) -> Optional[PerformanceRow]:
+    """Product performance analytics as an engine row, or None if `tier` is given and differs"""
+    product = PRODUCTS_BY_ID.get(product_id, PRODUCTS[0])
+    location = LOCATIONS_BY_ID.get(location_id) if location_id else None
 
     # Base metrics vary by category
     category_multipliers = {
@@ -577,28 +709,31 @@ def generate_product_performance(product_id: str, location_id: str = None) -> Pr
 
     multiplier = category_multipliers.get(product.category, {"velocity": 1.0, "margin": 0.35})
 
-    # Generate realistic sales data
-    base_daily = random.uniform(3, 12) * multiplier["velocity"]
-    if location and location.occupancy_rate:
-        base_daily *= location.occupancy_rate
+    # Draws are seeded per SKU-location so a key's metrics only change when its
+    # sales do, which keeps the leaderboards consistent between requests
+    rng = random.Random(f"{INVENTORY_SEED}:{product.id}:{location.id if location else '*'}")
 
-    units_7d = int(base_daily * 7 * random.uniform(0.85, 1.15))
-    units_30d = int(base_daily * 30 * random.uniform(0.9, 1.1))
+    # Use ingested sales history when there is any, otherwise a baseline
+    base_daily = rng.uniform(3, 12) * multiplier["velocity"]
+    velocity = INVENTORY.daily_velocity(product.id, location.id if location else None)
+    if velocity is not None:
+        base_daily = velocity
+    elif location and location.occupancy_rate:
+        base_daily *= location.occupancy_rate
 
-    revenue_7d = round(units_7d * product.price, 2)
-    revenue_30d = round(units_30d * product.price, 2)
+    # All draws up front, in a fixed order, so a row's values don't depend on the filter
+    units_7d_factor = rng.uniform(0.85, 1.15)
+    units_30d = int(base_daily * 30 * rng.uniform(0.9, 1.1))
+    current_stock = rng.randint(5, 30)
+    avg_inventory = rng.randint(15, 40)
+    gross_margin = round(multiplier["margin"] * 100 * rng.uniform(0.9, 1.1), 1)
 
+    # Score and tier first: rows outside the requested tier stop here
     daily_velocity = round(units_30d / 30, 2)
-    current_stock = random.randint(5, 30)
-    days_of_supply = round(current_stock / max(daily_velocity, 0.1), 1)
 
     # Turnover = units sold / average inventory
-    avg_inventory = random.randint(15, 40)
     turnover_rate = round((units_30d / max(avg_inventory, 1)), 2)
-
-    # Performance scoring
     sell_through = min(100, round((units_30d / max(avg_inventory * 30 / 7, 1)) * 100, 1))
-    gross_margin = round(multiplier["margin"] * 100 * random.uniform(0.9, 1.1), 1)
 
     # Calculate performance score (weighted: velocity 30%, margin 25%, turnover 25%, sell-through 20%)
     velocity_score = min(100, (daily_velocity / 10) * 100)
@@ -613,15 +748,22 @@ def generate_product_performance(product_id: str, location_id: str = None) -> Pr
 
     # Determine tier
     if performance_score >= 75:
-        tier = "top_performer"
+        performance_tier = "top_performer"
     elif performance_score >= 50:
-        tier = "average"
+        performance_tier = "average"
     elif performance_score >= 30:
-        tier = "underperformer"
+        performance_tier = "underperformer"
     else:
-        tier = "slow_mover"
+        performance_tier = "slow_mover"
+    if tier and performance_tier != tier:
+        return None
 
-    return ProductPerformance(
+    units_7d = int(base_daily * 7 * units_7d_factor)
+    revenue_7d = round(units_7d * product.price, 2)
+    revenue_30d = round(units_30d * product.price, 2)
+    days_of_supply = round(current_stock / max(daily_velocity, 0.1), 1)
+
+    return PerformanceRow(
         product_id=product.id,
         product_name=product.name,
         category=product.category,
@@ -637,18 +779,48 @@ def generate_product_performance(product_id: str, location_id: str = None) -> Pr
         sell_through_rate=sell_through,
         gross_margin=gross_margin,
         performance_score=performance_score,
-        performance_tier=tier
+        performance_tier=performance_tier
     )
 
 
-def generate_trend_data(product_id: str, location_id: str = None) -> TrendData:
-    """Generate trend detection data for a product"""
-    product = next((p for p in PRODUCTS if p.id == product_id), PRODUCTS[0])
-    location = next((loc for loc in LOCATIONS if loc.id == location_id), None) if location_id else None
+LEADERBOARDS = PerformanceLeaderboards(
+    lambda product_id, location_id: product_performance_row(product_id, location_id).performance_score,
+    lambda: INVENTORY.day,
+)
+LEADERBOARDS.reset([p.id for p in PRODUCTS], [loc.id for loc in LOCATIONS])
+
+
+def generate_product_performance(product_id: str, location_id: str = None) -> ProductPerformance:
+    """Generate product performance analytics"""
+    return ProductPerformance(**product_performance_row(product_id, location_id)._asdict())
+
+
+def trend_row(product_id: str, location_id: str = None, direction: str = None,
+              anomaly: bool = None, severity: str = None) -> Optional[TrendRow]:
+    """Trend detection data for a product as an engine row.
+
+    The filters (trend direction, has anomaly, anomaly severity) are checked as
+    soon as the value they test is known; a row that can't match returns None
+    without drawing the remaining fields.
+    """
+    product = PRODUCTS_BY_ID.get(product_id, PRODUCTS[0])
+    location = LOCATIONS_BY_ID.get(location_id) if location_id else None
+
+    # Use ingested sales history when there is any for this SKU-location
+    sales = INVENTORY.sales_metrics(product.id, location.id) if location else None
 
     # Generate trend direction and strength
     trend_roll = random.random()
-    if trend_roll < 0.3:
+    if sales:
+        wow_change = sales["week_over_week_change"]
+        mom_change = sales["month_over_month_change"]
+        if wow_change > 5:
+            trend_direction = "increasing"
+        elif wow_change < -5:
+            trend_direction = "decreasing"
+        else:
+            trend_direction = "stable"
+    elif trend_roll < 0.3:
         trend_direction = "increasing"
         wow_change = random.uniform(5, 25)
         mom_change = random.uniform(10, 40)
@@ -660,8 +832,10 @@ def generate_trend_data(product_id: str, location_id: str = None) -> TrendData:
         trend_direction = "stable"
         wow_change = random.uniform(-5, 5)
         mom_change = random.uniform(-8, 8)
+    if direction and trend_direction != direction:
+        return None
 
-    trend_strength = abs(wow_change) / 30  # Normalize to 0-1
+    trend_strength = min(abs(wow_change) / 30, 1.0)  # Normalize to 0-1
 
     # Seasonality
     month = datetime.now().month
@@ -686,7 +860,15 @@ def generate_trend_data(product_id: str, location_id: str = None) -> TrendData:
     anomaly_severity = None
     anomaly_description = None
 
-    if has_anomaly:
+    if sales:
+        deviation = sales["demand_deviation_pct"]
+        has_anomaly = abs(deviation) >= 50
+        if has_anomaly:
+            anomaly_type = "spike" if deviation > 0 else "drop"
+            anomaly_severity = "high" if abs(deviation) >= 150 else "medium" if abs(deviation) >= 80 else "low"
+            direction = "above" if deviation > 0 else "below"
+            anomaly_description = f"Today's sales {abs(deviation):.0f}% {direction} the 7-day average"
+    elif has_anomaly:
         anomaly_type = random.choice(["spike", "drop", "unusual_pattern"])
         anomaly_severity = random.choice(["low", "medium", "high"])
 
@@ -696,8 +878,12 @@ def generate_trend_data(product_id: str, location_id: str = None) -> TrendData:
             anomaly_description = f"Unexpected demand drop - {random.randint(30, 60)}% below normal"
         else:
             anomaly_description = "Irregular sales pattern detected over the past 48 hours"
+    if anomaly is not None and has_anomaly != anomaly:
+        return None
+    if severity and anomaly_severity != severity:
+        return None
 
-    return TrendData(
+    return TrendRow(
         product_id=product.id,
         product_name=product.name,
         location_id=location.id if location else None,
@@ -716,210 +902,265 @@ def generate_trend_data(product_id: str, location_id: str = None) -> TrendData:
     )
 
 
-def generate_alerts(location_id: str = None, alert_type: str = None, severity: str = None) -> AlertsSummary:
-    """Generate system alerts"""
-    alerts = []
-    now = datetime.now()
+def trend_rows(pairs: List[tuple], direction: str = None, anomaly: bool = None,
+               severity: str = None) -> List[Optional[TrendRow]]:
+    """trend_row for each (product_id, location_id) pair (a fanout.LocationPool task)"""
+    return [trend_row(product_id, location_id, direction, anomaly, severity) for product_id, location_id in pairs]
 
-    # Pre-defined realistic alerts
-    alert_templates = [
-        # Stockout risks
-        {
-            "alert_type": "stockout_risk",
-            "severity": "critical",
-            "title": "Critical: Coca-Cola 20oz stockout imminent",
-            "description": "Stock will be depleted within 4 hours at current sales velocity. Immediate restocking required.",
-            "product_id": "prod_coke_20oz",
-            "product_name": "Coca-Cola 20oz",
-            "location_id": "loc_hotel_dena",
-            "location_name": "Hotel Dena",
-            "metric_value": 2,
-            "threshold_value": 5,
-            "recommended_action": "Add 24 units to today's pick list immediately"
-        },
-        {
-            "alert_type": "stockout_risk",
-            "severity": "critical",
-            "title": "Critical: Red Bull Energy at 0 stock",
-            "description": "Product is currently out of stock. Lost sales estimated at $47/hour.",
-            "product_id": "prod_red_bull_energy",
-            "product_name": "Red Bull Energy",
-            "location_id": "loc_airport_terminal_b",
-            "location_name": "Airport Terminal B",
-            "metric_value": 0,
-            "threshold_value": 8,
-            "recommended_action": "Emergency restock - add 36 units"
-        },
-        {
-            "alert_type": "stockout_risk",
-            "severity": "warning",
-            "title": "Low stock: Snickers Bar",
-            "description": "Stock level at 3 units, below minimum threshold of 10. Estimated 6 hours until stockout.",
-            "product_id": "prod_snickers",
-            "product_name": "Snickers Bar",
-            "location_id": "loc_tech_campus",
-            "location_name": "Tech Campus",
-            "metric_value": 3,
-            "threshold_value": 10,
-            "recommended_action": "Include in next scheduled pick list with 20 units"
-        },
-        # Overstock alerts
-        {
-            "alert_type": "overstock",
-            "severity": "warning",
-            "title": "Overstock: Greek Yogurt approaching expiration",
-            "description": "28 units in stock, only 5 units sold in past 7 days. Product expires in 4 days.",
-            "product_id": "prod_yogurt_greek",
-            "product_name": "Chobani Greek Yogurt 5.3oz",
-            "location_id": "loc_tech_campus_austin",
-            "location_name": "TechCorp Campus - Austin",
-            "metric_value": 28,
-            "threshold_value": 15,
-            "recommended_action": "Consider markdown pricing or transfer to higher-velocity location"
-        },
-        {
-            "alert_type": "overstock",
-            "severity": "info",
-            "title": "Excess inventory: Dasani Water",
-            "description": "Stock level 45 units, 15 above optimal. 12 days of supply at current velocity.",
-            "product_id": "prod_water_bottle",
-            "product_name": "Dasani Water 16.9oz",
-            "location_id": "loc_hilton_chicago",
-            "location_name": "Hilton Chicago O'Hare Airport",
-            "metric_value": 45,
-            "threshold_value": 30,
-            "recommended_action": "Skip this product in next 2 restocking cycles"
-        },
-        # Anomaly alerts
-        {
-            "alert_type": "anomaly",
-            "severity": "warning",
-            "title": "Demand spike: Monster Energy +85%",
-            "description": "Unusual demand increase detected. Sales 85% above 7-day average, possibly due to nearby event.",
-            "product_id": "prod_monster_energy",
-            "product_name": "Monster Energy",
-            "location_id": "loc_usc_campus",
-            "location_name": "USC Campus Center",
-            "metric_value": 85,
-            "threshold_value": 50,
-            "recommended_action": "Increase pick quantity by 50% for next 3 days"
-        },
-        {
-            "alert_type": "anomaly",
-            "severity": "info",
-            "title": "Sales pattern change: Coffee sales shifting earlier",
-            "description": "Peak coffee sales shifted from 9-10 AM to 7-8 AM over past week.",
-            "product_id": "prod_coffee_to_go_premium",
-            "product_name": "Coffee To-Go Premium",
-            "location_id": "loc_marriott_nyc",
-            "location_name": "Marriott Marquis - Times Square",
-            "metric_value": None,
-            "threshold_value": None,
-            "recommended_action": "Adjust restocking schedule to ensure morning availability"
-        },
-        # Trend alerts
-        {
-            "alert_type": "trend_change",
-            "severity": "info",
-            "title": "Upward trend: Healthy Protein Bar +22% WoW",
-            "description": "Consistent demand increase over past 3 weeks. Fitness season driving sales.",
-            "product_id": "prod_healthy_protein_bar",
-            "product_name": "Healthy Protein Bar",
-            "location_id": "loc_medical_center",
-            "location_name": "Medical Center",
-            "metric_value": 22,
-            "threshold_value": 15,
-            "recommended_action": "Increase baseline stock level from 15 to 22 units"
-        },
-        {
-            "alert_type": "trend_change",
-            "severity": "warning",
-            "title": "Declining trend: Pringles -18% MoM",
-            "description": "Month-over-month decline in sales. May indicate preference shift or quality issue.",
-            "product_id": "prod_pringles",
-            "product_name": "Pringles Original 5.5oz",
-            "location_id": "loc_downtown_plaza",
-            "location_name": "Downtown Plaza",
-            "metric_value": -18,
-            "threshold_value": -15,
-            "recommended_action": "Review customer feedback and consider product placement optimization"
-        },
-        # Performance alerts
-        {
-            "alert_type": "performance",
-            "severity": "warning",
-            "title": "Underperforming: Fresh Fruit Cup",
-            "description": "Performance score 28/100. Low velocity (0.8/day) and high spoilage rate (12%).",
-            "product_id": "prod_fruit_cup",
-            "product_name": "Fresh Fruit Cup 8oz",
-            "location_id": "loc_hilton_chicago",
-            "location_name": "Hilton Chicago O'Hare Airport",
-            "metric_value": 28,
-            "threshold_value": 40,
-            "recommended_action": "Reduce stock levels or discontinue at this location"
-        },
-        {
-            "alert_type": "performance",
-            "severity": "info",
-            "title": "Top performer: Starbucks Frappuccino",
-            "description": "Performance score 92/100. Highest revenue per square foot in beverage category.",
-            "product_id": "prod_starbucks_frappuccino",
-            "product_name": "Starbucks Frappuccino",
-            "location_id": "loc_westin_sf",
-            "location_name": "Westin St. Francis - San Francisco",
-            "metric_value": 92,
-            "threshold_value": 80,
-            "recommended_action": "Consider expanding facings and ensuring consistent availability"
-        },
-    ]
 
-    # Filter and create alerts
-    for idx, template in enumerate(alert_templates):
-        # Apply filters
-        if location_id and template["location_id"] != location_id:
-            continue
-        if alert_type and template["alert_type"] != alert_type:
-            continue
-        if severity and template["severity"] != severity:
-            continue
-
-        # Generate unique ID
-        alert_id = hashlib.md5(f"{template['title']}_{template['location_id']}".encode()).hexdigest()[:12]
-
-        alerts.append(Alert(
-            id=f"alert_{alert_id}",
-            alert_type=template["alert_type"],
-            severity=template["severity"],
-            title=template["title"],
-            description=template["description"],
-            product_id=template["product_id"],
-            product_name=template["product_name"],
-            location_id=template["location_id"],
-            location_name=template["location_name"],
-            metric_value=template["metric_value"],
-            threshold_value=template["threshold_value"],
-            recommended_action=template["recommended_action"],
-            created_at=now - timedelta(minutes=random.randint(5, 180)),
-            is_acknowledged=False
+def generate_trend_data(product_id: str, location_id: str = None) -> TrendData:
+    """Generate trend detection data for a product"""
+    return TrendData(**trend_row(product_id, location_id)._asdict())
+
+
+def transfer_plan(product_id: str = None, location_id: str = None, limit: int = None) -> dict:
+    """Recommended stock transfers, best net benefit first.
+
+    Matching runs network-wide (see transfers.py); `location_id` keeps transfers
+    into or out of that location, `product_id` only matches that product. Totals
+    cover every match; engine rows are built for the first `limit` only.
+    """
+    products = [PRODUCTS_BY_ID[product_id]] if product_id else PRODUCTS
+    rows = slice(None)
+    if product_id:
+        i = INVENTORY.product_index[product_id]
+        rows = slice(i, i + 1)
+    stock, min_stock, max_stock = INVENTORY.stock[rows], INVENTORY.min_stock[rows], INVENTORY.max_stock[rows]
+
+    plan = recommend_transfers(
+        stock, min_stock, max_stock,
+        np.array([p.price for p in products], dtype=np.float64),
+        region_codes([loc.address for loc in LOCATIONS]),
+    )
+    if location_id:
+        j = INVENTORY.location_index[location_id]
+        keep = (plan["source"] == j) | (plan["target"] == j)
+        plan = {name: values[keep] for name, values in plan.items()}
+
+    total = len(plan["product"])
+    transfers = []
+    for k in range(total if limit is None else min(limit, total)):
+        i, source, target = int(plan["product"][k]), int(plan["source"][k]), int(plan["target"][k])
+        product, source_loc, target_loc = products[i], LOCATIONS[source], LOCATIONS[target]
+        transfers.append(TransferRow(
+            product_id=product.id,
+            product_name=product.name,
+            from_location_id=source_loc.id,
+            from_location_name=source_loc.name,
+            to_location_id=target_loc.id,
+            to_location_name=target_loc.name,
+            quantity=int(plan["quantity"][k]),
+            from_stock=int(stock[i, source]),
+            to_stock=int(stock[i, target]),
+            avoided_stockout_cost=round(float(plan["avoided_cost"][k]), 2),
+            transfer_cost=round(float(plan["transfer_cost"][k]), 2),
+            net_benefit=round(float(plan["net_benefit"][k]), 2),
         ))
+    return {
+        "total_transfers": total,
+        "total_units": int(plan["quantity"].sum()),
+        "total_net_benefit": round(float(plan["net_benefit"].sum()), 2),
+        "transfers": transfers,
+    }
 
-    # Sort by severity (critical first)
-    severity_order = {"critical": 0, "warning": 1, "info": 2}
-    alerts.sort(key=lambda x: severity_order[x.severity])
-
-    # Calculate summary stats
-    critical_count = sum(1 for a in alerts if a.severity == "critical")
-    warning_count = sum(1 for a in alerts if a.severity == "warning")
-    info_count = sum(1 for a in alerts if a.severity == "info")
-    locations_affected = len(set(a.location_id for a in alerts if a.location_id))
-    products_affected = len(set(a.product_id for a in alerts if a.product_id))
-
-    return AlertsSummary(
-        total_alerts=len(alerts),
-        critical_count=critical_count,
-        warning_count=warning_count,
-        info_count=info_count,
-        alerts=alerts,
-        locations_affected=locations_affected,
-        products_affected=products_affected
+
+# Curated alerts shown in the demo; seeded into the alert engine once
+ALERT_SEEDS = [
+    # Stockout risks
+    {
+        "alert_type": "stockout_risk",
+        "severity": "critical",
+        "title": "Critical: Coca-Cola 20oz stockout imminent",
+        "description": "Stock will be depleted within 4 hours at current sales velocity. Immediate restocking required.",
+        "product_id": "prod_coke_20oz",
+        "product_name": "Coca-Cola 20oz",
+        "location_id": "loc_hotel_dena",
+        "location_name": "Hotel Dena",
+        "metric_value": 2,
+        "threshold_value": 5,
+        "recommended_action": "Add 24 units to today's pick list immediately"
+    },
+    {
+        "alert_type": "stockout_risk",
+        "severity": "critical",
+        "title": "Critical: Red Bull Energy at 0 stock",
+        "description": "Product is currently out of stock. Lost sales estimated at $47/hour.",
+        "product_id": "prod_red_bull_energy",
+        "product_name": "Red Bull Energy",
+        "location_id": "loc_airport_terminal_b",
+        "location_name": "Airport Terminal B",
+        "metric_value": 0,
+        "threshold_value": 8,
+        "recommended_action": "Emergency restock - add 36 units"
+    },
+    {
+        "alert_type": "stockout_risk",
+        "severity": "warning",
+        "title": "Low stock: Snickers Bar",
+        "description": "Stock level at 3 units, below minimum threshold of 10. Estimated 6 hours until stockout.",
+        "product_id": "prod_snickers",
+        "product_name": "Snickers Bar",
+        "location_id": "loc_tech_campus",
+        "location_name": "Tech Campus",
+        "metric_value": 3,
+        "threshold_value": 10,
+        "recommended_action": "Include in next scheduled pick list with 20 units"
+    },
+    # Overstock alerts
+    {
+        "alert_type": "overstock",
+        "severity": "warning",
+        "title": "Overstock: Greek Yogurt approaching expiration",
+        "description": "28 units in stock, only 5 units sold in past 7 days. Product expires in 4 days.",
+        "product_id": "prod_yogurt_greek",
+        "product_name": "Chobani Greek Yogurt 5.3oz",
+        "location_id": "loc_tech_campus_austin",
+        "location_name": "TechCorp Campus - Austin",
+        "metric_value": 28,
+        "threshold_value": 15,
+        "recommended_action": "Consider markdown pricing or transfer to higher-velocity location"
+    },
+    {
+        "alert_type": "overstock",
+        "severity": "info",
+        "title": "Excess inventory: Dasani Water",
+        "description": "Stock level 45 units, 15 above optimal. 12 days of supply at current velocity.",
+        "product_id": "prod_water_bottle",
+        "product_name": "Dasani Water 16.9oz",
+        "location_id": "loc_hilton_chicago",
+        "location_name": "Hilton Chicago O'Hare Airport",
+        "metric_value": 45,
+        "threshold_value": 30,
+        "recommended_action": "Skip this product in next 2 restocking cycles"
+    },
+    # Anomaly alerts
+    {
+        "alert_type": "anomaly",
+        "severity": "warning",
+        "title": "Demand spike: Monster Energy +85%",
+        "description": "Unusual demand increase detected. Sales 85% above 7-day average, possibly due to nearby event.",
+        "product_id": "prod_monster_energy",
+        "product_name": "Monster Energy",
+        "location_id": "loc_usc_campus",
+        "location_name": "USC Campus Center",
+        "metric_value": 85,
+        "threshold_value": 50,
+        "recommended_action": "Increase pick quantity by 50% for next 3 days"
+    },
+    {
+        "alert_type": "anomaly",
+        "severity": "info",
+        "title": "Sales pattern change: Coffee sales shifting earlier",
+        "description": "Peak coffee sales shifted from 9-10 AM to 7-8 AM over past week.",
+        "product_id": "prod_coffee_to_go_premium",
+        "product_name": "Coffee To-Go Premium",
+        "location_id": "loc_marriott_nyc",
+        "location_name": "Marriott Marquis - Times Square",
+        "metric_value": None,
+        "threshold_value": None,
+        "recommended_action": "Adjust restocking schedule to ensure morning availability"
+    },
+    # Trend alerts
+    {
+        "alert_type": "trend_change",
+        "severity": "info",
+        "title": "Upward trend: Healthy Protein Bar +22% WoW",
+        "description": "Consistent demand increase over past 3 weeks. Fitness season driving sales.",
+        "product_id": "prod_healthy_protein_bar",
+        "product_name": "Healthy Protein Bar",
+        "location_id": "loc_medical_center",
+        "location_name": "Medical Center",
+        "metric_value": 22,
+        "threshold_value": 15,
+        "recommended_action": "Increase baseline stock level from 15 to 22 units"
+    },
+    {
+        "alert_type": "trend_change",
+        "severity": "warning",
+        "title": "Declining trend: Pringles -18% MoM",
+        "description": "Month-over-month decline in sales. May indicate preference shift or quality issue.",
+        "product_id": "prod_pringles",
+        "product_name": "Pringles Original 5.5oz",
+        "location_id": "loc_downtown_plaza",
+        "location_name": "Downtown Plaza",
+        "metric_value": -18,
+        "threshold_value": -15,
+        "recommended_action": "Review customer feedback and consider product placement optimization"
+    },
+    # Performance alerts
+    {
+        "alert_type": "performance",
+        "severity": "warning",
+        "title": "Underperforming: Fresh Fruit Cup",
+        "description": "Performance score 28/100. Low velocity (0.8/day) and high spoilage rate (12%).",
+        "product_id": "prod_fruit_cup",
+        "product_name": "Fresh Fruit Cup 8oz",
+        "location_id": "loc_hilton_chicago",
+        "location_name": "Hilton Chicago O'Hare Airport",
+        "metric_value": 28,
+        "threshold_value": 40,
+        "recommended_action": "Reduce stock levels or discontinue at this location"
+    },
+    {
+        "alert_type": "performance",
+        "severity": "info",
+        "title": "Top performer: Starbucks Frappuccino",
+        "description": "Performance score 92/100. Highest revenue per square foot in beverage category.",
+        "product_id": "prod_starbucks_frappuccino",
+        "product_name": "Starbucks Frappuccino",
+        "location_id": "loc_westin_sf",
+        "location_name": "Westin St. Francis - San Francisco",
+        "metric_value": 92,
+        "threshold_value": 80,
+        "recommended_action": "Consider expanding facings and ensuring consistent availability"
+    },
+]
+
+
+def _build_alert_engine() -> AlertEngine:
+    """Compile the alert rules and seed the index with the curated alerts"""
+    engine = AlertEngine(
+        ALERT_RULES,
+        product_names={p.id: p.name for p in PRODUCTS},
+        location_names={loc.id: loc.name for loc in LOCATIONS},
     )
+    now = datetime.now()
+    for seed in ALERT_SEEDS:
+        engine.seed(Alert(
+            id=alert_id_for(seed["title"], seed["location_id"]),
+            created_at=now - timedelta(minutes=random.randint(5, 180)),
+            is_acknowledged=False,
+            **seed
+        ))
+    return engine
+
+
+ALERT_ENGINE = _build_alert_engine()
+
+
+def generate_alerts(location_id: str = None, alert_type: str = None, severity: str = None) -> AlertsSummary:
+    """Get active system alerts from the alert index"""
+    return ALERT_ENGINE.summary(location_id, alert_type, severity)
+
+
+def load_catalog(products: List[Product], locations: List[Location]):
+    """Swap in a different catalog (benchmarks, shards), rebuilding derived state in place.
+
+    PRODUCTS, LOCATIONS and the state objects keep their identity, so modules
+    that imported them directly see the new catalog.
+    """
+    PRODUCTS[:] = products
+    LOCATIONS[:] = locations
+    PRODUCTS_BY_ID.clear()
+    PRODUCTS_BY_ID.update({p.id: p for p in PRODUCTS})
+    PRODUCT_SEARCH.reset(PRODUCTS)
+    LOCATIONS_BY_ID.clear()
+    LOCATIONS_BY_ID.update({loc.id: loc for loc in LOCATIONS})
+    INVENTORY.reset([p.id for p in PRODUCTS], [loc.id for loc in LOCATIONS], seed=INVENTORY_SEED)
+    LEADERBOARDS.reset([p.id for p in PRODUCTS], [loc.id for loc in LOCATIONS])
+    PICK_LISTS.reset([p.id for p in PRODUCTS], [loc.id for loc in LOCATIONS])
+    ALERT_ENGINE.product_names.clear()
+    ALERT_ENGINE.product_names.update({p.id: p.name for p in PRODUCTS})
+    ALERT_ENGINE.location_names.clear()
+    ALERT_ENGINE.location_names.update({loc.id: loc.name for loc in LOCATIONS})
+    ALERT_ENGINE.retain_locations(LOCATIONS_BY_ID)
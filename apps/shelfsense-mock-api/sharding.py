@@ -0,0 +1,49 @@
+"""Partitioning of the location space across API instances (see router.py).
+
+Each shard is an ordinary API process started with SHARD=<index>/<count>: it
+loads only its locations, so its inventory matrix, alert index and every
+location-scoped computation cover that slice alone. The router and all
+shards derive the same assignment from the catalog, with no coordination.
+
+- "region" (default) keeps each city on one shard, so a region's locations,
+  and the transfers between them, stay together. Regions are placed largest
+  first on the shard with the fewest locations so far.
+- "hash" spreads locations by a stable hash of location_id, for an even split
+  when one region dominates.
+"""
+from typing import Dict, List, Tuple
+import zlib
+
+from models import Location
+from transfers import region_name
+
+STRATEGIES = ("region", "hash")
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """"<index>/<count>" -> (index, count)"""
+    index, _, count = value.partition("/")
+    index, count = int(index), int(count)
+    if not 0 <= index < count:
+        raise ValueError(f"shard index {index} is outside 0..{count - 1}")
+    return index, count
+
+
+def assign_shards(locations: List[Location], count: int, strategy: str = "region") -> Dict[str, int]:
+    """Shard index for every location id"""
+    if strategy == "hash":
+        return {loc.id: zlib.crc32(loc.id.encode()) % count for loc in locations}
+    if strategy != "region":
+        raise ValueError(f"unknown shard strategy {strategy!r}, expected one of {STRATEGIES}")
+
+    regions: Dict[str, List[str]] = {}
+    for loc in locations:
+        regions.setdefault(region_name(loc.address), []).append(loc.id)
+    loads = [0] * count
+    assignment = {}
+    for region in sorted(regions, key=lambda r: (-len(regions[r]), r)):
+        shard = loads.index(min(loads))
+        loads[shard] += len(regions[region])
+        for location_id in regions[region]:
+            assignment[location_id] = shard
+    return assignment
@@ -0,0 +1,183 @@
+"""Inventory arrays shared by several worker processes through one memory-mapped file.
+
+With `WEB_CONCURRENCY` > 1, uvicorn forks N workers, and each imports main.py.
+Without sharing, each worker would hold its own copy of the inventory matrix
+and sales history, and would see only the events it ingested itself. Here the
+arrays live in a single file that every worker maps, so the page cache holds
+one copy no matter how many workers run:
+
+- The first worker to start restores state as usual (snapshot, then log replay),
+  copies it into the file and marks it ready. Later workers attach to it.
+- Writes (ingestion, snapshots) take an exclusive file lock. Reads take no lock.
+- Each ingested batch stamps the SKU-locations it touched with its log
+  sequence. Every worker polls those stamps to bring its own alert index up to
+  date. Only the changed keys are re-evaluated, never the whole matrix.
+- One worker holds the leader lock and writes periodic snapshots. If it exits,
+  another worker takes over at its next snapshot interval.
+
+Alert acknowledgements, stream resume tokens and metrics stay per worker.
+"""
+from contextlib import contextmanager
+from typing import Dict, Optional
+import mmap
+import os
+
+import numpy as np
+
+from inventory_state import InventoryState
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-worker mode only
+    fcntl = None
+
+
+HEADER = np.dtype([
+    ("boot", "<i8"),          # supervisor pid the contents belong to
+    ("ready", "<i8"),
+    ("n_products", "<i8"),
+    ("n_locations", "<i8"),
+    ("day", "<i8"),
+    ("wal_sequence", "<i8"),
+])
+ALIGN = 64
+
+
+def _aligned(offset: int) -> int:
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+class SharedInventory:
+    """The memory map, its locks, and this worker's view of what has changed"""
+
+    def __init__(self, path: str, state: InventoryState):
+        if fcntl is None:
+            raise RuntimeError("Multi-worker mode needs fcntl file locks (Linux or macOS)")
+        self.path = path
+        self.state = state
+        # Workers forked by one uvicorn supervisor share its pid; anything else
+        # in the file is left over from a previous run
+        self.boot = os.getppid()
+        self.is_leader = False
+        self.seen_sequence = 0
+
+        layout = [("touched", np.dtype("<i8"), state.shape)]
+        layout += [(name, np.dtype(state.DTYPES[name]), state.array_shape(name)) for name in state.ARRAYS]
+        offset = _aligned(HEADER.itemsize)
+        self._layout = []
+        for name, dtype, shape in layout:
+            self._layout.append((name, dtype, shape, offset))
+            offset = _aligned(offset + dtype.itemsize * int(np.prod(shape)))
+        self.size = offset
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock_file = open(path + ".lock", "a+")
+        self._leader_file = open(path + ".leader", "a+")
+        self._mmap: Optional[mmap.mmap] = None
+
+    # ---------- locks ----------
+
+    @contextmanager
+    def locked(self):
+        """Exclusive lock for writers; also serializes startup across workers"""
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def try_lead(self) -> bool:
+        """Take the leader lock if no other worker holds it; kept until exit"""
+        if not self.is_leader:
+            try:
+                fcntl.flock(self._leader_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                self.is_leader = True
+            except BlockingIOError:
+                pass
+        return self.is_leader
+
+    # ---------- mapping ----------
+
+    def _map(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size != self.size:
+                os.ftruncate(fd, self.size)
+            self._mmap = mmap.mmap(fd, self.size)
+        finally:
+            os.close(fd)
+        self.header = np.ndarray((), dtype=HEADER, buffer=self._mmap)
+        self.arrays: Dict[str, np.ndarray] = {
+            name: np.ndarray(shape, dtype=dtype, buffer=self._mmap, offset=offset)
+            for name, dtype, shape, offset in self._layout
+        }
+        self.touched = self.arrays.pop("touched").reshape(-1)
+
+    def is_live(self) -> bool:
+        """Whether another worker of this server already published state (call under lock)"""
+        if self._mmap is None:
+            self._map()
+        h = self.header
+        return (
+            bool(h["ready"]) and int(h["boot"]) == self.boot
+            and (int(h["n_products"]), int(h["n_locations"])) == self.state.shape
+        )
+
+    def publish(self, wal_sequence: int):
+        """Copy this worker's freshly restored state into the map and switch to it"""
+        for name, target in self.arrays.items():
+            target[...] = getattr(self.state, name)
+        self.state.attach(self.arrays, self.state.day)
+        h = self.header
+        h["boot"] = self.boot
+        h["n_products"], h["n_locations"] = self.state.shape
+        self.commit(wal_sequence)
+        h["ready"] = 1
+        self._mmap.flush()
+
+    def attach(self):
+        self.state.attach(self.arrays, int(self.header["day"]))
+
+    def attach_reader(self):
+        """Map the file and read state from it, for processes that never write (see fanout.py)"""
+        if self._mmap is None:
+            self._map()
+        self.attach()
+
+    def reset_changes(self):
+        """Forget change stamps left by a previous run (call under lock, before replay)"""
+        if self._mmap is None:
+            self._map()
+        self.header["ready"] = 0
+        self.touched[:] = 0
+
+    # ---------- changes ----------
+
+    def mark(self, touched: np.ndarray, sequence: int):
+        """Stamp SKU-locations (flat indices) changed by an ingestion batch"""
+        if self._mmap is not None:
+            self.touched[touched] = sequence
+
+    def commit(self, wal_sequence: int):
+        """Publish the day and log position after a write (call under lock)"""
+        self.header["day"] = self.state.day
+        self.header["wal_sequence"] = wal_sequence
+        self.seen_sequence = wal_sequence
+
+    def commit_day(self):
+        """Publish a day change made without new events (call under lock)"""
+        self.header["day"] = self.state.day
+
+    def follow(self, ingestor) -> int:
+        """Catch up with batches other workers applied; returns SKU-locations re-evaluated"""
+        # Read the log position before the stamps: a batch stamped after this
+        # read carries a higher sequence and is picked up next time
+        sequence = int(self.header["wal_sequence"])
+        self.state.day = int(self.header["day"])
+        ingestor.wal.sequence = max(ingestor.wal.sequence, sequence)
+        if sequence <= self.seen_sequence:
+            return 0
+        changed = np.flatnonzero(self.touched > self.seen_sequence)
+        ingestor.refresh(changed)
+        self.seen_sequence = sequence
+        return len(changed)
@@ -0,0 +1,127 @@
+"""Persistent snapshots of inventory and alert state in SQLite"""
+from typing import Optional
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+from alert_engine import AlertEngine
+from inventory_state import InventoryState
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS arrays (
+    name TEXT PRIMARY KEY,
+    dtype TEXT NOT NULL,
+    shape TEXT NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class SnapshotStore:
+    """Point-in-time copy of in-memory state, loaded on startup to skip a cold rebuild.
+
+    Arrays are stored as raw blobs so loading is a single read plus
+    np.frombuffer per array; everything else is JSON. The database runs in
+    WAL mode so a snapshot write never blocks a concurrent reader. The
+    `wal_sequence` checkpoint records which ingestion batches are already
+    included, so only newer batches are replayed from the ingestion log.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.last_saved_at: Optional[float] = None
+        self.last_save_seconds: Optional[float] = None
+        self.last_load_seconds: Optional[float] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def save(self, inventory: InventoryState, alert_engine: AlertEngine, wal_sequence: int):
+        """Write a full snapshot in one transaction. Leaderboards and pick-list
+        plans are derived from inventory, so they are rebuilt on start instead."""
+        started = time.perf_counter()
+        meta = {
+            "wal_sequence": wal_sequence,
+            "saved_at": time.time(),
+            "product_ids": inventory.product_ids,
+            "location_ids": inventory.location_ids,
+            "day": inventory.day,
+            "alerts": alert_engine.export(),
+        }
+
+        conn = self._connect()
+        try:
+            with conn:
+                for name in InventoryState.ARRAYS:
+                    array = np.ascontiguousarray(getattr(inventory, name))
+                    conn.execute(
+                        "INSERT OR REPLACE INTO arrays (name, dtype, shape, data) VALUES (?, ?, ?, ?)",
+                        (name, array.dtype.str, json.dumps(array.shape), array.tobytes()),
+                    )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                    [(key, json.dumps(value)) for key, value in meta.items()],
+                )
+        finally:
+            conn.close()
+
+        self.last_saved_at = meta["saved_at"]
+        self.last_save_seconds = time.perf_counter() - started
+
+    def load(self, inventory: InventoryState, alert_engine: AlertEngine,
+             restore_inventory: bool = True) -> Optional[dict]:
+        """Restore state from the latest snapshot.
+
+        Returns the snapshot metadata (including `wal_sequence`),
+        or None if there is no usable snapshot for the current catalog. With
+        `restore_inventory=False` only the alert index is restored, for workers
+        whose inventory arrays are already shared (see shared_state.py).
+        """
+        if not os.path.exists(self.path):
+            return None
+
+        started = time.perf_counter()
+        conn = self._connect()
+        try:
+            meta = {key: json.loads(value) for key, value in conn.execute("SELECT key, value FROM meta")}
+            if not meta:
+                return None
+            if meta["product_ids"] != inventory.product_ids or meta["location_ids"] != inventory.location_ids:
+                # Catalog changed since the snapshot; positions no longer line up
+                return None
+
+            arrays = {
+                name: np.frombuffer(data, dtype=np.dtype(dtype)).reshape(json.loads(shape))
+                for name, dtype, shape, data in conn.execute("SELECT name, dtype, shape, data FROM arrays")
+            } if restore_inventory else None
+        finally:
+            conn.close()
+
+        if arrays is not None:
+            # frombuffer views are read-only; state arrays are updated in place
+            inventory.restore({name: arrays[name].copy() for name in InventoryState.ARRAYS}, meta["day"])
+        alert_engine.restore(meta["alerts"])
+
+        self.last_load_seconds = time.perf_counter() - started
+        return meta
+
+    def status(self) -> dict:
+        return {
+            "path": self.path,
+            "last_saved_at": self.last_saved_at,
+            "last_save_seconds": self.last_save_seconds,
+            "last_load_seconds": self.last_load_seconds,
+        }
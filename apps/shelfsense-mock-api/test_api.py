@@ -1,6 +1,17 @@
-"""Quick test script for ShelfSense Mock API"""
-import requests
+"""Quick test script for ShelfSense Mock API
+
+Runs in-process behavior checks of the API's modules, then smoke-tests the
+endpoints of a running API.
+"""
+import asyncio
+import json
+import os
 import sys
+import tempfile
+import zlib
+
+import numpy as np
+import requests
 
 
 def test_api(base_url="http://localhost:8000"):
@@ -12,8 +23,12 @@ def test_api(base_url="http://localhost:8000"):
         ("Root", f"{base_url}/"),
         ("Locations", f"{base_url}/api/locations"),
         ("Products", f"{base_url}/api/products"),
+        ("Product Search", f"{base_url}/api/products/search?q=red%20bull"),
         ("Pick List", f"{base_url}/api/pick-list?location_id=loc_westin_sf"),
         ("Analytics", f"{base_url}/api/analytics/summary"),
+        ("Transfers", f"{base_url}/api/transfers/recommendations"),
+        ("Delta Sync", f"{base_url}/api/sync/changes"),
+        ("Ingest Catalog", f"{base_url}/api/ingest/catalog"),
     ]
 
     passed = 0
@@ -42,7 +57,707 @@ def test_api(base_url="http://localhost:8000"):
         return 1
 
 
+# ==================== Module Checks ====================
+
+def sale_lines(*keys, quantity=3) -> bytes:
+    """NDJSON sale events for (product_id, location_id) pairs"""
+    return b"\n".join(
+        json.dumps({"type": "sale", "product_id": p, "location_id": l, "quantity": quantity}).encode()
+        for p, l in keys
+    )
+
+
+def check_alert_transitions():
+    from alert_engine import ALERT_RULES, AlertEngine
+
+    engine = AlertEngine(ALERT_RULES, {"p": "Cola"}, {"l": "Lobby"})
+    [(change, spike)] = engine.observe("p", "l", demand_deviation_pct=80)
+    assert change == "created" and spike.title == "Demand spike: Cola +80%"
+    engine.acknowledge(spike.id)
+
+    # Same level: updated in place, id and acknowledgement kept, text re-rendered
+    [(change, updated)] = engine.observe("p", "l", demand_deviation_pct=90)
+    assert change == "updated" and updated.id == spike.id and updated.is_acknowledged
+    assert updated.title == "Demand spike: Cola +90%" and "+90%" in updated.description
+
+    # A warning spike turning into a warning drop is a different level
+    changes = engine.observe("p", "l", demand_deviation_pct=-80)
+    assert [c for c, _ in changes] == ["resolved", "created"]
+    drop = changes[1][1]
+    assert drop.title == "Demand drop: Cola -80%" and drop.recommended_action.startswith("Reduce pick quantity")
+
+    # Restored alerts carry no level; it is recognised from the title
+    restored = AlertEngine(ALERT_RULES, {"p": "Cola"}, {"l": "Lobby"})
+    restored.restore(engine.export())
+    [(change, alert)] = restored.observe("p", "l", demand_deviation_pct=-70)
+    assert change == "updated" and alert.id == drop.id
+
+    [(change, _)] = engine.observe("p", "l", demand_deviation_pct=0)
+    assert change == "resolved" and not engine.active()
+
+
+def check_wal():
+    from ingest import WriteAheadLog
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "ingest.wal")
+        wal = WriteAheadLog(path, fsync=False)
+        wal.append(b"first")
+        wal.append(b"second")
+        assert list(wal.replay()) == [(1, b"first"), (2, b"second")]
+
+        # A corrupted record and everything after it are ignored
+        with open(path, "r+b") as f:
+            f.seek(-1, os.SEEK_END)
+            f.write(b"X")
+        restarted = WriteAheadLog(path, fsync=False)
+        assert list(restarted.replay()) == [(1, b"first")]
+
+        # Batches appended after a torn tail are found at the next replay
+        restarted.append(b"third")
+        assert list(WriteAheadLog(path, fsync=False).replay()) == [(1, b"first"), (2, b"third")]
+        restarted.close()
+
+        wal.truncate()
+        assert list(wal.replay()) == []
+        wal.close()
+
+
+def check_ingest_ranges():
+    from ingest import parse_json_lines
+    from sample_data import INVENTORY, LOCATIONS, PRODUCTS
+
+    event = {"type": "sale", "product_id": PRODUCTS[0].id, "location_id": LOCATIONS[0].id, "quantity": 2}
+    body = b"\n".join(json.dumps(line).encode() for line in [
+        {**event, "quantity": 10 ** 10},
+        {**event, "timestamp": -5},
+        {**event, "quantity": 1e400},
+        event,
+    ])
+    records, rejected, errors = parse_json_lines(body, INVENTORY)
+    assert len(records) == 1 and rejected == 3 and len(errors) == 3
+
+
+def check_day_roll():
+    from alert_engine import ALERT_RULES, AlertEngine
+    from ingest import EventIngestor, WriteAheadLog
+    from inventory_state import InventoryState
+    from sample_data import LOCATIONS, PRODUCTS
+
+    product_ids, location_ids = [p.id for p in PRODUCTS], [loc.id for loc in LOCATIONS]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        state = InventoryState(product_ids, location_ids, seed=1)
+        ingestor = EventIngestor(state, WriteAheadLog(os.path.join(tmp, "ingest.wal"), fsync=False),
+                                 AlertEngine(ALERT_RULES, {}, {}))
+        ingestor.ingest(sale_lines((product_ids[0], location_ids[0]), (product_ids[1], location_ids[1])))
+        i, j = state.index(product_ids[0], location_ids[0])
+        today = state.day
+        assert ingestor.advance_day(today) == 0
+
+        # Past midnight with nothing ingested: the window moves and both SKU-locations are re-evaluated
+        assert ingestor.advance_day(today + 1) == 2
+        assert state.day == today + 1 and state.history(i, j)[-2:].tolist() == [3, 0]
+        assert ingestor.advance_day(today + 1) == 0
+
+        # Also when the day already moved with a batch or another worker
+        state.advance_to(today + 2)
+        assert ingestor.advance_day(today + 2) == 2
+        ingestor.wal.close()
+
+
+def check_alert_stream_resume():
+    from alert_engine import ALERT_RULES, AlertEngine
+    from alert_stream import AlertStream
+
+    engine = AlertEngine(ALERT_RULES, {}, {})
+    engine.observe("p", "l", demand_deviation_pct=80)
+    stream = AlertStream(engine, epoch=7)
+
+    class Request:
+        async def is_disconnected(self):
+            return True
+
+    async def first_event(resume_token):
+        events = stream.events(Request(), resume_token=resume_token)
+        await events.__anext__()  # retry interval
+        if resume_token == stream.token(engine.version):
+            pending = asyncio.ensure_future(events.__anext__())
+            await asyncio.sleep(0.01)
+            engine.observe("p", "l", demand_deviation_pct=90)
+            return await pending
+        return await events.__anext__()
+
+    assert "event: snapshot" in asyncio.run(first_event(None))
+    # A token this engine never issued (e.g. from before a restart) gets a snapshot
+    assert "event: snapshot" in asyncio.run(first_event(stream.token(engine.version + 100)))
+    # So does one issued by another worker's stream, even at a version this engine has
+    other_worker = AlertStream(AlertEngine(ALERT_RULES, {}, {}), epoch=8)
+    assert "event: snapshot" in asyncio.run(first_event(other_worker.token(engine.version)))
+    assert "event: snapshot" in asyncio.run(first_event(engine.version))
+
+    updated = asyncio.run(first_event(stream.token(engine.version)))
+    assert "event: updated" in updated and f"id: {stream.token(engine.version)}" in updated
+
+
+def check_snapshot_warm_start():
+    from alert_engine import ALERT_RULES, AlertEngine
+    from ingest import EventIngestor, WriteAheadLog
+    from inventory_state import InventoryState
+    from sample_data import LOCATIONS, PRODUCTS
+    from snapshot import SnapshotStore
+
+    product_ids, location_ids = [p.id for p in PRODUCTS], [loc.id for loc in LOCATIONS]
+
+    def fresh(wal_path):
+        state = InventoryState(product_ids, location_ids, seed=1)
+        engine = AlertEngine(ALERT_RULES, {}, {})
+        return EventIngestor(state, WriteAheadLog(wal_path, fsync=False), engine)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        wal_path = os.path.join(tmp, "ingest.wal")
+        store = SnapshotStore(os.path.join(tmp, "snapshot.db"))
+        before = fresh(wal_path)
+        before.ingest(sale_lines((product_ids[0], location_ids[0]), (product_ids[1], location_ids[1])))
+        store.save(before.state, before.alert_engine, before.wal.sequence)
+        # Logged after the snapshot, so only this batch is replayed
+        before.ingest(sale_lines((product_ids[2], location_ids[2])))
+
+        after = fresh(wal_path)
+        meta = store.load(after.state, after.alert_engine)
+        assert meta["wal_sequence"] == 1
+        assert after.replay(after_sequence=meta["wal_sequence"]) == 1
+        for name in InventoryState.ARRAYS:
+            assert np.array_equal(getattr(before.state, name), getattr(after.state, name)), name
+        assert before.alert_engine.export()["alerts"] == after.alert_engine.export()["alerts"]
+        before.wal.close()
+        after.wal.close()
+
+
+def check_metrics():
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from metrics import MetricsMiddleware, MetricsRegistry
+
+    app = FastAPI()
+
+    @app.get("/api/items/{item_id}")
+    async def item(item_id: str):
+        return {"id": item_id}
+
+    registry = MetricsRegistry(prefix="test")
+    registry.cache("plans").hit()
+    registry.gauge("queue_depth", "Requests waiting.", lambda: {(("class", "catalog"),): 3})
+    app.add_middleware(MetricsMiddleware, registry=registry)
+    client = TestClient(app)
+    client.get("/api/items/a")
+    client.get("/api/items/b")
+    client.get("/nowhere")
+
+    # Series are labelled by route template, so ids in paths don't multiply them
+    text = registry.render()
+    assert 'test_http_requests_total{method="GET",route="/api/items/{item_id}",status="200"} 2' in text
+    assert 'test_http_requests_total{method="GET",route="<unmatched>",status="404"} 1' in text
+    assert 'test_http_request_duration_seconds_count{method="GET",route="/api/items/{item_id}"} 2' in text
+    assert 'test_http_request_duration_seconds_bucket{method="GET",route="/api/items/{item_id}",le="+Inf"} 2' in text
+    assert 'test_cache_hit_ratio{cache="plans"} 1' in text
+    assert 'test_queue_depth{class="catalog"} 3' in text
+
+
+def check_profiling_tokens():
+    from profiling import ProfilingMiddleware
+
+    middleware = ProfilingMiddleware(None, tokens=["secret"])
+
+    def scope(token: str):
+        return {"type": "http", "headers": [(b"x-profile", token.encode("utf-8"))], "query_string": b""}
+
+    assert middleware._options(scope("secret"))["mode"] == "sample"
+    # Non-ASCII tokens are refused rather than raising TypeError
+    assert middleware._options(scope("sécret")) is None
+
+
+def check_readiness():
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from readiness import Readiness, ReadinessGate
+
+    app = FastAPI()
+
+    @app.get("/api/items")
+    async def items():
+        return []
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    readiness = Readiness()
+    app.add_middleware(ReadinessGate, readiness=readiness)
+    client = TestClient(app)
+
+    # Gated while the warm start runs; health checks stay open
+    response = client.get("/api/items")
+    assert response.status_code == 503 and response.headers["retry-after"] == "1"
+    assert response.json()["status"] == "starting"
+    assert client.get("/health").status_code == 200
+
+    readiness.mark_failed("snapshot unreadable")
+    assert client.get("/api/items").json()["status"] == "failed"
+
+    readiness.mark_ready(replayed_events=3)
+    assert client.get("/api/items").status_code == 200
+    status = readiness.status()
+    assert status["status"] == "ready" and status["replayed_events"] == 3
+    assert status["ready_after_seconds"] is not None and status["waiting_seconds"] is None
+
+
+def check_shared_state():
+    from alert_engine import ALERT_RULES, AlertEngine
+    from ingest import EventIngestor, WriteAheadLog
+    from inventory_state import InventoryState
+    from sample_data import LOCATIONS, PRODUCTS
+    from shared_state import SharedInventory
+
+    product_ids, location_ids = [p.id for p in PRODUCTS], [loc.id for loc in LOCATIONS]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "inventory.shm")
+        workers = []
+        for _ in range(2):
+            state = InventoryState(product_ids, location_ids, seed=1)
+            ingestor = EventIngestor(state, WriteAheadLog(os.path.join(tmp, "ingest.wal"), fsync=False),
+                                     AlertEngine(ALERT_RULES, {}, {}))
+            ingestor.changes = SharedInventory(path, state)
+            workers.append(ingestor)
+        a, b = workers
+
+        # The first worker publishes its restored state; the second finds it and attaches
+        with a.changes.locked():
+            assert not a.changes.is_live()
+            a.changes.reset_changes()
+            a.changes.publish(a.wal.sequence)
+        with b.changes.locked():
+            assert b.changes.is_live()
+            b.changes.attach()
+
+        with a.changes.locked():
+            a.changes.follow(a)
+            a.ingest(sale_lines((product_ids[0], location_ids[0]), (product_ids[1], location_ids[0]), quantity=500))
+            a.changes.commit(a.wal.sequence)
+
+        # B reads A's writes through the map, and re-evaluates just the touched keys
+        for name in InventoryState.ARRAYS:
+            assert np.array_equal(getattr(a.state, name), getattr(b.state, name)), name
+        assert b.changes.follow(b) == 2 and b.changes.follow(b) == 0
+        assert b.wal.sequence == a.wal.sequence
+        assert a.alert_engine.active() and [x.title for x in a.alert_engine.active()] == [
+            x.title for x in b.alert_engine.active()]
+        a.wal.close()
+        b.wal.close()
+
+
+def check_admission():
+    from admission import AdmissionMiddleware, parse_limits
+
+    classes = parse_limits("catalog=1:1", timeout=0.05)
+
+    async def run():
+        release = asyncio.Event()
+
+        async def app(scope, receive, send):
+            await release.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"{}"})
+
+        middleware = AdmissionMiddleware(app, classes, lambda scope: "catalog" if scope["path"] != "/health" else None)
+
+        async def status_of(path="/api/products"):
+            statuses = []
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    statuses.append(message["status"])
+
+            await middleware({"type": "http", "path": path, "headers": []}, None, send)
+            return statuses[0]
+
+        running = asyncio.ensure_future(status_of())
+        await asyncio.sleep(0.01)
+        queued = asyncio.ensure_future(status_of())
+        await asyncio.sleep(0.01)
+        # One slot, taken; a queue of one, taken: the third request is turned away at once
+        assert await status_of() == 429
+        # The queued one gives up after its timeout
+        assert await queued == 503
+        release.set()
+        assert await running == 200
+        assert await status_of("/health") == 200
+
+    asyncio.run(run())
+    assert classes["catalog"].rejected == {"queue_full": 1, "timeout": 1}
+    assert classes["catalog"].admitted == 1 and classes["catalog"].active == 0
+
+
+def check_cors_on_rejection():
+    from fastapi.testclient import TestClient
+
+    # main.py opens its data directory at import: point it at a scratch one for this check only
+    previous = os.environ.get("SHELFSENSE_DATA_DIR")
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["SHELFSENSE_DATA_DIR"] = tmp
+        try:
+            import main
+            # Before the warm start finishes, ReadinessGate answers 503: still with CORS headers
+            response = TestClient(main.app).get("/api/locations", headers={"Origin": "http://example.com"})
+            main.ingestor.wal.close()
+        finally:
+            sys.modules.pop("main", None)
+            if previous is None:
+                os.environ.pop("SHELFSENSE_DATA_DIR", None)
+            else:
+                os.environ["SHELFSENSE_DATA_DIR"] = previous
+    assert response.status_code == 503
+    assert "access-control-allow-origin" in response.headers
+
+
+def check_filter_pushdown():
+    from sample_data import LOCATIONS, PRODUCTS, location_inventory_rows, product_performance_row
+
+    # Filtered in the data layer: the same rows the unfiltered call yields, minus the rest
+    location_id = LOCATIONS[0].id
+    everything = location_inventory_rows(location_id)
+    for status in ("optimal", "low", "critical", "overstock"):
+        expected = [row.product_id for row in everything if row.status == status]
+        assert [row.product_id for row in location_inventory_rows(location_id, status)] == expected, status
+    assert location_inventory_rows(location_id, "unknown") == []
+
+    for product in PRODUCTS[:10]:
+        row = product_performance_row(product.id, location_id)
+        assert product_performance_row(product.id, location_id, tier=row.performance_tier) == row
+        other = "underperformer" if row.performance_tier != "underperformer" else "top_performer"
+        assert product_performance_row(product.id, location_id, tier=other) is None
+
+
+def check_leaderboards():
+    from leaderboard import Leaderboard, PerformanceLeaderboards
+
+    board = Leaderboard()
+    for key, score in [("b", 2.0), ("a", 2.0), ("c", 5.0), ("d", 1.0)]:
+        board.update(key, score)
+    assert board.top(3) == ["c", "a", "b"]  # equal scores rank by key
+    board.update("d", 9.0)
+    board.update("c", 0.0)
+    assert board.top(4) == ["d", "a", "b", "c"] and len(board) == 4
+
+    scores = {("p1", "l1"): 1.0, ("p2", "l1"): 2.0, ("p1", "l2"): 3.0, ("p2", "l2"): 0.0}
+    day = [100]
+
+    def score(product_id, location_id):
+        if location_id is None:
+            return sum(v for (p, _), v in scores.items() if p == product_id)
+        return scores[(product_id, location_id)]
+
+    boards = PerformanceLeaderboards(score, lambda: day[0])
+    boards.reset(["p1", "p2"], ["l1", "l2"])
+    assert boards.top("l1", 2) == ["p2", "p1"] and boards.top(None, 2) == ["p1", "p2"]
+
+    # Only refreshed SKU-locations are re-scored: p1 at l1 is flat index 0
+    scores[("p1", "l1")] = 5.0
+    scores[("p2", "l2")] = 9.0
+    boards.refresh(np.array([0]))
+    assert boards.top("l1", 1) == ["p1"] and boards.top(None, 1) == ["p1"]
+
+    # A new day rebuilds the boards from current scores
+    day[0] += 1
+    assert boards.top(None, 1) == ["p2"]
+
+
+def check_transfers():
+    from transfers import HANDLING_COST_PER_UNIT, STOCKOUT_COST_RATE, TRIP_COST_LOCAL, recommend_transfers
+
+    # One product: a donor with 20 spare, an urgent recipient short 14 and a milder one short 10
+    stock = np.array([[30, 0, 4]])
+    min_stock = np.array([[5, 5, 5]])
+    max_stock = np.array([[10, 14, 14]])
+    result = recommend_transfers(stock, min_stock, max_stock, np.array([10.0]), np.zeros(3, dtype=int))
+    assert result["source"].tolist() == [0, 0]
+    assert result["target"].tolist() == [1, 2] and result["quantity"].tolist() == [14, 6]
+    expected = 14 * 10.0 * STOCKOUT_COST_RATE - (TRIP_COST_LOCAL + 14 * HANDLING_COST_PER_UNIT)
+    assert abs(result["net_benefit"][0] - expected) < 1e-9
+
+
+def check_compression():
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from compression import CompressedBodyCache, CompressionMiddleware, compress, negotiate
+    from metrics import CacheStats
+    from pick_plans import PickListPlans
+    from sample_data import INVENTORY, generate_pick_list
+
+    app = FastAPI()
+    rows = [{"product_id": f"prod_{i}", "quantity": i % 7} for i in range(500)]
+
+    @app.get("/rows")
+    async def all_rows():
+        return rows
+
+    @app.get("/row")
+    async def one_row():
+        return rows[0]
+
+    stats = CacheStats()
+    app.add_middleware(CompressionMiddleware, minimum_size=1024, cache=CompressedBodyCache(1 << 20, stats))
+    client = TestClient(app)
+
+    response = client.get("/rows", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip" and response.json() == rows
+    assert int(response.headers["content-length"]) < len(json.dumps(rows)) / 5
+    client.get("/rows", headers={"Accept-Encoding": "gzip"})
+    assert (stats.hits, stats.misses) == (1, 1)
+
+    small = client.get("/row", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers and small.json() == rows[0]
+    identity = client.get("/rows", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers
+    # Sent uncompressed, but only because of what the client accepted
+    assert small.headers["vary"] == identity.headers["vary"] == "Accept-Encoding"
+
+    # Streams are compressed chunk by chunk and flushed, so each event decodes on arrival
+    async def events(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/event-stream")]})
+        for i in range(3):
+            await send({"type": "http.response.body", "body": f"data: {i}\n\n".encode(), "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "GET", "headers": [(b"accept-encoding", b"br, gzip")]}
+    asyncio.run(CompressionMiddleware(events)(scope, None, send))
+    start, *chunks = sent
+    assert (b"content-encoding", b"gzip") in start["headers"]
+    decoder = zlib.decompressobj(31)
+    for i, message in enumerate(chunks[:3]):
+        assert decoder.decompress(message["body"]) == f"data: {i}\n\n".encode()
+
+    assert negotiate("gzip;q=0.5, deflate") == "gzip"
+    assert negotiate("gzip;q=0, identity") is None
+
+    # Stored pick plans are compressed once per encoding, and only above the size threshold
+    encoded = []
+    plans = PickListPlans(generate_pick_list, compress_min_bytes=1024)
+    plans.compress = lambda body, encoding: encoded.append(encoding) or compress(body, encoding)
+    plans.reset(INVENTORY.product_ids, INVENTORY.location_ids)
+    location_id, date = INVENTORY.location_ids[0], "2030-01-15"
+    body = plans.compressed(location_id, date, "gzip")
+    assert plans.compressed(location_id, date, "gzip") is body and encoded == ["gzip"]
+    assert zlib.decompress(body, 31) == plans.json(location_id, date)
+    plans.compress_min_bytes = len(plans.json(location_id, date)) + 1
+    assert plans.compressed(location_id, date, "gzip") is None
+
+
+def check_changelog():
+    from changelog import EPOCH_SHIFT, ChangeLog
+
+    log = ChangeLog(2, epoch=7)
+    first = log.record(["a"])
+    second = log.record(["b"])
+    assert log.since(first) == [("b", False)]
+    assert log.since(log.version) == []
+
+    log.record(["c"], removed=True)
+    assert log.floor == first and len(log) == 2
+    assert log.since(first - 1) is None
+    assert log.since(second) == [("c", True)]
+
+    # Versions from another worker or an earlier run are never read as ours
+    other = ChangeLog(2, epoch=8)
+    other.record(["x"])
+    assert log.since(other.version) is None
+    assert other.since(second) is None
+    assert log.version >> EPOCH_SHIFT == 7
+
+
+def check_pick_plan_invalidation():
+    from pick_plans import PickListPlans
+    from sample_data import INVENTORY, generate_pick_list
+
+    plans = PickListPlans(generate_pick_list)
+    plans.reset(INVENTORY.product_ids, INVENTORY.location_ids)
+    date = "2030-01-15"
+    plan = next(p for p in (plans.get(loc, date) for loc in INVENTORY.location_ids) if p.items)
+    item = plan.items[0]
+    i, j = INVENTORY.index(item.product_id, item.location_id)
+    n_locations = len(INVENTORY.location_ids)
+
+    # An unrelated SKU at another location leaves the plan alone
+    other = (j + 1) % n_locations
+    plans.invalidate(np.array([i * n_locations + other]))
+    assert plans.missing(date, [plan.location_id]) == []
+
+    plans.invalidate(np.array([i * n_locations + j]))
+    assert plans.missing(date, [plan.location_id]) == [plan.location_id]
+
+    # Built after the invalidation: stored. Built before it: dropped as stale.
+    plans.put(plan.location_id, date, plan, built_at=plans.changes)
+    assert not plans.missing(date, [plan.location_id])
+    plans.invalidate(np.array([i * n_locations + j]))
+    plans.put(plan.location_id, date, plan, built_at=plans.changes - 1)
+    assert plans.missing(date, [plan.location_id]) == [plan.location_id]
+
+
+def check_fanout():
+    from fanout import LocationPool
+    from sample_data import INVENTORY, LOCATIONS, build_pick_lists
+    from shared_state import SharedInventory
+
+    location_ids = [loc.id for loc in LOCATIONS]
+    date = "2030-01-15"
+    timestamps = {"items": {"__all__": {"last_restocked", "last_updated"}}}
+
+    def plain(plans):
+        return [plan.model_dump(exclude=timestamps) for plan in plans]
+
+    serial = plain(build_pick_lists(location_ids, date))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "inventory.shm")
+        shared = SharedInventory(path, INVENTORY)
+        with shared.locked():
+            shared.reset_changes()
+            shared.publish(0)
+        pool = LocationPool(2, path)
+        try:
+            fanned = asyncio.run(pool.map(build_pick_lists, location_ids, list(range(len(location_ids))),
+                                          len(location_ids), INVENTORY.day, date))
+        finally:
+            pool.shutdown()
+    # Pool processes read the same stock through the map, and results keep their order
+    assert plain(fanned) == serial
+
+
+def check_router_merges():
+    import router
+    from ingest import EVENT_RECORD
+    from sample_data import LOCATIONS
+
+    alerts = [
+        {"total_alerts": 1, "critical_count": 0, "warning_count": 1, "info_count": 0, "locations_affected": 1,
+         "alerts": [{"severity": "warning", "product_id": "p1"}]},
+        {"total_alerts": 1, "critical_count": 1, "warning_count": 0, "info_count": 0, "locations_affected": 1,
+         "alerts": [{"severity": "critical", "product_id": "p1"}]},
+    ]
+    merged = router.merge_alert_summaries(alerts)
+    assert merged["total_alerts"] == 2 and merged["locations_affected"] == 2 and merged["products_affected"] == 1
+    assert [a["severity"] for a in merged["alerts"]] == ["critical", "warning"]
+
+    def summary(locations, accuracy, units):
+        return {"total_locations": locations, "total_products": 40, "avg_forecast_accuracy": accuracy,
+                "total_picks_today": 10, "stockout_risk_count": 1, "overstock_count": 2, "optimal_stock_count": 3,
+                "top_selling_products": [{"product_name": "Cola", "units_sold": units, "revenue": units * 2.0}],
+                "underperforming_locations": []}
+
+    merged = router.merge_analytics_summaries([summary(3, 80.0, 100), summary(1, 90.0, 50)])
+    assert merged["total_locations"] == 4 and merged["avg_forecast_accuracy"] == 82.5
+    assert merged["total_picks_today"] == 20 and merged["top_selling_products"][0]["units_sold"] == 150
+
+    # Binary records are split by shard and renumbered to each shard's catalog
+    router.shards = router.Shards(["http://shard-0", "http://shard-1", "http://shard-2"])
+    records = np.zeros(len(LOCATIONS) + 1, dtype=EVENT_RECORD)
+    records["location"] = np.arange(len(LOCATIONS) + 1)
+    parts, rejected, errors = router.split_binary(records.tobytes())
+    assert rejected == 1 and errors
+    for shard, body in parts.items():
+        local = [loc.id for loc in LOCATIONS if router.shards.shard_of[loc.id] == shard]
+        assert np.frombuffer(body, dtype=EVENT_RECORD)["location"].tolist() == list(range(len(local)))
+
+
+def check_forecast_matrix():
+    from sample_data import LOCATIONS, forecast_rows, generate_forecast_matrix
+
+    location_id = LOCATIONS[0].id
+    week = generate_forecast_matrix(location_id, "2030-03-04", 7)
+    assert week.dates[0] == "2030-03-04" and len(week.dates) == 7
+    assert len(week.p50) == len(week.product_ids) and all(len(row) == 7 for row in week.p50)
+    assert all(
+        lo <= mid <= hi
+        for bands in zip(week.p10, week.p50, week.p90)
+        for lo, mid, hi in zip(*bands)
+    )
+
+    # A day forecasts the same on its own as inside a longer horizon
+    thursday = generate_forecast_matrix(location_id, "2030-03-07", 1)
+    assert [row[0] for row in thursday.p50] == [row[3] for row in week.p50]
+    assert len(forecast_rows(week)) == 7 * len(week.product_ids)
+
+
+def check_product_search():
+    from product_search import ProductSearchIndex
+    from sample_data import PRODUCTS
+
+    index = ProductSearchIndex(PRODUCTS)
+
+    def top(query):
+        return index.search(query, limit=1)[0][0].name
+
+    assert top("red bull energy") == "Red Bull Energy"
+    assert top("redbull").startswith("Red Bull Energy")
+    assert top("frapuccino").startswith("Starbucks Frappuccino")
+    assert all(p.category == "Snacks" for p, _ in index.search("bar", category="snacks"))
+    assert index.search("zzzzqqq") == []
+
+
+def test_modules():
+    """In-process behavior checks, no server needed"""
+    print("Checking ShelfSense Mock API modules\n")
+
+    checks = [
+        ("Alert Rule Transitions", check_alert_transitions),
+        ("Write-Ahead Log", check_wal),
+        ("Ingest Field Ranges", check_ingest_ranges),
+        ("Day Roll Without Events", check_day_roll),
+        ("Alert Stream Resume Tokens", check_alert_stream_resume),
+        ("Snapshot Warm Start", check_snapshot_warm_start),
+        ("Metrics Exposition", check_metrics),
+        ("Profiling Tokens", check_profiling_tokens),
+        ("Readiness Gate", check_readiness),
+        ("Shared Inventory Map", check_shared_state),
+        ("Admission Limits", check_admission),
+        ("CORS on Rejections", check_cors_on_rejection),
+        ("Filter Pushdown", check_filter_pushdown),
+        ("Incremental Leaderboards", check_leaderboards),
+        ("Transfer Matcher", check_transfers),
+        ("Response Compression", check_compression),
+        ("Change Log Floor and Resync", check_changelog),
+        ("Pick Plan Invalidation", check_pick_plan_invalidation),
+        ("Fan-out Parity", check_fanout),
+        ("Router Merges", check_router_merges),
+        ("Forecast Matrix", check_forecast_matrix),
+        ("Product Search Ranking", check_product_search),
+    ]
+
+    passed = 0
+    failed = 0
+
+    for name, check in checks:
+        try:
+            check()
+            print(f"✅ {name}: OK")
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {name}: Failed {e}")
+            failed += 1
+        except Exception as e:
+            print(f"❌ {name}: Error - {e!r}")
+            failed += 1
+
+    print(f"\nResults: {passed} passed, {failed} failed\n")
+    return 0 if failed == 0 else 1
+
+
 if __name__ == "__main__":
     url = sys.argv[1] if len(sys.argv) > 1 else "http://localhost:8000"
-    exit_code = test_api(url)
+    exit_code = test_modules() | test_api(url)
     sys.exit(exit_code)
@@ -0,0 +1,112 @@
+"""Network-wide stock transfer recommendations.
+
+Matches SKU-locations holding stock above max_stock (donors) with SKU-locations
+of the same product below min_stock (stockout risks), over the whole inventory
+matrix in one vectorized pass:
+
+- A donor can give `stock - max_stock` units. A recipient asks for
+  `max_stock - stock`, the same restock quantity the stockout alert recommends.
+- Per product, recipients are served most urgent first (lowest stock/min_stock),
+  from donors with the largest surplus first. Both lists are laid out as
+  consecutive intervals of units, and every overlap between a donor interval and
+  a recipient interval is one transfer. This is a greedy match, not an optimal
+  assignment, but it costs O(K log K) in the number of donors and recipients
+  regardless of how many locations the network has.
+- Each transfer is valued at the stockout cost it avoids (the pick-list rate:
+  90% of retail per unit) minus the cost of moving the stock. Only transfers
+  with a positive net benefit are kept, best first.
+"""
+from typing import Dict
+
+import numpy as np
+
+# Share of retail price lost per unit short, as used for pick-list stockout_cost
+STOCKOUT_COST_RATE = 0.9
+# Cost of one transfer trip, by whether both locations are in the same region
+TRIP_COST_LOCAL = 12.0
+TRIP_COST_REMOTE = 45.0
+HANDLING_COST_PER_UNIT = 0.35
+
+
+def _intervals(products: np.ndarray, quantities: np.ndarray, matched: np.ndarray, n_products: int) -> np.ndarray:
+    """End of each entry's unit interval on the shared axis, where product p owns
+    [offset_p, offset_p + matched_p) and entries are already grouped by product"""
+    offsets = np.cumsum(matched) - matched
+    totals = np.bincount(products, weights=quantities, minlength=n_products).astype(np.int64)
+    within = np.cumsum(quantities) - (np.cumsum(totals) - totals)[products]
+    return offsets[products] + np.minimum(within, matched[products])
+
+
+def recommend_transfers(stock: np.ndarray, min_stock: np.ndarray, max_stock: np.ndarray,
+              prices: np.ndarray, regions: np.ndarray) -> Dict[str, np.ndarray]:
+    """Transfers for [product, location] inventory arrays, best net benefit first.
+
+    `prices` is per product and `regions` a region code per location. Returns
+    parallel arrays: product, source, target (row and column indices), quantity,
+    avoided_cost, transfer_cost and net_benefit.
+    """
+    n_products = stock.shape[0]
+
+    # np.nonzero yields keys grouped by product, so each ordering is a stable sort
+    # on one composite key that keeps products together
+    donor_p, donor_l = np.nonzero(stock > max_stock)
+    donor_q = stock[donor_p, donor_l].astype(np.int64) - max_stock[donor_p, donor_l]
+    spread = int(donor_q.max(initial=0)) + 1
+    order = np.argsort(donor_p * spread + (spread - 1 - donor_q), kind="stable")
+    donor_p, donor_l, donor_q = donor_p[order], donor_l[order], donor_q[order]
+
+    recipient_p, recipient_l = np.nonzero(stock < min_stock)
+    recipient_stock = stock[recipient_p, recipient_l].astype(np.int64)
+    recipient_q = max_stock[recipient_p, recipient_l] - recipient_stock
+    # Below min_stock, so stock/min_stock is in [0, 1)
+    urgency = recipient_stock / min_stock[recipient_p, recipient_l]
+    order = np.argsort(recipient_p + urgency, kind="stable")
+    recipient_p, recipient_l, recipient_q = recipient_p[order], recipient_l[order], recipient_q[order]
+
+    # Units of each product that can move: what donors spare, up to what recipients need
+    matched = np.minimum(
+        np.bincount(donor_p, weights=donor_q, minlength=n_products),
+        np.bincount(recipient_p, weights=recipient_q, minlength=n_products),
+    ).astype(np.int64)
+    donor_end = _intervals(donor_p, donor_q, matched, n_products)
+    recipient_end = _intervals(recipient_p, recipient_q, matched, n_products)
+
+    # Every boundary splits the axis into segments served by one donor and one
+    # recipient. Both lists of ends are sorted, so a stable sort merges them.
+    bounds = np.concatenate(([0], donor_end, recipient_end))
+    bounds.sort(kind="stable")
+    bounds = bounds[np.concatenate(([True], bounds[1:] != bounds[:-1]))]
+    starts, quantity = bounds[:-1], np.diff(bounds)
+    donor = np.searchsorted(donor_end, starts, side="right")
+    recipient = np.searchsorted(recipient_end, starts, side="right")
+
+    product = donor_p[donor]
+    source, target = donor_l[donor], recipient_l[recipient]
+    avoided = quantity * prices[product] * STOCKOUT_COST_RATE
+    cost = np.where(regions[source] == regions[target], TRIP_COST_LOCAL, TRIP_COST_REMOTE)
+    cost = cost + quantity * HANDLING_COST_PER_UNIT
+    net = avoided - cost
+
+    keep = np.flatnonzero(net > 0)
+    keep = keep[np.lexsort((target[keep], product[keep], -net[keep]))]
+    return {
+        "product": product[keep],
+        "source": source[keep],
+        "target": target[keep],
+        "quantity": quantity[keep],
+        "avoided_cost": avoided[keep],
+        "transfer_cost": cost[keep],
+        "net_benefit": net[keep],
+    }
+
+
+def region_name(address: str) -> str:
+    """A location's region: the city of a "street, city, state zip" address"""
+    parts = address.split(",")
+    return (parts[-2] if len(parts) >= 3 else address).strip().lower()
+
+
+def region_codes(addresses) -> np.ndarray:
+    """Region code per location (see region_name)"""
+    codes: Dict[str, int] = {}
+    return np.array([codes.setdefault(region_name(address), len(codes)) for address in addresses], dtype=np.int64)